@@ -0,0 +1,100 @@
+"""
+Admission control for incoming updates.
+
+Every update takes a token from its user's bucket and from a global one
+before it is deduplicated, queued or routed. An update that finds either
+empty is turned away at the cost of a dict lookup: no database access,
+no handler and no Bot API reply. One user flooding the webhook is held to
+their own rate, and a burst from everyone to what the database and the
+Bot API limits can absorb.
+
+Per-user buckets live in process memory, least recently seen first; a
+bucket that has refilled says nothing a new one would not, so idle ones
+are dropped from the front periodically.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from .outbound import TokenBucket
+
+# Why an update was not admitted (also the metrics label)
+REJECT_USER = "user_rate"
+REJECT_GLOBAL = "global_rate"
+
+
+class AdmissionController:
+    """Per-user and global token buckets; a rate of 0 disables that limit.
+
+    Updates without a user (channel posts, for instance) only count against
+    the global bucket. A user's token is given back when the global bucket
+    turns the update away, so a global overload does not use up their burst.
+    """
+
+    def __init__(
+        self,
+        user_rate: float = 1,
+        user_burst: float = 10,
+        global_rate: float = 0,
+        global_burst: float = 0,
+        max_users: int = 100000,
+        sweep_interval: float = 60,
+    ):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst or global_rate) if global_rate > 0 else None
+        self.max_users = max_users
+        self.sweep_interval = sweep_interval
+        self._users: "OrderedDict[Any, TokenBucket]" = OrderedDict()
+        self._last_sweep = time.monotonic()
+        self.admitted = 0
+        self.rejected = {REJECT_USER: 0, REJECT_GLOBAL: 0}
+        self.evicted = 0
+
+    def _evict(self, now: float):
+        """Forget the least recently seen users while they are idle, and beyond max_users even if not.
+
+        Stops at the first user still refilling, so it costs only what it evicts.
+        """
+        users = self._users
+        before = len(users)
+        while users and next(iter(users.values())).idle():
+            users.popitem(last=False)
+        while len(users) >= self.max_users:
+            users.popitem(last=False)
+        self.evicted += before - len(users)
+        self._last_sweep = now
+
+    def _user_bucket(self, user_id: Any) -> TokenBucket:
+        bucket = self._users.get(user_id)
+        if bucket is not None:
+            self._users.move_to_end(user_id)
+            return bucket
+        now = time.monotonic()
+        if len(self._users) >= self.max_users or now - self._last_sweep >= self.sweep_interval:
+            self._evict(now)
+        bucket = self._users[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        return bucket
+
+    def admit(self, user_id: Optional[Any]) -> Optional[str]:
+        """None if the update may be processed, otherwise the reason it may not"""
+        bucket = self._user_bucket(user_id) if user_id is not None and self.user_rate > 0 else None
+        if bucket is not None and not bucket.try_take():
+            self.rejected[REJECT_USER] += 1
+            return REJECT_USER
+        if self.global_bucket is not None and not self.global_bucket.try_take():
+            if bucket is not None:
+                bucket.give_back()
+            self.rejected[REJECT_GLOBAL] += 1
+            return REJECT_GLOBAL
+        self.admitted += 1
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._users),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "evicted": self.evicted,
+        }
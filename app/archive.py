@@ -0,0 +1,215 @@
+"""
+Hot/cold tiering of the transactions table.
+
+Everything the bot reads routinely is recent: /summary and /stats look back
+at most 365 days and budgets a month. Transactions older than
+ARCHIVE_AFTER_DAYS are moved to transactions_archive, which keeps the hot
+table and its indexes small. Their amounts stay in the daily rollup, so
+summaries and lifetime totals do not change, and crud reads the archive
+only for history pages, exports and deletes that reach past the horizon.
+
+In the app one worker (the holder of the "archive" lease) runs this every
+ARCHIVE_INTERVAL seconds. It can also be run by hand, with the same
+ARCHIVE_AFTER_DAYS as the app: reads only look in the archive past it.
+
+Usage:
+    python -m app.archive run
+    python -m app.archive status
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from . import crud
+from .metrics import ARCHIVE_DURATION, ARCHIVE_ROWS, ARCHIVED_TRANSACTIONS
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "archive"
+
+# Longest window read from the hot table (/summary and /stats days)
+MAX_WINDOW_DAYS = 365
+
+
+async def archive_old_transactions(session_factory, days: int, batch_size: int = 1000) -> dict:
+    """Move transactions older than `days` days to the archive, batch_size per commit.
+
+    Returns the rows moved and both tables' sizes before and after, which
+    are also exported as metrics.
+    """
+    if days <= MAX_WINDOW_DAYS + 1:
+        raise ValueError(f"The archive horizon must be more than {MAX_WINDOW_DAYS + 1} days")
+    before = datetime.now() - timedelta(days=days)
+    started = time.perf_counter()
+    async with session_factory() as db:
+        hot_before, archived_before = await crud.count_transactions(db)
+
+    moved = 0
+    last_id = 0
+    while True:
+        async with session_factory() as db:
+            count, last_id = await crud.archive_transactions(db, before, last_id, batch_size)
+        moved += count
+        ARCHIVED_TRANSACTIONS.inc(count)
+        if count < batch_size:
+            break
+
+    async with session_factory() as db:
+        hot_after, archived_after = await crud.count_transactions(db)
+    ARCHIVE_DURATION.observe(time.perf_counter() - started)
+    ARCHIVE_ROWS.update({
+        ("hot", "before"): hot_before,
+        ("hot", "after"): hot_after,
+        ("archive", "before"): archived_before,
+        ("archive", "after"): archived_after,
+    })
+    return {
+        "moved": moved,
+        "hot_before": hot_before,
+        "hot_after": hot_after,
+        "archived_before": archived_before,
+        "archived_after": archived_after,
+    }
+
+
+class ArchiveJob:
+    """Runs archive_old_transactions every interval seconds in one worker.
+
+    Only the holder of the "archive" lease runs it. As with the recurring
+    scheduler the lease is short and renewed every lease_ttl / 3 seconds,
+    also while a run is in progress, and released on stop, so after a
+    restart another worker takes over within lease_ttl. A worker that
+    becomes the holder runs the job first_run seconds after start or at
+    once if it took over later, since instances that sleep when idle are
+    often restarted; a run cut short by losing the lease is resumed by the
+    next holder, as batches already moved stay committed.
+    """
+
+    def __init__(self, session_factory, days: int, interval: float = 86400, batch_size: int = 1000,
+                 first_run: float = 60, lease_ttl: float = 30):
+        self.session_factory = session_factory
+        self.days = days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.first_run = first_run
+        self.lease_ttl = lease_ttl
+        self.holder = crud.lease_holder()
+        self._task: Optional[asyncio.Task] = None
+        self._archive_task: Optional[asyncio.Task] = None
+        self.leader = False
+        self.runs = 0
+        self.last_run: Optional[dict] = None
+
+    def stats(self) -> dict:
+        return {"leader": self.leader, "runs": self.runs, "last_run": self.last_run}
+
+    def start(self):
+        """Spawn the job on the running event loop"""
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._run(), name="archive-job")
+
+    async def stop(self):
+        """Stop the job, cancelling a run in progress, and hand the lease over"""
+        if not self._task:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self._cancel_archive()
+        if self.leader:
+            self.leader = False
+            try:
+                async with self.session_factory() as db:
+                    await crud.release_lease(db, LEASE_NAME, self.holder)
+            except Exception as e:
+                logger.error(f"Failed to release the archive lease: {e}")
+
+    async def _cancel_archive(self):
+        if self._archive_task:
+            self._archive_task.cancel()
+            await asyncio.gather(self._archive_task, return_exceptions=True)
+            self._archive_task = None
+
+    async def _archive(self):
+        try:
+            self.last_run = await archive_old_transactions(self.session_factory, self.days, self.batch_size)
+            self.runs += 1
+            logger.info(f"Archived old transactions: {self.last_run}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Archiving old transactions failed: {e}")
+        finally:
+            self._archive_task = None
+
+    async def _run(self):
+        run_at = time.monotonic() + self.first_run
+        while True:
+            try:
+                async with self.session_factory() as db:
+                    leader = await crud.acquire_lease(db, LEASE_NAME, self.holder, self.lease_ttl)
+                if leader and not self.leader:
+                    logger.info("Took the archive lease")
+                elif self.leader and not leader:
+                    logger.warning("Lost the archive lease")
+                    await self._cancel_archive()
+                self.leader = leader
+                if leader and self._archive_task is None and time.monotonic() >= run_at:
+                    self._archive_task = asyncio.create_task(self._archive(), name="archive-run")
+                    run_at = time.monotonic() + self.interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Archive lease renewal failed: {e}")
+            await asyncio.sleep(self.lease_ttl / 3)
+
+
+async def _main(command: str) -> dict:
+    from .database import AsyncSessionLocal, async_engine
+    from config import Config
+
+    try:
+        if command == "run":
+            return await archive_old_transactions(
+                AsyncSessionLocal, Config.ARCHIVE_AFTER_DAYS, Config.ARCHIVE_BATCH_SIZE
+            )
+        async with AsyncSessionLocal() as db:
+            hot, archived = await crud.count_transactions(db)
+        return {"hot": hot, "archived": archived, "horizon": crud.archive_horizon().isoformat(" ", "seconds")}
+    finally:
+        await async_engine.dispose()
+
+
+def main():
+    """Main function"""
+    from .database import create_tables
+    from config import Config
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("run", "status"):
+        print("Usage:")
+        print("  python -m app.archive run")
+        print("  python -m app.archive status")
+        sys.exit(1)
+
+    create_tables()
+    try:
+        result = asyncio.run(_main(sys.argv[1]))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if sys.argv[1] == "status":
+        print(f"Hot rows: {result['hot']}, archived rows: {result['archived']}, "
+              f"reads reach the archive past {result['horizon']}")
+        return
+    print(f"✅ Moved {result['moved']} transactions older than {Config.ARCHIVE_AFTER_DAYS} days to the archive")
+    print(f"   hot table: {result['hot_before']} -> {result['hot_after']} rows, "
+          f"archive: {result['archived_before']} -> {result['archived_after']} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from pydantic import TypeAdapter
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Storage for serialized per-user cache entries.
+
+    Entries are grouped by user so a write can drop everything cached for
+    that user in one operation. Each invalidation also moves the user to a
+    new generation; set() stores a value only if the generation read before
+    it was loaded is still current, so a load that raced a write cannot
+    cache what it read before the write.
+    """
+
+    async def get(self, user_id: int, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def generation(self, user_id: int) -> Any:
+        raise NotImplementedError
+
+    async def set(self, user_id: int, key: str, value: str, generation: Any):
+        raise NotImplementedError
+
+    async def invalidate(self, user_id: int):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class NullCacheBackend(CacheBackend):
+    """Caching disabled: every lookup is a miss"""
+
+    async def get(self, user_id: int, key: str) -> Optional[str]:
+        return None
+
+    async def generation(self, user_id: int) -> Any:
+        return None
+
+    async def set(self, user_id: int, key: str, value: str, generation: Any):
+        pass
+
+    async def invalidate(self, user_id: int):
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Process-local LRU with a TTL, bounded by total number of entries.
+
+    Generations are numbers from one counter, kept for the max_entries most
+    recently invalidated users; a user without one is at the highest
+    generation forgotten so far, which never equals a value read before
+    their last invalidation.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[float, str]]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[str]] = {}
+        self._generations: "OrderedDict[int, int]" = OrderedDict()
+        self._last_generation = 0
+        self._forgotten_generation = 0
+        self.evictions = 0
+
+    def _remove(self, user_id: int, key: str):
+        self._entries.pop((user_id, key), None)
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    async def get(self, user_id: int, key: str) -> Optional[str]:
+        entry = self._entries.get((user_id, key))
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._remove(user_id, key)
+            return None
+        self._entries.move_to_end((user_id, key))
+        return value
+
+    async def generation(self, user_id: int) -> Any:
+        return self._generations.get(user_id, self._forgotten_generation)
+
+    async def set(self, user_id: int, key: str, value: str, generation: Any):
+        if generation != self._generations.get(user_id, self._forgotten_generation):
+            return
+        self._entries[(user_id, key)] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end((user_id, key))
+        self._keys_by_user.setdefault(user_id, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            (old_user_id, old_key), _ = self._entries.popitem(last=False)
+            self._remove(old_user_id, old_key)
+            self.evictions += 1
+
+    async def invalidate(self, user_id: int):
+        for key in self._keys_by_user.pop(user_id, set()):
+            self._entries.pop((user_id, key), None)
+        self._last_generation += 1
+        self._generations[user_id] = self._last_generation
+        self._generations.move_to_end(user_id)
+        while len(self._generations) > self.max_entries:
+            _, forgotten = self._generations.popitem(last=False)
+            self._forgotten_generation = max(self._forgotten_generation, forgotten)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "evictions": self.evictions}
+
+
+class RedisCacheBackend(CacheBackend):
+    """Shared cache for multi-worker deployments (requires the redis package).
+
+    Each user's entries live in one hash, so invalidation is a single DEL and
+    the TTL is applied to the whole hash on every write. Size is bounded by
+    Redis' own maxmemory/eviction policy. The generation is a counter key
+    INCR'd by invalidation; a Lua script compares it and writes atomically.
+    """
+
+    # KEYS: hash, generation counter; ARGV: field, value, ttl, generation read before loading
+    SET_IF_CURRENT = """
+    if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[4] then
+        return 0
+    end
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return 1
+    """
+
+    def __init__(self, url: str, ttl: float = 300, prefix: str = "moneybot:cache:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package (pip install redis)") from e
+        self.client = redis.from_url(url, decode_responses=True)
+        self._set_if_current = self.client.register_script(self.SET_IF_CURRENT)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self.errors = 0
+
+    def _name(self, user_id: int) -> str:
+        return f"{self.prefix}{user_id}"
+
+    def _generation_name(self, user_id: int) -> str:
+        return f"{self.prefix}gen:{user_id}"
+
+    async def get(self, user_id: int, key: str) -> Optional[str]:
+        try:
+            return await self.client.hget(self._name(user_id), key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache read failed: {e}")
+            return None
+
+    async def generation(self, user_id: int) -> Any:
+        try:
+            return await self.client.get(self._generation_name(user_id)) or "0"
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache read failed: {e}")
+            return None
+
+    async def set(self, user_id: int, key: str, value: str, generation: Any):
+        if generation is None:
+            return
+        try:
+            await self._set_if_current(
+                keys=[self._name(user_id), self._generation_name(user_id)],
+                args=[key, value, self.ttl, generation],
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache write failed: {e}")
+
+    async def invalidate(self, user_id: int):
+        try:
+            # The counter only has to outlive a load; it is kept twice as long as the entries
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.delete(self._name(user_id))
+                pipe.incr(self._generation_name(user_id))
+                pipe.expire(self._generation_name(user_id), self.ttl * 2)
+                await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Cache invalidation failed for user {user_id}: {e}")
+
+    def stats(self) -> dict:
+        return {"errors": self.errors}
+
+
+class UserCache:
+    """Read-through cache of per-user query results with write invalidation"""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get_or_load(self, user_id: int, key: str, adapter: TypeAdapter, loader: Callable[[], Awaitable[Any]]):
+        """Return the cached value for key or load, validate and store it.
+
+        The value is not stored if the user's cache was invalidated while it
+        was loading, since it may predate that write.
+        """
+        cached = await self.backend.get(user_id, key)
+        if cached is not None:
+            self.hits += 1
+            return adapter.validate_json(cached)
+        self.misses += 1
+        generation = await self.backend.generation(user_id)
+        value = adapter.validate_python(await loader(), from_attributes=True)
+        await self.backend.set(user_id, key, adapter.dump_json(value).decode(), generation)
+        return value
+
+    async def invalidate(self, user_id: int):
+        """Drop everything cached for a user after their data changed"""
+        self.invalidations += 1
+        await self.backend.invalidate(user_id)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            **self.backend.stats(),
+        }
+
+
+def create_backend(name: str, url: str = "", max_entries: int = 10000, ttl: float = 300) -> CacheBackend:
+    """Build the backend selected by CACHE_BACKEND"""
+    if name == "memory":
+        return MemoryCacheBackend(max_entries=max_entries, ttl=ttl)
+    if name == "redis":
+        return RedisCacheBackend(url, ttl=ttl)
+    if name == "none":
+        return NullCacheBackend()
+    raise ValueError(f"Unknown cache backend: {name}")
+
+
+user_cache = UserCache(create_backend(
+    Config.CACHE_BACKEND,
+    url=Config.CACHE_URL,
+    max_entries=Config.CACHE_MAX_ENTRIES,
+    ttl=Config.CACHE_TTL,
+))
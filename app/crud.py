@@ -1,83 +1,853 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import (
+    bindparam, column, func, select, insert, update, delete, literal, literal_column, table, union_all, tuple_
+)
+from sqlalchemy.exc import IntegrityError
+from pydantic import TypeAdapter
 from . import models, schemas
-from typing import List, Optional
-from datetime import datetime, timedelta
+from .cache import user_cache
+from .money import DEFAULT_CURRENCY, from_minor, to_minor
+from .schedules import Schedule, load_schedule
+from config import Config
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+import base64
+import os
+import re
+import socket
+import uuid
 
-def create_transaction(db: Session, transaction: schemas.TransactionCreate) -> models.Transaction:
+_SUMMARY_REPORT = TypeAdapter(schemas.SummaryReport)
+_TRANSACTION_LIST = TypeAdapter(List[schemas.Transaction])
+
+async def _apply_daily_totals(db: AsyncSession, transactions: Iterable[models.Transaction], sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) transactions from the daily rollup"""
+    deltas = {}
+    for t in transactions:
+        key = (t.user_id, t.created_at.date(), t.transaction_type, t.category or "", t.currency)
+        total, count = deltas.get(key, (0, 0))
+        deltas[key] = (total + sign * t.amount_minor, count + sign)
+    if not deltas:
+        return
+
+    rollup = models.DailyTotal
+    # Only the dialect in use is imported; the PostgreSQL one takes ~40 ms to load
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects import postgresql as dialect
+    else:
+        from sqlalchemy.dialects import sqlite as dialect
+    stmt = dialect.insert(rollup).values([
+        {
+            "user_id": user_id,
+            "day": day,
+            "transaction_type": transaction_type,
+            "category": category,
+            "currency": currency,
+            "total": total,
+            "count": count,
+        }
+        for (user_id, day, transaction_type, category, currency), (total, count) in deltas.items()
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[rollup.user_id, rollup.day, rollup.transaction_type, rollup.category, rollup.currency],
+        set_={"total": rollup.total + stmt.excluded.total, "count": rollup.count + stmt.excluded.count}
+    ))
+    if sign < 0:
+        await db.execute(delete(rollup).where(
+            rollup.user_id.in_({user_id for user_id, _, _, _, _ in deltas}),
+            rollup.count <= 0
+        ))
+
+def _insert_values(transaction: schemas.TransactionCreate) -> dict:
+    """Column values for a new row; created_at is left to the server default unless given"""
+    values = transaction.dict(exclude={"amount"})
+    values["amount_minor"] = transaction.amount_minor
+    if values["created_at"] is None:
+        del values["created_at"]
+    return values
+
+async def create_transaction(db: AsyncSession, transaction: schemas.TransactionCreate) -> models.Transaction:
     """Create a new transaction"""
-    db_transaction = models.Transaction(**transaction.dict())
+    db_transaction = models.Transaction(**_insert_values(transaction))
     db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
+    await db.flush()
+    await db.refresh(db_transaction)
+    await _apply_daily_totals(db, [db_transaction])
+    await _apply_budget_totals(db, [db_transaction])
+    await db.commit()
+    await user_cache.invalidate(db_transaction.user_id)
     return db_transaction
 
-def get_transactions_by_user(db: Session, user_id: int, limit: int = 10) -> List[models.Transaction]:
+async def create_transactions(db: AsyncSession, transactions: List[schemas.TransactionCreate]) -> List[models.Transaction]:
+    """Create many transactions with one bulk INSERT and a single commit"""
+    if not transactions:
+        return []
+    result = await db.execute(
+        insert(models.Transaction).returning(models.Transaction),
+        [_insert_values(transaction) for transaction in transactions]
+    )
+    db_transactions = list(result.scalars().all())
+    await _apply_daily_totals(db, db_transactions)
+    await _apply_budget_totals(db, db_transactions)
+    await db.commit()
+    for user_id in {t.user_id for t in db_transactions}:
+        await user_cache.invalidate(user_id)
+    return db_transactions
+
+async def insert_transactions(db: AsyncSession, transactions: List[schemas.TransactionCreate]) -> int:
+    """Insert timestamped transactions in one executemany batch and commit.
+
+    Unlike create_transactions no rows are read back, which keeps large
+    imports cheap. Every transaction must carry created_at so the daily
+    rollup can be updated from the input alone.
+    """
+    if not transactions:
+        return 0
+    await _insert_rows(db, transactions)
+    await db.commit()
+    for user_id in {t.user_id for t in transactions}:
+        await user_cache.invalidate(user_id)
+    return len(transactions)
+
+async def _insert_rows(db: AsyncSession, transactions: List[schemas.TransactionCreate]):
+    """The uncommitted part of insert_transactions"""
+    await db.execute(
+        insert(models.Transaction.__table__),
+        [
+            {
+                "user_id": t.user_id,
+                "amount_minor": t.amount_minor,
+                "currency": t.currency,
+                "transaction_type": t.transaction_type,
+                "category": t.category,
+                "description": t.description,
+                "created_at": t.created_at,
+            }
+            for t in transactions
+        ]
+    )
+    await _apply_daily_totals(db, transactions)
+    await _apply_budget_totals(db, transactions)
+
+def archive_horizon() -> datetime:
+    """Transactions created before this may have been moved to transactions_archive.
+
+    app.archive moves rows older than ARCHIVE_AFTER_DAYS; the extra day
+    covers timestamps stored in UTC being compared with local time.
+    """
+    return datetime.now() - timedelta(days=Config.ARCHIVE_AFTER_DAYS - 1)
+
+async def _newest_first(
+    db: AsyncSession, user_id: int, limit: int, before: Optional[Tuple[datetime, int]] = None
+) -> list:
+    """Up to limit of a user's transaction rows older than (created_at, id) `before`, newest first.
+
+    The archive is only read when the hot rows run out or reach past the
+    archive horizon; rows from both tables are then merged in order.
+    """
+    async def load(model) -> list:
+        query = select(model).filter(model.user_id == user_id)
+        if before is not None:
+            created_at, transaction_id = before
+            query = query.filter(
+                tuple_(model.created_at, model.id) < tuple_(literal(created_at, model.created_at.type), transaction_id)
+            )
+        result = await db.execute(query.order_by(model.created_at.desc(), model.id.desc()).limit(limit))
+        return list(result.scalars().all())
+
+    rows = await load(models.Transaction)
+    if len(rows) == limit and rows[-1].created_at.replace(tzinfo=None) >= archive_horizon():
+        return rows
+    rows.extend(await load(models.ArchivedTransaction))
+    rows.sort(key=lambda t: (t.created_at, t.id), reverse=True)
+    return rows[:limit]
+
+async def get_transactions_by_user(db: AsyncSession, user_id: int, limit: int = 10) -> List[schemas.Transaction]:
     """Get recent transactions for a user"""
-    return db.query(models.Transaction).filter(
-        models.Transaction.user_id == user_id
-    ).order_by(models.Transaction.created_at.desc()).limit(limit).all()
+    return await user_cache.get_or_load(
+        user_id, f"recent:{limit}", _TRANSACTION_LIST, lambda: _newest_first(db, user_id, limit)
+    )
+
+def encode_cursor(transaction: schemas.Transaction) -> str:
+    """Opaque cursor pointing just past a transaction in newest-first order"""
+    raw = f"{transaction.created_at.isoformat()}|{transaction.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """(created_at, id) from a cursor; raises ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, transaction_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(transaction_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+async def get_transactions_page(
+    db: AsyncSession,
+    user_id: int,
+    limit: int = 10,
+    cursor: Optional[str] = None
+) -> schemas.TransactionPage:
+    """Get a page of transactions, newest first, continuing from a cursor.
+
+    Pages are keyed on (created_at, id) rather than OFFSET, so every page is
+    an index range scan of `limit` rows no matter how far back it is.
+    """
+    if cursor is None:
+        # The first page is the recent list, which is usually cached
+        rows = await get_transactions_by_user(db, user_id, limit + 1)
+    else:
+        rows = _TRANSACTION_LIST.validate_python(
+            await _newest_first(db, user_id, limit + 1, decode_cursor(cursor)), from_attributes=True
+        )
+
+    items = list(rows[:limit])
+    next_cursor = encode_cursor(items[-1]) if len(rows) > limit else None
+    return schemas.TransactionPage(items=items, next_cursor=next_cursor)
+
+async def stream_transactions(db: AsyncSession, user_id: int, batch_size: int = 1000) -> AsyncIterator[tuple]:
+    """Yield all of a user's transactions as plain rows, oldest first.
+
+    Rows are fetched through a server-side cursor in batches of batch_size,
+    so memory stays flat however long the history is. Archived and hot rows
+    are merged in order by the database, each side read from its index.
+    """
+    tables = []
+    for transaction in (models.ArchivedTransaction, models.Transaction):
+        tables.append(select(
+            transaction.id,
+            transaction.created_at,
+            transaction.transaction_type,
+            transaction.amount_minor,
+            transaction.currency,
+            transaction.category,
+            transaction.description
+        ).filter(
+            transaction.user_id == user_id
+        ))
+    result = await db.stream(
+        union_all(*tables).order_by(
+            literal_column("created_at"), literal_column("id")
+        ).execution_options(yield_per=batch_size)
+    )
+    async for partition in result.partitions():
+        for row in partition:
+            yield row
+
+# SQLite's FTS5 index (see migrations._add_search_index); rowid is the transaction id
+_SEARCH_INDEX = table("transactions_fts", column("rowid"))
+MAX_SEARCH_TERMS = 8
+# Words no category or description is searched by ("dentist from march" looks for dentist and march)
+SEARCH_STOP_WORDS = frozenset({"a", "an", "and", "at", "for", "from", "in", "my", "of", "on", "or", "the", "to", "with"})
+
+def search_terms(query: str) -> List[str]:
+    """Lower-cased words of a search query; punctuation, search operators and stop words are dropped"""
+    words = [word for word in re.findall(r"\w+", query.lower()) if word not in SEARCH_STOP_WORDS]
+    return words[:MAX_SEARCH_TERMS]
+
+def _search_document(model, *columns: str):
+    """The tsvector of a PostgreSQL GIN search index (see migrations._add_search_index)"""
+    document = " || ' ' || ".join(f"coalesce({model.__tablename__}.{name}, '')" for name in columns)
+    return literal_column(f"to_tsvector('english', {document})")
 
-def get_transactions_by_user_and_period(
-    db: Session, 
-    user_id: int, 
+def _search_ids(db: AsyncSession, user_id: int, terms: List[str], since: Optional[datetime],
+                in_category: bool, archived: bool):
+    """SELECT of the ids of a user's matches, most recently added first.
+
+    in_category keeps only the transactions whose category contains every
+    term. Ordered by id, SQLite's FTS5 index yields matches newest first
+    and stops at the LIMIT, where a relevance score such as bm25 would have
+    to be computed for every match, and read each term's global statistics.
+    """
+    if db.bind.dialect.name == "postgresql":
+        tsquery = func.to_tsquery(literal_column("'english'"), " & ".join(terms))
+        queries = []
+        for model in (models.Transaction, models.ArchivedTransaction) if archived else (models.Transaction,):
+            query = select(model.id).where(
+                model.user_id == user_id,
+                _search_document(model, "category", "description").op("@@")(tsquery),
+            )
+            if in_category:
+                # Only tested on the rows found through the GIN index
+                query = query.where(_search_document(model, "category").op("@@")(tsquery))
+            if since is not None:
+                query = query.where(model.created_at >= since)
+            queries.append(query)
+        return union_all(*queries).order_by(literal_column("id").desc())
+
+    words = " AND ".join(f'"{term}"' for term in terms)
+    match = f"owner:u{user_id} AND {'category' if in_category else '{category description}'}: ({words})"
+    query = select(_SEARCH_INDEX.c.rowid).where(literal_column("transactions_fts").op("MATCH")(match))
+    if since is not None:
+        # The index covers both tables; a row's date is in whichever holds it
+        created_at = func.coalesce(*(
+            select(model.created_at).where(model.id == _SEARCH_INDEX.c.rowid).scalar_subquery()
+            for model in (models.Transaction, models.ArchivedTransaction)
+        ))
+        query = query.where(created_at >= since)
+    return query.order_by(_SEARCH_INDEX.c.rowid.desc())
+
+async def search_transactions(
+    db: AsyncSession,
+    user_id: int,
+    terms: List[str],
+    days: Optional[int] = None,
+    page: int = 1,
+    page_size: int = 10
+) -> schemas.SearchPage:
+    """A page of the user's transactions whose category or description contain every term.
+
+    Served by the full-text index rather than a LIKE scan. Transactions
+    whose category matches rank first, then those matching in the
+    description; newest first within each. Only as many matches as the
+    page needs are read. The archive is searched as well when the window
+    (all time without days) reaches past the archive horizon.
+    """
+    since = datetime.now() - timedelta(days=days) if days is not None else None
+    archived = since is None or since < archive_horizon()
+    wanted = page * page_size + 1
+
+    ids = []
+    for in_category in (True, False):
+        result = await db.execute(_search_ids(db, user_id, terms, since, in_category, archived).limit(wanted))
+        found = set(ids)
+        ids.extend(transaction_id for transaction_id in result.scalars().all() if transaction_id not in found)
+        if len(ids) >= wanted:
+            break
+
+    page_ids = ids[(page - 1) * page_size:page * page_size]
+    rows = {}
+    for model in (models.Transaction, models.ArchivedTransaction):
+        missing = [transaction_id for transaction_id in page_ids if transaction_id not in rows]
+        if not missing:
+            break
+        result = await db.execute(select(model).filter(model.id.in_(missing)))
+        rows.update((transaction.id, transaction) for transaction in result.scalars().all())
+    return schemas.SearchPage(
+        items=_TRANSACTION_LIST.validate_python(
+            [rows[transaction_id] for transaction_id in page_ids if transaction_id in rows], from_attributes=True
+        ),
+        next_page=page + 1 if len(ids) > page * page_size else None
+    )
+
+def period_filter(user_id: int, days: int) -> list:
+    """WHERE clauses selecting a user's transactions from the last `days` days"""
+    start_date = datetime.now() - timedelta(days=days)
+    return [models.Transaction.user_id == user_id, models.Transaction.created_at >= start_date]
+
+async def get_transactions_by_user_and_period(
+    db: AsyncSession,
+    user_id: int,
     days: int = 30
 ) -> List[models.Transaction]:
     """Get transactions for a user within a specific time period"""
+    result = await db.execute(
+        select(models.Transaction).filter(
+            *period_filter(user_id, days)
+        ).order_by(models.Transaction.created_at.desc())
+    )
+    return list(result.scalars().all())
+
+async def _get_window_totals(db: AsyncSession, user_id: int, days: int, currency: str):
+    """(type, category, total in minor units, count) rows in one currency for the last `days` days.
+
+    Whole days come from the daily rollup; only the partial first day of the
+    window is read from raw transactions, so the cost is bounded by the
+    number of days rather than the number of transactions.
+    """
     start_date = datetime.now() - timedelta(days=days)
-    return db.query(models.Transaction).filter(
-        models.Transaction.user_id == user_id,
-        models.Transaction.created_at >= start_date
-    ).order_by(models.Transaction.created_at.desc()).all()
+    first_full_day = start_date.date() + timedelta(days=1)
+    rollup = models.DailyTotal
+    transaction = models.Transaction
 
-def get_user_summary(db: Session, user_id: int, days: int = 30) -> schemas.TransactionSummary:
+    whole_days = select(
+        rollup.transaction_type,
+        rollup.category,
+        rollup.total.label("total"),
+        rollup.count.label("count")
+    ).where(
+        rollup.user_id == user_id,
+        rollup.currency == currency,
+        rollup.day >= first_full_day
+    )
+    partial_day = select(
+        transaction.transaction_type,
+        func.coalesce(transaction.category, ""),
+        transaction.amount_minor,
+        literal(1)
+    ).where(
+        transaction.user_id == user_id,
+        transaction.currency == currency,
+        transaction.created_at >= start_date,
+        transaction.created_at < datetime.combine(first_full_day, time.min)
+    )
+    window = union_all(whole_days, partial_day).subquery()
+    result = await db.execute(
+        select(
+            window.c.transaction_type,
+            window.c.category,
+            func.sum(window.c.total),
+            func.sum(window.c.count)
+        ).group_by(window.c.transaction_type, window.c.category)
+    )
+    return result.all()
+
+async def get_summary_report(
+    db: AsyncSession, user_id: int, days: int = 30, currency: str = DEFAULT_CURRENCY
+) -> schemas.SummaryReport:
+    """Get the summary and expenses by category in one currency in a single query"""
+    return await user_cache.get_or_load(
+        user_id, f"summary:{days}:{currency}", _SUMMARY_REPORT,
+        lambda: _build_summary_report(db, user_id, days, currency)
+    )
+
+async def _build_summary_report(
+    db: AsyncSession, user_id: int, days: int, currency: str = DEFAULT_CURRENCY
+) -> schemas.SummaryReport:
+    # Minor units are summed as integers and converted once at the end
+    total_income = 0
+    total_expenses = 0
+    transaction_count = 0
+    expenses_by_category = {}
+    for transaction_type, category, total, count in await _get_window_totals(db, user_id, days, currency):
+        if not count:
+            continue
+        transaction_count += count
+        if transaction_type == "income":
+            total_income += total
+        elif transaction_type == "expense":
+            total_expenses += total
+            if category:
+                expenses_by_category[category] = from_minor(total, currency)
+
+    return schemas.SummaryReport(
+        summary=schemas.TransactionSummary(
+            total_income=from_minor(total_income, currency),
+            total_expenses=from_minor(total_expenses, currency),
+            balance=from_minor(total_income - total_expenses, currency),
+            transaction_count=transaction_count
+        ),
+        expenses_by_category=expenses_by_category,
+        currency=currency
+    )
+
+async def get_user_summary(
+    db: AsyncSession, user_id: int, days: int = 30, currency: str = DEFAULT_CURRENCY
+) -> schemas.TransactionSummary:
     """Get financial summary for a user within a specific time period"""
-    start_date = datetime.now() - timedelta(days=days)
-    
-    # Get transactions within the period
-    transactions = db.query(models.Transaction).filter(
-        models.Transaction.user_id == user_id,
-        models.Transaction.created_at >= start_date
-    ).all()
-    
-    # Calculate totals
-    total_income = sum(t.amount for t in transactions if t.transaction_type == "income")
-    total_expenses = sum(t.amount for t in transactions if t.transaction_type == "expense")
-    balance = total_income - total_expenses
-    
-    return schemas.TransactionSummary(
-        total_income=total_income,
-        total_expenses=total_expenses,
-        balance=balance,
-        transaction_count=len(transactions)
-    )
-
-def get_category_summary(db: Session, user_id: int, days: int = 30) -> dict:
+    return (await get_summary_report(db, user_id, days, currency)).summary
+
+async def get_category_summary(db: AsyncSession, user_id: int, days: int = 30, currency: str = DEFAULT_CURRENCY) -> dict:
     """Get expense summary by category"""
-    start_date = datetime.now() - timedelta(days=days)
-    
-    # Get expenses grouped by category
-    category_expenses = db.query(
-        models.Transaction.category,
-        func.sum(models.Transaction.amount).label('total')
-    ).filter(
-        models.Transaction.user_id == user_id,
-        models.Transaction.transaction_type == "expense",
-        models.Transaction.created_at >= start_date,
-        models.Transaction.category.isnot(None)
-    ).group_by(models.Transaction.category).all()
-    
-    return {category: total for category, total in category_expenses}
-
-def delete_transaction(db: Session, transaction_id: int, user_id: int) -> bool:
-    """Delete a transaction (only if it belongs to the user)"""
-    transaction = db.query(models.Transaction).filter(
-        models.Transaction.id == transaction_id,
-        models.Transaction.user_id == user_id
-    ).first()
-    
+    return (await get_summary_report(db, user_id, days, currency)).expenses_by_category
+
+async def delete_transaction(db: AsyncSession, transaction_id: int, user_id: int) -> bool:
+    """Delete a transaction (only if it belongs to the user), archived or not"""
+    transaction = None
+    for model in (models.Transaction, models.ArchivedTransaction):
+        result = await db.execute(select(model).filter(model.id == transaction_id, model.user_id == user_id))
+        transaction = result.scalars().first()
+        if transaction:
+            break
+
     if transaction:
-        db.delete(transaction)
-        db.commit()
+        await db.delete(transaction)
+        await _apply_daily_totals(db, [transaction], sign=-1)
+        await _apply_budget_totals(db, [transaction], sign=-1)
+        await db.commit()
+        await user_cache.invalidate(user_id)
         return True
-    return False 
\ No newline at end of file
+    return False
+
+ARCHIVE_COLUMNS = (
+    "id", "user_id", "amount_minor", "currency", "transaction_type", "category", "description",
+    "created_at", "updated_at",
+)
+
+async def archive_transactions(db: AsyncSession, before: datetime, after_id: int, batch_size: int) -> Tuple[int, int]:
+    """Move up to batch_size transactions created before `before` with ids above after_id to the archive.
+
+    Rows are found in id order, so successive calls with the returned last
+    id read the hot table once. The copy and the delete commit together, and
+    the daily rollup is left alone: it already counts the rows wherever they
+    live. Returns (rows moved, last id moved).
+    """
+    transaction = models.Transaction
+    ids = (await db.execute(
+        select(transaction.id).where(
+            transaction.id > after_id,
+            transaction.created_at < before
+        ).order_by(transaction.id).limit(batch_size)
+    )).scalars().all()
+    if not ids:
+        return 0, after_id
+
+    hot = models.Transaction.__table__
+    await db.execute(
+        insert(models.ArchivedTransaction.__table__).from_select(
+            list(ARCHIVE_COLUMNS), select(*(hot.c[name] for name in ARCHIVE_COLUMNS)).where(hot.c.id.in_(ids))
+        )
+    )
+    await db.execute(delete(hot).where(hot.c.id.in_(ids)))
+    await db.commit()
+    return len(ids), ids[-1]
+
+async def count_transactions(db: AsyncSession) -> Tuple[int, int]:
+    """(hot, archived) row counts"""
+    hot = (await db.execute(select(func.count()).select_from(models.Transaction))).scalar_one()
+    archived = (await db.execute(select(func.count()).select_from(models.ArchivedTransaction))).scalar_one()
+    return hot, archived
+
+BUDGET_PERIODS = ("week", "month")
+BUDGET_ALERT_THRESHOLDS = (80, 100)  # percent of the limit
+
+def budget_period_start(period: str, day: date) -> date:
+    """First day of the week (Monday) or month containing day"""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def budget_period_end(period: str, day: date) -> date:
+    """First day of the period after the one containing day"""
+    start = budget_period_start(period, day)
+    if period == "week":
+        return start + timedelta(days=7)
+    return (start + timedelta(days=31)).replace(day=1)
+
+def budget_alert_level(spent_minor: int, limit_minor: int) -> int:
+    """Highest alert threshold reached, 0 below the first"""
+    level = 0
+    for threshold in BUDGET_ALERT_THRESHOLDS:
+        if spent_minor * 100 >= limit_minor * threshold:
+            level = threshold
+    return level
+
+def _budget_status(budget: models.Budget, today: Optional[date] = None) -> schemas.BudgetStatus:
+    # Rollover is lazy: a budget untouched since an earlier period has spent nothing in this one
+    current = budget_period_start(budget.period, today or date.today())
+    spent = budget.spent_minor if budget.period_start == current else 0
+    return schemas.BudgetStatus(
+        category=budget.category,
+        period=budget.period,
+        currency=budget.currency,
+        limit=from_minor(budget.limit_minor, budget.currency),
+        spent=from_minor(spent, budget.currency),
+        period_start=current,
+    )
+
+async def _apply_budget_totals(db: AsyncSession, transactions: Iterable, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) expenses from their budgets' running totals.
+
+    Costs one primary key lookup per budgeted category, whatever the length
+    of the history. A budget whose period has ended is reset by the first
+    expense of a later period up to the current one; expenses from earlier
+    periods, and future-dated ones past the current period, are ignored.
+    """
+    expenses = [t for t in transactions if t.transaction_type == "expense" and t.category]
+    if not expenses:
+        return
+    budget = models.Budget
+    keys = {(t.user_id, t.category) for t in expenses}
+    result = await db.execute(
+        select(budget).where(tuple_(budget.user_id, budget.category).in_(keys))
+        .execution_options(populate_existing=True)
+    )
+    budgets = {(b.user_id, b.category): b for b in result.scalars()}
+    if not budgets:
+        return
+
+    today = date.today()
+    deltas = {}
+    rolled_over = set()
+    for t in expenses:
+        row = budgets.get((t.user_id, t.category))
+        if row is None or t.currency != row.currency:
+            continue
+        key = (row.user_id, row.category)
+        start = budget_period_start(row.period, t.created_at.date())
+        if start > budget_period_start(row.period, today):
+            # Rolling over to a future period would stop this period's expenses counting
+            continue
+        if sign > 0 and start > row.period_start:
+            row.period_start = start
+            row.alerted = 0
+            rolled_over.add(key)
+            deltas[key] = 0
+        if start == row.period_start:
+            deltas[key] = deltas.get(key, 0) + sign * t.amount_minor
+
+    for key, delta in deltas.items():
+        row = budgets[key]
+        if key in rolled_over:
+            row.spent_minor = delta
+            continue
+        if delta < 0:
+            row.alerted = min(row.alerted, budget_alert_level(row.spent_minor + delta, row.limit_minor))
+        # Incremented in SQL, so concurrent writers never lose each other's amounts
+        row.spent_minor = budget.spent_minor + delta
+
+async def set_budget(
+    db: AsyncSession,
+    user_id: int,
+    category: str,
+    limit: Decimal,
+    period: str = "month",
+    currency: str = DEFAULT_CURRENCY
+) -> schemas.BudgetStatus:
+    """Create or replace a budget, counting what was already spent this period"""
+    if period not in BUDGET_PERIODS:
+        raise ValueError("period must be week or month")
+    limit_minor = to_minor(limit, currency)
+    if limit_minor <= 0:
+        raise ValueError("budget must be greater than 0")
+    start = budget_period_start(period, date.today())
+    end = budget_period_end(period, date.today())
+    transaction = models.Transaction
+    spent = (await db.execute(
+        select(func.coalesce(func.sum(transaction.amount_minor), 0)).where(
+            transaction.user_id == user_id,
+            transaction.category == category,
+            transaction.currency == currency,
+            transaction.transaction_type == "expense",
+            transaction.created_at >= datetime.combine(start, time.min),
+            # Future-dated expenses are left out, as _apply_budget_totals leaves them out
+            transaction.created_at < datetime.combine(end, time.min),
+        )
+    )).scalar_one()
+
+    row = await db.get(models.Budget, (user_id, category))
+    if row is None:
+        row = models.Budget(user_id=user_id, category=category)
+        db.add(row)
+    row.period = period
+    row.currency = currency
+    row.limit_minor = limit_minor
+    row.period_start = start
+    row.spent_minor = int(spent)
+    # Only crossings after this point are announced
+    row.alerted = budget_alert_level(row.spent_minor, limit_minor)
+    await db.commit()
+    return _budget_status(row)
+
+async def delete_budget(db: AsyncSession, user_id: int, category: str) -> bool:
+    """Remove a budget; False if there was none"""
+    result = await db.execute(
+        delete(models.Budget).where(models.Budget.user_id == user_id, models.Budget.category == category)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+async def get_budgets(db: AsyncSession, user_id: int) -> List[schemas.BudgetStatus]:
+    """A user's budgets with their spending in the current period"""
+    result = await db.execute(
+        select(models.Budget).where(models.Budget.user_id == user_id).order_by(models.Budget.category)
+    )
+    return [_budget_status(row) for row in result.scalars()]
+
+async def check_budget_alert(
+    db: AsyncSession, user_id: int, category: str
+) -> Optional[Tuple[schemas.BudgetStatus, int]]:
+    """(budget, threshold) when the category's budget crossed a threshold not yet announced.
+
+    Reads the running total, so it is constant-time; the conditional update
+    makes sure each threshold is announced once per period even when
+    expenses arrive concurrently.
+    """
+    budget = models.Budget
+    row = (await db.execute(
+        select(budget).where(budget.user_id == user_id, budget.category == category)
+        .execution_options(populate_existing=True)
+    )).scalars().first()
+    if row is None or row.period_start != budget_period_start(row.period, date.today()):
+        return None
+    level = budget_alert_level(row.spent_minor, row.limit_minor)
+    if level <= row.alerted:
+        return None
+    result = await db.execute(
+        update(budget).where(
+            budget.user_id == user_id, budget.category == category, budget.alerted < level
+        ).values(alerted=level).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    if result.rowcount != 1:
+        return None
+    return _budget_status(row), level
+
+async def create_recurring_rule(
+    db: AsyncSession, transaction: schemas.TransactionCreate, schedule: Schedule, now: Optional[datetime] = None
+) -> models.RecurringRule:
+    """Save a recurring transaction; its first occurrence is the next one after now (UTC)"""
+    rule = models.RecurringRule(
+        user_id=transaction.user_id,
+        schedule=schedule.text,
+        amount_minor=transaction.amount_minor,
+        currency=transaction.currency,
+        transaction_type=transaction.transaction_type,
+        category=transaction.category,
+        description=transaction.description,
+        next_run=schedule.next_after(now or datetime.utcnow()),
+    )
+    db.add(rule)
+    await db.commit()
+    return rule
+
+async def get_recurring_rules(db: AsyncSession, user_id: int) -> List[schemas.RecurringRule]:
+    """A user's recurring transactions, soonest first"""
+    rule = models.RecurringRule
+    result = await db.execute(
+        select(rule).where(rule.user_id == user_id).order_by(rule.next_run, rule.id)
+    )
+    return [schemas.RecurringRule.model_validate(row) for row in result.scalars()]
+
+async def delete_recurring_rule(db: AsyncSession, rule_id: int, user_id: int) -> bool:
+    """Remove a recurring transaction; False if the user has none with that id"""
+    rule = models.RecurringRule
+    result = await db.execute(delete(rule).where(rule.id == rule_id, rule.user_id == user_id))
+    await db.commit()
+    return result.rowcount > 0
+
+async def get_recurring_due_times(db: AsyncSession) -> List[Tuple[datetime, int]]:
+    """(next_run, rule id) of every recurring transaction"""
+    rule = models.RecurringRule
+    result = await db.execute(select(rule.next_run, rule.id))
+    return [(next_run, rule_id) for next_run, rule_id in result.all()]
+
+async def enter_due_transactions(
+    db: AsyncSession, rule_ids: Iterable[int], now: datetime, max_catchup: int = 100
+) -> Tuple[int, Optional[List[Tuple[datetime, int]]]]:
+    """Enter the occurrences of rules that are due by now in one batch.
+
+    Missed occurrences are entered with their own date, at most
+    max_catchup per rule; the rest are left due for the next call. Each
+    rule's next_run moves forward in the same commit as its transactions,
+    and only if nobody else moved it first, so an occurrence is never
+    entered twice.
+
+    Returns the number of transactions entered and the (next_run, rule id)
+    of every rule that still exists; None instead of the times when another
+    process got to some of the rules first, in which case nothing is written.
+    """
+    rule = models.RecurringRule
+    rules = (await db.execute(
+        select(rule).where(rule.id.in_(set(rule_ids))).execution_options(populate_existing=True)
+    )).scalars().all()
+
+    transactions = []
+    due_times = []
+    moves = []
+    for row in rules:
+        if row.next_run > now:
+            due_times.append((row.next_run, row.id))
+            continue
+        schedule = load_schedule(row.schedule)
+        occurrences = [row.next_run] + schedule.occurrences(row.next_run, now, max_catchup - 1)
+        next_run = schedule.next_after(occurrences[-1])
+        moves.append({"rule_id": row.id, "due": row.next_run, "new_run": next_run})
+        amount = row.amount
+        transactions.extend(
+            schemas.TransactionCreate(
+                user_id=row.user_id,
+                amount=amount,
+                currency=row.currency,
+                transaction_type=row.transaction_type,
+                category=row.category,
+                description=row.description,
+                created_at=occurrence,
+            )
+            for occurrence in occurrences
+        )
+        due_times.append((next_run, row.id))
+
+    table = rule.__table__
+    move = table.update().where(
+        table.c.id == bindparam("rule_id"), table.c.next_run == bindparam("due")
+    ).values(next_run=bindparam("new_run"))
+    if moves and db.bind.dialect.supports_sane_multi_rowcount:
+        moved = (await db.execute(move, moves)).rowcount
+    else:
+        # Without reliable executemany row counts, one statement per rule
+        moved = 0
+        for params in moves:
+            moved += (await db.execute(move, params)).rowcount
+    if moved != len(moves):
+        # Entered elsewhere (the scheduler lease changed hands); start over with fresh rows
+        await db.rollback()
+        return 0, None
+
+    if transactions:
+        await _insert_rows(db, transactions)
+    await db.commit()
+    for user_id in {t.user_id for t in transactions}:
+        await user_cache.invalidate(user_id)
+    return len(transactions), due_times
+
+def lease_holder() -> str:
+    """Name that identifies this process as the holder of a lease"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+async def acquire_lease(db: AsyncSession, name: str, holder: str, ttl: float) -> bool:
+    """Take or renew a named lease for ttl seconds; False while another holder's lease is live"""
+    lease = models.SchedulerLease
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl)
+    result = await db.execute(
+        update(lease).where(
+            lease.name == name, (lease.holder == holder) | (lease.expires_at < now)
+        ).values(holder=holder, expires_at=expires_at).execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        await db.commit()
+        return True
+    db.add(models.SchedulerLease(name=name, holder=holder, expires_at=expires_at))
+    try:
+        await db.commit()
+        return True
+    except IntegrityError:
+        await db.rollback()
+        return False
+
+async def release_lease(db: AsyncSession, name: str, holder: str):
+    """Give up a lease so another process can take it over without waiting for it to expire"""
+    lease = models.SchedulerLease
+    await db.execute(delete(lease).where(lease.name == name, lease.holder == holder))
+    await db.commit()
+
+async def get_polling_offset(db: AsyncSession, bot_id: int) -> Optional[int]:
+    """Stored getUpdates offset for a bot, None before its first batch"""
+    row = await db.get(models.PollingOffset, bot_id)
+    return row.next_offset if row else None
+
+async def save_polling_offset(db: AsyncSession, bot_id: int, next_offset: int):
+    """Remember that updates before next_offset have been processed"""
+    row = await db.get(models.PollingOffset, bot_id)
+    if row is None:
+        db.add(models.PollingOffset(bot_id=bot_id, next_offset=next_offset))
+    else:
+        row.next_offset = next_offset
+    await db.commit()
+
+async def claim_update(db: AsyncSession, update_id: int) -> bool:
+    """Record an update as processed; False if it was already recorded"""
+    db.add(models.ProcessedUpdate(update_id=update_id))
+    try:
+        await db.commit()
+        return True
+    except IntegrityError:
+        await db.rollback()
+        return False
+
+async def release_update(db: AsyncSession, update_id: int):
+    """Forget a processed update so a redelivery is accepted again"""
+    await db.execute(
+        delete(models.ProcessedUpdate).where(models.ProcessedUpdate.update_id == update_id)
+    )
+    await db.commit()
+
+async def prune_processed_updates(db: AsyncSession, before: datetime) -> int:
+    """Delete processed update records received before a cutoff"""
+    result = await db.execute(
+        delete(models.ProcessedUpdate).where(models.ProcessedUpdate.received_at < before)
+    )
+    await db.commit()
+    return result.rowcount
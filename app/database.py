@@ -1,17 +1,126 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from typing import AsyncIterator, List
 from config import Config
+from .metrics import instrument_engine
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    Config.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in Config.DATABASE_URL else {}
-)
+
+def get_async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto the matching async driver"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+
+def is_sqlite_file(url: str) -> bool:
+    """True for an on-disk SQLite database (in-memory ones keep SQLAlchemy's single-connection pools)"""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def sqlite_pragmas() -> List[str]:
+    """PRAGMA statements run on every new SQLite connection.
+
+    WAL lets readers continue while a writer commits, and synchronous=NORMAL
+    only syncs at checkpoints, which is still durable against application
+    crashes in WAL mode. busy_timeout makes a writer wait for the lock
+    instead of failing with "database is locked".
+    """
+    pragmas = []
+    if Config.SQLITE_JOURNAL_MODE:
+        pragmas.append(f"PRAGMA journal_mode={Config.SQLITE_JOURNAL_MODE}")
+    if Config.SQLITE_SYNCHRONOUS:
+        pragmas.append(f"PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS}")
+    pragmas.append(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT}")
+    pragmas.append(f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}")
+    pragmas.append(f"PRAGMA cache_size={Config.SQLITE_CACHE_SIZE}")
+    return pragmas
+
+
+def apply_sqlite_pragmas(engine: Engine, pragmas: List[str]):
+    """Run pragmas on each connection the (sync) engine opens"""
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def pool_options(url: str, async_driver: bool = False) -> dict:
+    """Pool settings from Config for a database URL.
+
+    SQLite files get a queue pool so connections (and their pragmas and page
+    cache) are reused; aiosqlite would otherwise open one per session.
+    Server databases also get recycling and pre-ping, so connections dropped
+    by the server or a proxy are replaced before a request uses them.
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        if not is_sqlite_file(url):
+            return {}
+        options = {"pool_size": Config.DB_POOL_SIZE, "max_overflow": Config.DB_MAX_OVERFLOW}
+        if async_driver:
+            options["poolclass"] = AsyncAdaptedQueuePool
+        return options
+    return {
+        "pool_size": Config.DB_POOL_SIZE,
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "pool_timeout": Config.DB_POOL_TIMEOUT,
+        "pool_recycle": Config.DB_POOL_RECYCLE,
+        "pool_pre_ping": Config.DB_POOL_PRE_PING,
+    }
+
+
+def make_engine(url: str) -> Engine:
+    """Sync engine with the configured pool and SQLite pragmas"""
+    sqlite = make_url(url).get_backend_name() == "sqlite"
+    new_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False} if sqlite else {},
+        **pool_options(url),
+    )
+    if sqlite:
+        apply_sqlite_pragmas(new_engine, sqlite_pragmas())
+    return new_engine
+
+
+def make_async_engine(url: str):
+    """Async engine for a sync DATABASE_URL, with the configured pool and SQLite pragmas"""
+    async_url = get_async_database_url(url)
+    new_engine = create_async_engine(async_url, **pool_options(url, async_driver=True))
+    if make_url(url).get_backend_name() == "sqlite":
+        apply_sqlite_pragmas(new_engine.sync_engine, sqlite_pragmas())
+    return new_engine
+
+
+# Create SQLAlchemy engine (used for DDL and maintenance scripts)
+engine = make_engine(Config.DATABASE_URL)
+
+# Create async engine (used by the request handlers)
+async_engine = make_async_engine(Config.DATABASE_URL)
+
+# Query timing and pool counters for /metrics
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create AsyncSessionLocal class
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # Create Base class
 Base = declarative_base()
 
@@ -23,6 +132,12 @@ def get_db():
     finally:
         db.close()
 
-# Create all tables
+# Async dependency to get database session
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Create or migrate tables to the current schema version
 def create_tables():
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    from .migrations import run_migrations
+    return run_migrations(engine)
@@ -0,0 +1,136 @@
+import contextvars
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import crud
+
+logger = logging.getLogger(__name__)
+
+
+class WriteTracker:
+    """Whether the code run inside track_writes() committed a write"""
+
+    def __init__(self):
+        self.pending = False  # a write in the current transaction
+        self.committed = False
+
+
+_write_tracker: contextvars.ContextVar[Optional[WriteTracker]] = contextvars.ContextVar(
+    "write_tracker", default=None
+)
+
+
+@contextmanager
+def track_writes() -> Iterator[WriteTracker]:
+    """Note the writes committed inside the block on engines passed to watch_writes()"""
+    tracker = WriteTracker()
+    token = _write_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _write_tracker.reset(token)
+
+
+def watch_writes(engine: Engine):
+    """Report INSERT/UPDATE/DELETE statements that get committed to the active tracker"""
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        tracker = _write_tracker.get()
+        if tracker is not None and not statement.lstrip()[:6].upper().startswith("SELECT"):
+            tracker.pending = True
+
+    @event.listens_for(engine, "commit")
+    def commit(conn):
+        tracker = _write_tracker.get()
+        if tracker is not None and tracker.pending:
+            tracker.committed = True
+
+    @event.listens_for(engine, "rollback")
+    def rollback(conn):
+        tracker = _write_tracker.get()
+        if tracker is not None:
+            tracker.pending = False
+
+
+class UpdateDeduplicator:
+    """Rejects redelivered Telegram updates by update_id.
+
+    Recently seen ids live in a bounded LRU with a TTL so most duplicates are
+    answered from memory; the processed_updates table makes the decision
+    survive restarts. Telegram keeps undelivered updates for 24 hours, so
+    records older than the TTL are pruned.
+    """
+
+    def __init__(self, session_factory, maxsize: int = 10000, ttl: float = 86400, prune_every: int = 1000):
+        self.session_factory = session_factory
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._seen: "OrderedDict[int, float]" = OrderedDict()
+        self._claims_since_prune = 0
+        self.duplicates = 0
+
+    def _remember(self, update_id: int):
+        self._seen[update_id] = time.monotonic()
+        self._seen.move_to_end(update_id)
+        while len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+
+    def _seen_recently(self, update_id: int) -> bool:
+        seen_at = self._seen.get(update_id)
+        if seen_at is None:
+            return False
+        if time.monotonic() - seen_at > self.ttl:
+            del self._seen[update_id]
+            return False
+        return True
+
+    async def claim(self, update_id: int) -> bool:
+        """Mark an update as being processed; False if it is a duplicate"""
+        if self._seen_recently(update_id):
+            self.duplicates += 1
+            return False
+
+        async with self.session_factory() as db:
+            claimed = await crud.claim_update(db, update_id)
+        self._remember(update_id)
+        if not claimed:
+            self.duplicates += 1
+            return False
+
+        self._claims_since_prune += 1
+        if self._claims_since_prune >= self.prune_every:
+            await self.prune()
+        return True
+
+    async def release(self, update_id: int):
+        """Undo a claim after a failed attempt so Telegram's retry is processed.
+
+        Only for attempts that committed nothing (see track_writes): a retry
+        of one that did would enter its transactions again.
+        """
+        self._seen.pop(update_id, None)
+        try:
+            async with self.session_factory() as db:
+                await crud.release_update(db, update_id)
+        except Exception as e:
+            logger.error(f"Failed to release update {update_id}: {e}")
+
+    async def prune(self) -> int:
+        """Drop persisted records older than the TTL"""
+        self._claims_since_prune = 0
+        async with self.session_factory() as db:
+            removed = await crud.prune_processed_updates(db, datetime.utcnow() - timedelta(seconds=self.ttl))
+        if removed:
+            logger.info(f"Pruned {removed} processed update records")
+        return removed
+
+    def stats(self) -> dict:
+        return {"cached": len(self._seen), "duplicates": self.duplicates}
@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+from typing import AsyncIterator
+
+from . import crud
+from .database import AsyncSessionLocal
+from .money import from_minor, to_json
+
+EXPORT_COLUMNS = ["id", "created_at", "transaction_type", "amount", "currency", "category", "description"]
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+async def iter_csv(rows: AsyncIterator[tuple], rows_per_chunk: int = 500) -> AsyncIterator[str]:
+    """Render rows as CSV text, a header first, in chunks of rows_per_chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    pending = 0
+    async for row in rows:
+        writer.writerow([
+            row.id,
+            row.created_at.isoformat() if row.created_at else "",
+            row.transaction_type,
+            from_minor(row.amount_minor, row.currency),
+            row.currency,
+            row.category or "",
+            row.description or "",
+        ])
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+async def iter_ndjson(rows: AsyncIterator[tuple], rows_per_chunk: int = 500) -> AsyncIterator[str]:
+    """Render rows as newline-delimited JSON objects"""
+    lines = []
+    async for row in rows:
+        lines.append(json.dumps({
+            "id": row.id,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "transaction_type": row.transaction_type,
+            "amount": to_json(from_minor(row.amount_minor, row.currency)),
+            "currency": row.currency,
+            "category": row.category,
+            "description": row.description,
+        }, ensure_ascii=False))
+        if len(lines) >= rows_per_chunk:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def export_user_transactions(user_id: int, export_format: str = "csv") -> AsyncIterator[bytes]:
+    """Stream a user's full history in the given format as encoded chunks.
+
+    Opens its own session so it can outlive the request handler that
+    returned the streaming response.
+    """
+    render = iter_csv if export_format == "csv" else iter_ndjson
+    async with AsyncSessionLocal() as db:
+        async for chunk in render(crud.stream_transactions(db, user_id)):
+            yield chunk.encode("utf-8")
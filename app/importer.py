@@ -0,0 +1,251 @@
+import codecs
+import csv
+import time
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud, schemas
+from .money import DEFAULT_CURRENCY
+from config import Config
+
+# Accepted header names for each field; the export format imports as is
+IMPORT_COLUMNS = {
+    "amount": ("amount",),
+    "transaction_type": ("transaction_type", "type"),
+    "created_at": ("created_at", "date", "timestamp", "time"),
+    "category": ("category",),
+    "description": ("description", "note", "notes"),
+    "currency": ("currency",),
+}
+
+
+# Longest record accepted, in characters and in lines: an unclosed quote would otherwise
+# carry the rest of the file into one field
+MAX_RECORD_CHARS = 64 * 1024
+MAX_RECORD_LINES = 50
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_length: int = MAX_RECORD_CHARS) -> AsyncIterator[str]:
+    """Decode UTF-8 chunks (with or without a BOM) into lines as they arrive.
+
+    Lines keep their "\n" or "\r\n", as the csv module expects of a file
+    opened with newline="", so a line break inside a quoted field is
+    imported exactly. A line longer than max_length is yielded cut just
+    past it and the rest is skipped, so a file without newlines is never
+    held whole.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    overlong = False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if overlong:
+                # The tail of a line already yielded cut short
+                overlong = False
+                continue
+            yield line + "\n"
+        if overlong:
+            pending = ""
+        elif len(pending) > max_length:
+            yield pending[:max_length + 1]
+            pending = ""
+            overlong = True
+    pending += decoder.decode(b"", final=True)
+    if pending and not overlong:
+        yield pending[:max_length + 1]
+
+
+class _NeedMoreLines(Exception):
+    """The record continues past the lines read so far"""
+
+
+def _parse_record(lines: List[str]) -> List[str]:
+    """Fields of the record starting at lines[0]; raises _NeedMoreLines if it is not complete yet"""
+    def source():
+        yield from lines
+        raise _NeedMoreLines
+    return next(csv.reader(source()))
+
+
+async def iter_records(
+    lines: AsyncIterator[str],
+    max_chars: int = MAX_RECORD_CHARS,
+    max_lines: int = MAX_RECORD_LINES,
+) -> AsyncIterator[Tuple[int, List[str], Optional[str]]]:
+    """Yield (line_number, fields, error) for each CSV record, skipping blank lines.
+
+    The csv module decides where a record ends, so a quoted field may span
+    lines and a stray quote inside an unquoted field is an ordinary
+    character. A record the csv module rejects, or one longer than
+    max_chars characters or max_lines lines, comes with no fields and the
+    reason; reading resumes on the next line.
+    """
+    line_number = 0
+    start = 0
+    record = []
+    size = 0
+    async for line in lines:
+        line_number += 1
+        if not record:
+            start = line_number
+            size = 0
+            if not line.strip():
+                continue
+        record.append(line)
+        size += len(line)
+        if size > max_chars:
+            record = []
+            yield start, [], f"record longer than {max_chars} characters"
+            continue
+        try:
+            fields = _parse_record(record)
+        except _NeedMoreLines:
+            if len(record) >= max_lines:
+                record = []
+                yield start, [], f"quoted field not closed within {max_lines} lines"
+            continue
+        except csv.Error as e:
+            record = []
+            yield start, [], f"malformed CSV: {e}"
+            continue
+        record = []
+        yield start, fields, None
+    if record:
+        try:
+            yield start, next(csv.reader(record)), None
+        except csv.Error as e:
+            yield start, [], f"malformed CSV: {e}"
+
+
+def read_header(fields: List[str]) -> Dict[str, int]:
+    """Map each known field to its column index; raises ValueError without amount"""
+    names = [field.strip().lower() for field in fields]
+    columns = {}
+    for field, aliases in IMPORT_COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                columns[field] = names.index(alias)
+                break
+    if "amount" not in columns:
+        raise ValueError("The CSV header must include an amount column")
+    return columns
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ISO 8601 date or date-time; aware values are converted to naive UTC"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"invalid date: {value[:40]}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_row(user_id: int, columns: Dict[str, int], fields: List[str], now: datetime) -> schemas.TransactionCreate:
+    """Build a validated transaction from one CSV record.
+
+    Without a type column the sign of the amount decides: negative amounts
+    are expenses. Rows without a date are stamped with the import time.
+    Raises ValueError or ValidationError for a rejected row.
+    """
+    def get(field: str) -> Optional[str]:
+        index = columns.get(field)
+        if index is None or index >= len(fields):
+            return None
+        return fields[index].strip() or None
+
+    amount_text = get("amount")
+    if amount_text is None:
+        raise ValueError("missing amount")
+    try:
+        amount = Decimal(amount_text)
+    except InvalidOperation:
+        amount = None
+    if amount is None or not amount.is_finite():
+        raise ValueError(f"invalid amount: {amount_text[:40]}")
+
+    transaction_type = get("transaction_type")
+    if "transaction_type" in columns:
+        transaction_type = (transaction_type or "").lower()
+    else:
+        transaction_type = "expense" if amount < 0 else "income"
+        amount = abs(amount)
+
+    created_at = get("created_at")
+    return schemas.TransactionCreate(
+        user_id=user_id,
+        amount=amount,
+        transaction_type=transaction_type,
+        category=get("category"),
+        description=get("description"),
+        currency=get("currency") or DEFAULT_CURRENCY,
+        created_at=parse_timestamp(created_at) if created_at else now,
+    )
+
+
+async def import_csv(
+    db: AsyncSession,
+    user_id: int,
+    chunks: AsyncIterator[bytes],
+    batch_size: int = Config.IMPORT_BATCH_SIZE,
+    max_errors: int = Config.IMPORT_MAX_ERRORS,
+) -> schemas.ImportReport:
+    """Import a CSV byte stream for one user and report what happened.
+
+    Rows are parsed as the stream arrives and written in batches of
+    batch_size, each in its own transaction, so memory and lock time stay
+    bounded however large the file is. Batches already written stay
+    committed if a later one fails. Raises ValueError for a bad header.
+    """
+    started = time.perf_counter()
+    now = datetime.utcnow().replace(microsecond=0)
+    columns = None
+    batch = []
+    imported = 0
+    rejected = 0
+    errors = []
+
+    async for line_number, fields, error in iter_records(iter_lines(chunks)):
+        if columns is None:
+            if error:
+                raise ValueError(f"Invalid CSV header: {error}")
+            columns = read_header(fields)
+            continue
+        if error:
+            rejected += 1
+            if len(errors) < max_errors:
+                errors.append(schemas.RowError(line=line_number, reason=error))
+            continue
+        try:
+            batch.append(parse_row(user_id, columns, fields, now))
+        except ValidationError as e:
+            rejected += 1
+            if len(errors) < max_errors:
+                errors.append(schemas.RowError(line=line_number, reason=schemas.first_error_message(e)))
+        except ValueError as e:
+            rejected += 1
+            if len(errors) < max_errors:
+                errors.append(schemas.RowError(line=line_number, reason=str(e)))
+        if len(batch) >= batch_size:
+            imported += await crud.insert_transactions(db, batch)
+            batch = []
+
+    if columns is None:
+        raise ValueError("The CSV file is empty")
+    imported += await crud.insert_transactions(db, batch)
+
+    seconds = time.perf_counter() - started
+    return schemas.ImportReport(
+        imported=imported,
+        rejected=rejected,
+        errors=errors,
+        seconds=round(seconds, 3),
+        rows_per_second=round(imported / seconds, 1) if seconds > 0 else 0.0,
+    )
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# What to do with an update when its shard queue is full
+POLICY_REJECT = "reject"  # refuse it so the webhook can answer 503 and Telegram retries
+POLICY_DROP = "drop"      # acknowledge and discard it
+POLICY_WAIT = "wait"      # hold the webhook until there is room (bounded by put_timeout)
+
+
+class IngestionQueue:
+    """Bounded in-process queue that decouples webhook acknowledgement from processing.
+
+    Updates are sharded by user id across a fixed pool of workers, each draining
+    its own queue in FIFO order, so updates from one user are always applied in
+    the order they were received while different users are processed concurrently.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[None]],
+        workers: int = 4,
+        maxsize: int = 1000,
+        policy: str = POLICY_REJECT,
+        put_timeout: float = 5.0,
+        on_abandoned: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ):
+        if policy not in (POLICY_REJECT, POLICY_DROP, POLICY_WAIT):
+            raise ValueError(f"Unknown queue full policy: {policy}")
+        self.handler = handler
+        self.workers = workers
+        self.shard_size = max(1, maxsize // max(1, workers))
+        self.policy = policy
+        self.put_timeout = put_timeout
+        self.on_abandoned = on_abandoned
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._accepting = False
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.abandoned = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def depth(self) -> int:
+        """Number of updates waiting to be processed"""
+        return sum(queue.qsize() for queue in self._queues)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "depth": self.depth(),
+            "capacity": self.shard_size * self.workers,
+            "policy": self.policy,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "abandoned": self.abandoned,
+        }
+
+    def start(self):
+        """Spawn the worker tasks on the running event loop"""
+        if self._tasks:
+            return
+        self._queues = [asyncio.Queue(maxsize=self.shard_size) for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._worker(queue), name=f"ingestion-worker-{i}")
+            for i, queue in enumerate(self._queues)
+        ]
+        self._accepting = True
+        logger.info(f"Ingestion queue started with {self.workers} workers")
+
+    async def submit(self, user_id: Optional[int], item: Any) -> bool:
+        """Enqueue an item for the shard owning user_id; False if it was not accepted"""
+        if not self._accepting:
+            self.rejected += 1
+            return False
+
+        queue = self._queues[(user_id or 0) % self.workers]
+        try:
+            queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.policy == POLICY_WAIT:
+            try:
+                await asyncio.wait_for(queue.put(item), timeout=self.put_timeout)
+                return True
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                logger.warning("Ingestion queue full, timed out waiting for space")
+                return False
+
+        if self.policy == POLICY_DROP:
+            self.dropped += 1
+            logger.warning(f"Ingestion queue full, dropped update for user {user_id}")
+        else:
+            self.rejected += 1
+            logger.warning(f"Ingestion queue full, rejected update for user {user_id}")
+        return False
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            item = await queue.get()
+            try:
+                await self.handler(item)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error processing queued update: {e}")
+            finally:
+                queue.task_done()
+
+    async def drain(self, timeout: float = 10.0):
+        """Stop accepting updates, finish the queued ones and stop the workers.
+
+        Updates still queued after timeout are handed to on_abandoned; the
+        ones being processed are cancelled.
+        """
+        if not self._tasks:
+            return
+        self._accepting = False
+        logger.info(f"Draining ingestion queue ({self.depth()} pending)")
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        abandoned = [queue.get_nowait() for queue in self._queues for _ in range(queue.qsize())]
+        self._tasks = []
+        self._queues = []
+        if not abandoned:
+            return
+        self.abandoned += len(abandoned)
+        logger.error(f"Ingestion drain timed out; abandoning {len(abandoned)} queued updates")
+        if self.on_abandoned is not None:
+            for item in abandoned:
+                try:
+                    await self.on_abandoned(item)
+                except Exception as e:
+                    logger.error(f"Error handling abandoned update: {e}")
@@ -1,15 +1,33 @@
 import logging
-from fastapi import FastAPI, Request, Depends, HTTPException
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from telegram import Update, Bot
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from fastapi import FastAPI, Request, Depends, HTTPException, Header, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from telegram import Update, Bot, InputFile
+from pydantic import ValidationError
 import asyncio
-import re
-from typing import Dict, Any
-from types import SimpleNamespace
+import secrets
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import tempfile
+import time
+from typing import Optional
 
-from .database import get_db, create_tables
+from .database import AsyncSessionLocal, async_engine, create_tables, get_async_db
+from .ingestion import IngestionQueue, POLICY_DROP
+from .dedup import UpdateDeduplicator, track_writes, watch_writes
+from .cache import user_cache
+from .parser import LineError, parse_transaction, parse_transactions
+from .export import EXPORT_FORMATS, export_user_transactions
+from .importer import import_csv
+from .recurring import RecurringScheduler
+from .archive import ArchiveJob
+from .admission import REJECT_GLOBAL, AdmissionController
+from .schedules import SCHEDULE_USAGE, parse_schedule
+from .money import DEFAULT_CURRENCY
+from .router import ArgumentError, CommandRouter, choice_argument, int_argument
+from .metrics import PARSE_FAILURES, UPDATE_DURATION, UPDATE_ERRORS, WEBHOOK_DURATION, WEBHOOK_REJECTED
+from . import metrics
+from .outbound import DispatchingRequest, OutboundDispatcher, RateLimiter, capture_webhook_reply, defer_messages
 from . import crud, schemas
 from config import Config
 
@@ -23,8 +41,57 @@ logger = logging.getLogger(__name__)
 # Create FastAPI app
 app = FastAPI(title="Money Management Bot", version="1.0.0")
 
+# Outbound messages are rate limited to Telegram's flood limits and retried
+outbound = OutboundDispatcher(
+    RateLimiter(
+        global_rate=Config.BOT_RATE_GLOBAL,
+        chat_rate=Config.BOT_RATE_CHAT,
+        group_rate=Config.BOT_RATE_GROUP,
+        chat_burst=Config.BOT_CHAT_BURST,
+    ),
+    max_retries=Config.BOT_MAX_RETRIES,
+)
+
 # Initialize bot
-bot = Bot(token=Config.TELEGRAM_BOT_TOKEN)
+bot = Bot(
+    Config.TELEGRAM_BOT_TOKEN,
+    base_url=Config.BOT_API_URL,
+    request=DispatchingRequest(outbound, connection_pool_size=Config.BOT_POOL_SIZE),
+    # getUpdates long polls on its own connection, as PTB's default
+    get_updates_request=DispatchingRequest(outbound, connection_pool_size=1),
+)
+
+# Rows listed in a batch reply; keeps it well under Telegram's 4096 character limit
+BATCH_REPLY_ROWS = 40
+
+# Largest file the Bot API lets a bot download
+MAX_DOCUMENT_SIZE = 20 * 1024 * 1024
+
+# Bot commands by name; handlers below register themselves with @router.command
+router = CommandRouter(Config.BOT_USERNAME)
+
+# Context passed to handlers: command args (raw and parsed) and the update's database session
+class DummyContext:
+    def __init__(self, db: AsyncSession, args=None, params=None):
+        self.args = args or []
+        self.params = params
+        self.db = db
+
+# Strong references to fire-and-forget tasks; the event loop only keeps weak ones
+background_tasks = set()
+
+def run_in_background(coroutine) -> asyncio.Task:
+    """Run a coroutine without waiting for it, logging its failure"""
+    task = asyncio.create_task(coroutine)
+    background_tasks.add(task)
+    
+    def done(task: asyncio.Task):
+        background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background task failed: {task.exception()}")
+    
+    task.add_done_callback(done)
+    return task
 
 # Admin notification function
 async def send_admin_notification(message: str):
@@ -34,24 +101,40 @@ async def send_admin_notification(message: str):
     except Exception as e:
         logger.error(f"Failed to send admin notification: {e}")
 
-# Create tables on startup
+# Check the schema on startup; anything not needed to serve the first update runs in the background
 @app.on_event("startup")
 async def startup_event():
     try:
         logger.info("Starting up Money Management Bot...")
         logger.info(f"TELEGRAM_BOT_TOKEN: {Config.TELEGRAM_BOT_TOKEN[:8]}... (hidden) ")
         logger.info(f"DATABASE_URL: {Config.DATABASE_URL}")
-        create_tables()
-        logger.info("Database tables created")
+        version = create_tables()
+        logger.info(f"Database schema at version {version}")
+        if Config.INGEST_WORKERS > 0:
+            ingestion_queue.start()
+        if Config.RECURRING_ENABLED:
+            recurring_scheduler.start()
+        if Config.ARCHIVE_INTERVAL > 0:
+            archive_job.start()
+        run_in_background(update_dedup.prune())
         # Send startup notification to admin
         startup_message = "🚀 Money Management Bot is now online and ready to track your finances!"
-        await send_admin_notification(startup_message)
+        run_in_background(send_admin_notification(startup_message))
     except Exception as e:
         logger.error(f"Startup failed: {e}")
         raise
 
+# Finish queued updates and send their replies before the process exits
+@app.on_event("shutdown")
+async def shutdown_event():
+    await recurring_scheduler.stop()
+    await archive_job.stop()
+    await ingestion_queue.drain(timeout=Config.INGEST_DRAIN_TIMEOUT)
+    await outbound.drain(timeout=Config.INGEST_DRAIN_TIMEOUT)
+
 # Command handlers
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@router.command("start")
+async def start_command(update: Update, context: DummyContext):
     """Handle /start command"""
     welcome_message = """
 💰 Welcome to your Personal Money Management Bot!
@@ -68,24 +151,53 @@ Here are the available commands:
 • /summary 7 - Last 7 days summary
 • /summary 90 - Last 90 days summary
 
+📈 Trends and statistics:
+• /stats - Last 90 days: monthly totals, daily average, top category
+• /stats 365 - The last year
+
 📋 View recent transactions:
 • /transactions - Last 10 transactions
 • /transactions 5 - Last 5 transactions
+• /transactions 5 next <cursor> - Older transactions (cursor is shown under each page)
+
+🔍 Search your transactions:
+• /search coffee - Transactions with coffee in the category or description
+• /search rent 90 - Only the last 90 days
 
 🗑️ Delete transaction:
 • /delete <transaction_id>
 
+🎯 Budgets:
+• /budget food 300 - Monthly budget for food, with alerts at 80% and 100%
+• /budget coffee 25 week - Weekly budget
+• /budget - See how much of each budget is left
+
+🔁 Recurring transactions:
+• /recurring add monthly 1 -1200 rent - Entered on the 1st of every month
+• /recurring add weekly fri +500 salary - Every Friday
+• /recurring - List them, /recurring remove <id> to stop one
+
+📤 Export your history:
+• /export - CSV file
+• /export json - NDJSON file
+
+📥 Import from a spreadsheet:
+• Send a .csv file with a header row: date, amount, type, category, description
+
 💡 Examples:
 • +1000 salary
 • -25 coffee
 • -150 groceries food shopping
 • +5000 bonus year end bonus
 
+📦 Several transactions at once: one per line in a single message
+
 Start tracking your money now! 💸
     """
     await update.message.reply_text(welcome_message)
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@router.command("help")
+async def help_command(update: Update, context: DummyContext):
     """Handle /help command"""
     help_message = """
 🤖 Money Management Bot Help
@@ -94,13 +206,20 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • Use + for income: +100 salary
 • Use - for expenses: -50 food
 • Add description: +2000 bonus work bonus
+• Add many at once: one transaction per line
 
 📊 Commands:
 • /start - Welcome message
 • /help - This help message
 • /summary [days] - Financial summary
-• /transactions [count] - Recent transactions
-• /delete <id> - Delete transaction
+• /stats [days] - Monthly trends and spending statistics
+• /transactions [count] [next <cursor>] - Transaction history (also /history)
+• /search <words> [days] - Find transactions by category or description (also /find)
+• /delete <id> - Delete transaction (also /del)
+• /budget [category amount [week|month]] - Set or view budgets (/budget <category> off removes one)
+• /recurring [add <schedule> <+/-amount> <category> | remove <id>] - Recurring transactions (daily, weekly, monthly or cron, in UTC)
+• /export [csv|json] - Download your full history
+• Send a .csv file - Import transactions (columns: date, amount, type, category, description)
 
 💡 Tips:
 • Categories help organize expenses
@@ -109,119 +228,399 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     await update.message.reply_text(help_message)
 
-async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@router.command("summary", args=int_argument(
+    default=30,
+    minimum=1,
+    maximum=365,
+    invalid="Please provide a valid number of days.",
+    out_of_range="Please specify days between 1 and 365.",
+))
+async def summary_command(update: Update, context: DummyContext):
     """Handle /summary command"""
     user_id = update.effective_user.id
-    days = 30  # default
+    days = context.params
     
-    if context.args:
-        try:
-            days = int(context.args[0])
-            if days <= 0 or days > 365:
-                await update.message.reply_text("Please specify days between 1 and 365.")
-                return
-        except ValueError:
-            await update.message.reply_text("Please provide a valid number of days.")
-            return
+    db = context.db
+    report = await crud.get_summary_report(db, user_id, days)
+    summary = report.summary
+    category_summary = report.expenses_by_category
     
-    # Get database session
-    db = next(get_db())
-    try:
-        summary = crud.get_user_summary(db, user_id, days)
-        category_summary = crud.get_category_summary(db, user_id, days)
-        
-        message = f"""
+    message = f"""
 📊 Financial Summary (Last {days} days)
 
 💰 Income: ${summary.total_income:.2f}
 💸 Expenses: ${summary.total_expenses:.2f}
 💵 Balance: ${summary.balance:.2f}
 📈 Total Transactions: {summary.transaction_count}
-        """
-        
-        if category_summary:
-            message += "\n📋 Expenses by Category:\n"
-            for category, amount in sorted(category_summary.items(), key=lambda x: x[1], reverse=True):
-                message += f"• {category}: ${amount:.2f}\n"
-        
-        await update.message.reply_text(message)
-    finally:
-        db.close()
+    """
+    
+    if category_summary:
+        message += "\n📋 Expenses by Category:\n"
+        for category, amount in sorted(category_summary.items(), key=lambda x: x[1], reverse=True):
+            message += f"• {category}: ${amount:.2f}\n"
+    
+    await update.message.reply_text(message)
 
-async def transactions_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /transactions command"""
+@router.command("stats", args=int_argument(
+    default=90,
+    minimum=1,
+    maximum=365,
+    invalid="Please provide a valid number of days.",
+    out_of_range="Please specify days between 1 and 365.",
+))
+async def stats_command(update: Update, context: DummyContext):
+    """Handle /stats command"""
     user_id = update.effective_user.id
-    limit = 10  # default
+    days = context.params
     
-    if context.args:
-        try:
-            limit = int(context.args[0])
-            if limit <= 0 or limit > 50:
-                await update.message.reply_text("Please specify limit between 1 and 50.")
-                return
-        except ValueError:
-            await update.message.reply_text("Please provide a valid number.")
-            return
+    from .analytics import get_stats  # NumPy is only imported once statistics are asked for
+    stats = await get_stats(context.db, user_id, days)
+    if not stats.transaction_count:
+        await update.message.reply_text(f"No transactions in the last {days} days.")
+        return
+    
+    message = f"📈 Statistics (Last {days} days)\n\n"
+    message += f"💸 Spent: ${stats.total_expenses:.2f} (${stats.average_daily_expenses:.2f}/day)\n"
+    message += f"💰 Earned: ${stats.total_income:.2f}\n"
+    if stats.top_category:
+        message += f"🏷️ Top category: {stats.top_category} ({stats.top_category_share:.0%} of spending)\n"
+    if stats.expense_percentiles:
+        percentiles = stats.expense_percentiles
+        message += (f"📊 Typical expense: ${percentiles['p50']:.2f}, 90% under ${percentiles['p90']:.2f}, "
+                    f"largest ${stats.largest_expense:.2f}\n")
+    if stats.month_over_month is not None:
+        message += f"📆 Spending this month vs last: {stats.month_over_month:+.0%}\n"
     
-    # Get database session
-    db = next(get_db())
+    message += "\n🗓️ Monthly:\n"
+    for month in stats.monthly:
+        message += f"• {month.month}: +${month.income:.2f} / -${month.expenses:.2f}\n"
+    
+    await update.message.reply_text(message)
+
+def transactions_args(args):
+    """(limit, cursor) from /transactions [limit] [next <cursor>]"""
+    cursor = None
+    if len(args) >= 2 and args[-2] == "next":
+        cursor = args[-1]
+        args = args[:-2]
+    limit = int_argument(
+        default=10,
+        minimum=1,
+        maximum=50,
+        out_of_range="Please specify limit between 1 and 50.",
+    )(args)
+    return limit, cursor
+
+@router.command("transactions", "history", args=transactions_args)
+async def transactions_command(update: Update, context: DummyContext):
+    """Handle /transactions command"""
+    user_id = update.effective_user.id
+    limit, cursor = context.params
+    
+    db = context.db
     try:
-        transactions = crud.get_transactions_by_user(db, user_id, limit)
-        
-        if not transactions:
-            await update.message.reply_text("No transactions found.")
-            return
-        
+        page = await crud.get_transactions_page(db, user_id, limit, cursor)
+    except ValueError:
+        await update.message.reply_text("❌ Invalid page cursor. Use /transactions to start over.")
+        return
+    
+    if not page.items:
+        await update.message.reply_text("No transactions found." if cursor is None else "No more transactions.")
+        return
+    
+    if cursor is None:
         message = f"📋 Recent Transactions (Last {limit}):\n\n"
-        for t in transactions:
-            emoji = "💰" if t.transaction_type == "income" else "💸"
-            date_str = t.created_at.strftime("%Y-%m-%d %H:%M")
-            message += f"{emoji} ${t.amount:.2f} - {t.category or 'No category'}\n"
-            if t.description:
-                message += f"   📝 {t.description}\n"
-            message += f"   📅 {date_str} (ID: {t.id})\n\n"
-        
-        await update.message.reply_text(message)
-    finally:
-        db.close()
+    else:
+        message = f"📋 Older Transactions ({len(page.items)}):\n\n"
+    for t in page.items:
+        emoji = "💰" if t.transaction_type == "income" else "💸"
+        date_str = t.created_at.strftime("%Y-%m-%d %H:%M")
+        message += f"{emoji} ${t.amount:.2f} - {t.category or 'No category'}\n"
+        if t.description:
+            message += f"   📝 {t.description}\n"
+        message += f"   📅 {date_str} (ID: {t.id})\n\n"
+    
+    if page.next_cursor:
+        message += f"➡️ More: /transactions {limit} next {page.next_cursor}"
+    
+    await update.message.reply_text(message)
 
-async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /delete command"""
+SEARCH_USAGE = (
+    "Usage: /search <words> [days]\n"
+    "e.g. /search coffee, /search rent 90"
+)
+
+def search_args(args):
+    """(terms, days, page) from /search <words> [days] [page <n>]"""
+    page = 1
+    if len(args) >= 2 and args[-2] == "page":
+        page = int_argument(
+            minimum=1,
+            maximum=100,
+            invalid="Please provide a valid page number.",
+            out_of_range="Please specify a page between 1 and 100.",
+        )(args[-1:])
+        args = args[:-2]
+    days = None
+    if len(args) >= 2 and args[-1].isdigit():
+        days = int_argument(
+            minimum=1,
+            maximum=3650,
+            out_of_range="Please specify days between 1 and 3650.",
+        )(args[-1:])
+        args = args[:-1]
+    terms = crud.search_terms(" ".join(args))
+    if not terms:
+        raise ArgumentError(SEARCH_USAGE)
+    return terms, days, page
+
+@router.command("search", "find", args=search_args)
+async def search_command(update: Update, context: DummyContext):
+    """Handle /search command"""
     user_id = update.effective_user.id
+    terms, days, page = context.params
     
-    if not context.args:
-        await update.message.reply_text("Please provide a transaction ID to delete.\nUsage: /delete <transaction_id>")
+    db = context.db
+    result = await crud.search_transactions(db, user_id, terms, days, page)
+    
+    query = " ".join(terms)
+    window = f" in the last {days} days" if days else ""
+    if not result.items:
+        await update.message.reply_text(
+            f"No transactions matching \"{query}\"{window}." if page == 1 else "No more matches."
+        )
         return
     
+    message = f"🔍 Matches for \"{query}\"{window}" + (f" (page {page})" if page > 1 else "") + ":\n\n"
+    for t in result.items:
+        emoji = "💰" if t.transaction_type == "income" else "💸"
+        date_str = t.created_at.strftime("%Y-%m-%d %H:%M")
+        message += f"{emoji} ${t.amount:.2f} - {t.category or 'No category'}\n"
+        if t.description:
+            message += f"   📝 {t.description}\n"
+        message += f"   📅 {date_str} (ID: {t.id})\n\n"
+    
+    if result.next_page:
+        message += f"➡️ More: /search {query}{f' {days}' if days else ''} page {result.next_page}"
+    
+    await update.message.reply_text(message)
+
+@router.command("delete", "del", args=int_argument(
+    missing="Please provide a transaction ID to delete.\nUsage: /delete <transaction_id>",
+    invalid="Please provide a valid transaction ID.",
+))
+async def delete_command(update: Update, context: DummyContext):
+    """Handle /delete command"""
+    user_id = update.effective_user.id
+    transaction_id = context.params
+    
+    db = context.db
+    success = await crud.delete_transaction(db, transaction_id, user_id)
+    if success:
+        await update.message.reply_text(f"✅ Transaction {transaction_id} deleted successfully.")
+    else:
+        await update.message.reply_text("❌ Transaction not found or you don't have permission to delete it.")
+
+BUDGET_USAGE = (
+    "Usage:\n"
+    "• /budget - Your budgets\n"
+    "• /budget <category> <amount> [week|month] - Set a budget\n"
+    "• /budget <category> off - Remove it"
+)
+
+BUDGET_PERIOD_NAMES = {"week": "week", "weekly": "week", "month": "month", "monthly": "month"}
+
+def budget_args(args):
+    """None to list, (category, None, None) to remove, (category, limit, period) to set"""
+    if not args:
+        return None
+    if len(args) > 3 or len(args) < 2:
+        raise ArgumentError(BUDGET_USAGE)
+    category = args[0]
+    if len(category) > schemas.MAX_CATEGORY_LENGTH:
+        raise ArgumentError(f"Category longer than {schemas.MAX_CATEGORY_LENGTH} characters.")
+    if args[1].lower() in ("off", "remove", "delete"):
+        if len(args) != 2:
+            raise ArgumentError(BUDGET_USAGE)
+        return category, None, None
     try:
-        transaction_id = int(context.args[0])
-    except ValueError:
-        await update.message.reply_text("Please provide a valid transaction ID.")
+        limit = Decimal(args[1].lstrip("$").replace(",", ""))
+    except InvalidOperation:
+        raise ArgumentError("Please provide a valid amount, e.g. /budget food 300")
+    if not limit.is_finite() or limit <= 0:
+        raise ArgumentError("The budget must be greater than 0.")
+    period = BUDGET_PERIOD_NAMES.get(args[2].lower() if len(args) == 3 else "month")
+    if period is None:
+        raise ArgumentError("The period must be week or month.")
+    return category, limit, period
+
+def budget_line(budget: schemas.BudgetStatus) -> str:
+    return (f"• {budget.category}: ${budget.spent:.2f} of ${budget.limit:.2f} this {budget.period} "
+            f"({budget.used:.0%})")
+
+def budget_alert_text(budget: schemas.BudgetStatus, threshold: int) -> str:
+    if threshold >= 100:
+        return (f"🚨 Over budget: {budget.category} is at ${budget.spent:.2f} "
+                f"of ${budget.limit:.2f} this {budget.period}.")
+    return (f"⚠️ {budget.category} is at {budget.used:.0%} of its budget "
+            f"(${budget.spent:.2f} of ${budget.limit:.2f} this {budget.period}).")
+
+@router.command("budget", "budgets", args=budget_args)
+async def budget_command(update: Update, context: DummyContext):
+    """Handle /budget command"""
+    user_id = update.effective_user.id
+    db = context.db
+    
+    if context.params is None:
+        budgets = await crud.get_budgets(db, user_id)
+        if not budgets:
+            await update.message.reply_text("No budgets yet.\n\n" + BUDGET_USAGE)
+            return
+        message = "🎯 Budgets:\n\n" + "\n".join(budget_line(budget) for budget in budgets)
+        await update.message.reply_text(message)
         return
     
-    # Get database session
-    db = next(get_db())
+    category, limit, period = context.params
+    if limit is None:
+        if await crud.delete_budget(db, user_id, category):
+            await update.message.reply_text(f"✅ Budget for {category} removed.")
+        else:
+            await update.message.reply_text(f"❌ There is no budget for {category}.")
+        return
+    
+    try:
+        budget = await crud.set_budget(db, user_id, category, limit, period)
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}")
+        return
+    await update.message.reply_text(
+        f"🎯 Budget set: {category}, ${budget.limit:.2f} per {period}\n"
+        f"{budget_line(budget)}\n"
+        f"You'll be alerted at 80% and 100%."
+    )
+
+RECURRING_USAGE = (
+    "Usage:\n"
+    "• /recurring - Your recurring transactions\n"
+    "• /recurring add <schedule> <+/-amount> <category> [description]\n"
+    "• /recurring remove <id>\n\n"
+    f"Schedules (UTC): {SCHEDULE_USAGE}"
+)
+
+def recurring_args(args):
+    """None to list, ("remove", id) or ("add", schedule, parsed transaction)"""
+    if not args or (len(args) == 1 and args[0].lower() == "list"):
+        return None
+    action = args[0].lower()
+    if action in ("remove", "delete", "del"):
+        if len(args) != 2 or not args[1].isdigit():
+            raise ArgumentError("Please provide the ID to remove.\nUsage: /recurring remove <id>")
+        return "remove", int(args[1])
+    if action != "add":
+        raise ArgumentError(RECURRING_USAGE)
     try:
-        success = crud.delete_transaction(db, transaction_id, user_id)
-        if success:
-            await update.message.reply_text(f"✅ Transaction {transaction_id} deleted successfully.")
+        schedule, rest = parse_schedule(args[1:], datetime.utcnow().date())
+    except ValueError as e:
+        raise ArgumentError(str(e))
+    parsed = parse_transaction(" ".join(rest))
+    if parsed is None:
+        raise ArgumentError(
+            "Please add the transaction after the schedule, e.g. /recurring add monthly 1 -1200 rent"
+        )
+    return "add", schedule, parsed
+
+def recurring_line(rule: schemas.RecurringRule) -> str:
+    sign = "+" if rule.transaction_type == "income" else "-"
+    return (f"• #{rule.id} {sign}${rule.amount:.2f} {rule.category}, {rule.schedule} "
+            f"(next {rule.next_run:%Y-%m-%d %H:%M})")
+
+@router.command("recurring", args=recurring_args)
+async def recurring_command(update: Update, context: DummyContext):
+    """Handle /recurring command"""
+    user_id = update.effective_user.id
+    db = context.db
+    
+    if context.params is None:
+        rules = await crud.get_recurring_rules(db, user_id)
+        if not rules:
+            await update.message.reply_text("No recurring transactions yet.\n\n" + RECURRING_USAGE)
+            return
+        message = "🔁 Recurring transactions (times in UTC):\n\n" + "\n".join(recurring_line(rule) for rule in rules)
+        await update.message.reply_text(message)
+        return
+    
+    if context.params[0] == "remove":
+        rule_id = context.params[1]
+        if await crud.delete_recurring_rule(db, rule_id, user_id):
+            await update.message.reply_text(f"✅ Recurring transaction {rule_id} removed.")
         else:
-            await update.message.reply_text("❌ Transaction not found or you don't have permission to delete it.")
-    finally:
-        db.close()
+            await update.message.reply_text("❌ Recurring transaction not found or you don't have permission to remove it.")
+        return
+    
+    _, schedule, parsed = context.params
+    try:
+        transaction_data = schemas.TransactionCreate(
+            user_id=user_id,
+            amount=parsed.amount,
+            transaction_type=parsed.transaction_type,
+            category=parsed.category,
+            description=parsed.description
+        )
+    except ValidationError as e:
+        await update.message.reply_text(f"❌ {schemas.first_error_message(e)}")
+        return
+    rule = await crud.create_recurring_rule(db, transaction_data, schedule)
+    recurring_scheduler.schedule(rule.id, rule.next_run)
+    await update.message.reply_text(
+        f"🔁 Recurring transaction added ({schedule.text})\n"
+        f"{recurring_line(schemas.RecurringRule.model_validate(rule))}\n"
+        f"Remove it with /recurring remove {rule.id}"
+    )
 
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@router.command("export", args=choice_argument(
+    {"csv": "csv", "json": "ndjson", "ndjson": "ndjson"},
+    default="csv",
+    invalid="Please choose a format: /export csv or /export json",
+))
+async def export_command(update: Update, context: DummyContext):
+    """Handle /export command"""
+    user_id = update.effective_user.id
+    export_format = context.params
+    
+    if not await crud.get_transactions_by_user(context.db, user_id, 1):
+        await update.message.reply_text("No transactions found.")
+        return
+    
+    # Spooled to disk past 1 MB while rows stream in. The upload itself is
+    # read into memory by the Bot API client (Telegram caps it at 50 MB);
+    # the HTTP export endpoint streams without that limit.
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as document:
+        async for chunk in export_user_transactions(user_id, export_format):
+            document.write(chunk)
+        document.seek(0)
+        _, extension = EXPORT_FORMATS[export_format]
+        await update.message.reply_document(
+            document=InputFile(document.read(), filename=f"transactions_{user_id}.{extension}"),
+            caption="📤 Your transaction history"
+        )
+
+async def handle_message(update: Update, context: DummyContext):
     """Handle regular messages for adding transactions"""
     user_id = update.effective_user.id
     text = update.message.text.strip()
     logger.info(f"Received message from user {user_id}: {text}")
     
+    # Several lines are entered together as one batch
+    if len([line for line in text.splitlines() if line.strip()]) > 1:
+        await handle_batch_message(update, context, text)
+        return
+    
     # Parse transaction from message
     # Format: +100 salary or -50 food or +2000 bonus work bonus
-    pattern = r'^([+-])(\d+(?:\.\d{1,2})?)\s+(\w+)(?:\s+(.+))?$'
-    match = re.match(pattern, text)
+    parsed = parse_transaction(text)
     
-    if not match:
+    if not parsed:
+        PARSE_FAILURES.labels("message").inc()
         await update.message.reply_text(
             "❌ Invalid format. Use:\n"
             "• +100 salary (income)\n"
@@ -230,12 +629,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    sign, amount_str, category, description = match.groups()
-    amount = float(amount_str)
-    transaction_type = "income" if sign == "+" else "expense"
+    amount, transaction_type, category, description = parsed
     
-    # Create transaction
-    db = next(get_db())
     try:
         transaction_data = schemas.TransactionCreate(
             user_id=user_id,
@@ -244,66 +639,394 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             category=category,
             description=description
         )
-        
-        transaction = crud.create_transaction(db, transaction_data)
-        
-        emoji = "💰" if transaction_type == "income" else "💸"
-        message = f"{emoji} Transaction added successfully!\n\n"
-        message += f"Amount: ${amount:.2f}\n"
-        message += f"Type: {transaction_type.title()}\n"
-        message += f"Category: {category}\n"
-        if description:
-            message += f"Description: {description}\n"
-        message += f"ID: {transaction.id}"
-        
-        await update.message.reply_text(message)
+    except ValidationError as e:
+        PARSE_FAILURES.labels("message").inc()
+        await update.message.reply_text(f"❌ {schemas.first_error_message(e)}")
+        return
+    
+    # Create transaction
+    db = context.db
+    try:
+        transaction = await crud.create_transaction(db, transaction_data)
     except Exception as e:
         logger.error(f"Error creating transaction: {e}")
         await update.message.reply_text("❌ Error creating transaction. Please try again.")
+        return
+    
+    emoji = "💰" if transaction_type == "income" else "💸"
+    message = f"{emoji} Transaction added successfully!\n\n"
+    message += f"Amount: ${amount:.2f}\n"
+    message += f"Type: {transaction_type.title()}\n"
+    message += f"Category: {category}\n"
+    if description:
+        message += f"Description: {description}\n"
+    message += f"ID: {transaction.id}"
+    if transaction_type == "expense":
+        alert = await crud.check_budget_alert(db, user_id, category)
+        if alert:
+            message += "\n\n" + budget_alert_text(*alert)
+    
+    await update.message.reply_text(message)
+
+async def handle_batch_message(update: Update, context: DummyContext, text: str):
+    """Add one transaction per line and answer with a single summary"""
+    user_id = update.effective_user.id
+    parsed, errors = parse_transactions(text)
+    
+    if len(parsed) + len(errors) > Config.MAX_BATCH_LINES:
+        await update.message.reply_text(f"❌ Too many lines. Send at most {Config.MAX_BATCH_LINES} transactions per message.")
+        return
+    
+    # Validated line by line, so one bad amount only skips its own line
+    transactions_data = []
+    for entry in parsed:
+        p = entry.transaction
+        try:
+            transactions_data.append(schemas.TransactionCreate(
+                user_id=user_id,
+                amount=p.amount,
+                transaction_type=p.transaction_type,
+                category=p.category,
+                description=p.description
+            ))
+        except ValidationError as e:
+            errors.append(LineError(entry.line_number, entry.line, schemas.first_error_message(e)))
+    errors.sort(key=lambda error: error.line_number)
+    if errors:
+        PARSE_FAILURES.labels("batch").inc(len(errors))
+    
+    transactions = []
+    if transactions_data:
+        try:
+            transactions = await crud.create_transactions(context.db, transactions_data)
+        except Exception as e:
+            logger.error(f"Error creating transactions: {e}")
+            await update.message.reply_text("❌ Error creating transactions. Please try again.")
+            return
+    
+    total_income = sum(t.amount for t in transactions if t.transaction_type == "income")
+    total_expenses = sum(t.amount for t in transactions if t.transaction_type == "expense")
+    message = f"✅ Added {len(transactions)} transactions\n"
+    message += f"💰 Income: ${total_income:.2f}\n"
+    message += f"💸 Expenses: ${total_expenses:.2f}\n"
+    if transactions:
+        message += "\n"
+        for t in transactions[:BATCH_REPLY_ROWS]:
+            sign = "+" if t.transaction_type == "income" else "-"
+            message += f"{sign}${t.amount:.2f} {t.category} (ID: {t.id})\n"
+        if len(transactions) > BATCH_REPLY_ROWS:
+            message += f"…and {len(transactions) - BATCH_REPLY_ROWS} more\n"
+    for category in dict.fromkeys(t.category for t in transactions if t.transaction_type == "expense"):
+        alert = await crud.check_budget_alert(context.db, user_id, category)
+        if alert:
+            message += "\n" + budget_alert_text(*alert) + "\n"
+    if errors:
+        message += f"\n❌ {len(errors)} lines skipped:\n"
+        for error in errors[:BATCH_REPLY_ROWS]:
+            message += f"Line {error.line_number}: {error.reason} ({error.line[:40]})\n"
+        if len(errors) > BATCH_REPLY_ROWS:
+            message += f"…and {len(errors) - BATCH_REPLY_ROWS} more\n"
+    
+    await update.message.reply_text(message)
+
+async def handle_document(update: Update, context: DummyContext):
+    """Import transactions from an uploaded CSV file"""
+    user_id = update.effective_user.id
+    document = update.message.document
+    
+    if not (document.file_name or "").lower().endswith(".csv") and document.mime_type != "text/csv":
+        await update.message.reply_text("❌ Please send a .csv file to import transactions.")
+        return
+    if document.file_size and document.file_size > MAX_DOCUMENT_SIZE:
+        await update.message.reply_text("❌ File too large. Telegram lets bots download files up to 20 MB.")
+        return
+    
+    telegram_file = await document.get_file()
+    data = await telegram_file.download_as_bytearray()
+    
+    async def chunks():
+        view = memoryview(data)
+        for start in range(0, len(view), 64 * 1024):
+            yield bytes(view[start:start + 64 * 1024])
+    
+    try:
+        report = await import_csv(context.db, user_id, chunks())
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}")
+        return
+    except Exception as e:
+        logger.error(f"Error importing transactions: {e}")
+        await update.message.reply_text("❌ Error importing transactions. Please try again.")
+        return
+    
+    if report.rejected:
+        PARSE_FAILURES.labels("import").inc(report.rejected)
+    
+    message = f"📥 Imported {report.imported} transactions"
+    message += f" in {report.seconds:.1f}s ({report.rows_per_second:.0f} rows/s)\n"
+    if report.rejected:
+        message += f"\n❌ {report.rejected} rows skipped:\n"
+        for error in report.errors:
+            message += f"Line {error.line}: {error.reason}\n"
+        if report.rejected > len(report.errors):
+            message += f"…and {report.rejected - len(report.errors)} more\n"
+    
+    await update.message.reply_text(message)
+
+async def route_update(update: Update):
+    """Route a single update to its handler"""
+    if update.message and update.message.document:
+        async with AsyncSessionLocal() as db:
+            await handle_document(update, DummyContext(db))
+        return
+
+    if not (update.message and update.message.text):
+        return
+
+    async with AsyncSessionLocal() as db:
+        text = update.message.text
+        if text.startswith('/'):
+            await router.dispatch(update, DummyContext(db), text)
+        else:
+            await handle_message(update, DummyContext(db))
+
+def update_command(update: Update) -> str:
+    """Metrics label for the kind of update: command name, entry, batch, import or other"""
+    message = update.message
+    if message is None:
+        return "other"
+    if message.document:
+        return "import"
+    text = message.text
+    if not text:
+        return "other"
+    if text.startswith('/'):
+        return router.command_name(text)
+    return "batch" if "\n" in text.strip() else "entry"
+
+async def process_update(update: Update):
+    """Route an update, releasing its dedup claim if processing fails before anything is committed"""
+    command = update_command(update)
+    started = time.perf_counter()
+    try:
+        with track_writes() as writes:
+            await route_update(update)
+    except Exception:
+        UPDATE_ERRORS.labels(command).inc()
+        await release_uncommitted(update, writes.committed, "failed")
+        raise
+    except asyncio.CancelledError:
+        # Interrupted by shutdown
+        await release_uncommitted(update, writes.committed, "was cancelled")
+        raise
     finally:
-        db.close()
+        UPDATE_DURATION.labels(command).observe(time.perf_counter() - started)
+
+async def release_uncommitted(update: Update, committed: bool, outcome: str):
+    """Let a redelivery of an unfinished update be processed, unless it already committed something"""
+    if committed:
+        # Its transactions are in: a redelivery must not enter them again
+        logger.error(f"Update {update.update_id} {outcome} after committing; not processing it again")
+    else:
+        await update_dedup.release(update.update_id)
+
+async def process_queued_update(update: Update):
+    """Process an update on an ingestion worker, leaving its replies to the outbound queue"""
+    with defer_messages():
+        await process_update(update)
+
+async def abandon_update(update: Update):
+    """Record an update acknowledged to Telegram but never processed, and release its dedup claim"""
+    logger.error(f"Update {update.update_id} was acknowledged but not processed before shutdown")
+    await update_dedup.release(update.update_id)
+
+# Redelivered updates are recognised by update_id and skipped; failed ones are retried
+# only if they committed nothing
+watch_writes(async_engine.sync_engine)
+update_dedup = UpdateDeduplicator(
+    AsyncSessionLocal,
+    maxsize=Config.DEDUP_CACHE_SIZE,
+    ttl=Config.DEDUP_TTL,
+)
+
+# Enters recurring transactions as they fall due; one worker at a time holds the lease
+recurring_scheduler = RecurringScheduler(
+    AsyncSessionLocal,
+    lease_ttl=Config.RECURRING_LEASE_TTL,
+    refresh_interval=Config.RECURRING_REFRESH_INTERVAL,
+    batch_size=Config.RECURRING_BATCH_SIZE,
+    max_catchup=Config.RECURRING_MAX_CATCHUP,
+)
+
+# Moves transactions past ARCHIVE_AFTER_DAYS out of the hot table; one worker at a time holds the lease
+archive_job = ArchiveJob(
+    AsyncSessionLocal,
+    days=Config.ARCHIVE_AFTER_DAYS,
+    interval=Config.ARCHIVE_INTERVAL,
+    batch_size=Config.ARCHIVE_BATCH_SIZE,
+    lease_ttl=Config.RECURRING_LEASE_TTL,
+)
+
+# Updates are acknowledged immediately and processed by background workers
+ingestion_queue = IngestionQueue(
+    process_queued_update,
+    workers=Config.INGEST_WORKERS,
+    maxsize=Config.INGEST_QUEUE_SIZE,
+    policy=Config.INGEST_FULL_POLICY,
+    on_abandoned=abandon_update,
+)
+
+# Per-user and global rate limits checked before an update touches the database
+admission = AdmissionController(
+    user_rate=Config.ADMISSION_USER_RATE,
+    user_burst=Config.ADMISSION_USER_BURST,
+    global_rate=Config.ADMISSION_GLOBAL_RATE,
+    global_burst=Config.ADMISSION_GLOBAL_BURST,
+    max_users=Config.ADMISSION_MAX_USERS,
+)
 
 # Webhook endpoint for Telegram
 @app.post("/telegram")
 async def telegram_webhook(request: Request):
+    started = time.perf_counter()
+    response = await handle_webhook(request)
+    WEBHOOK_DURATION.labels(str(response.status_code)).observe(time.perf_counter() - started)
+    return response
+
+async def handle_webhook(request: Request) -> JSONResponse:
+    # Telegram sends the secret_token given to setWebhook; without it the body is not even read
+    if Config.WEBHOOK_SECRET and not secrets.compare_digest(
+        request.headers.get("x-telegram-bot-api-secret-token", "").encode(), Config.WEBHOOK_SECRET.encode()
+    ):
+        WEBHOOK_REJECTED.labels("secret_token").inc()
+        return JSONResponse(content={"status": "unauthorized"}, status_code=401)
     try:
         update_data = await request.json()
         update = Update.de_json(update_data, bot)
+        if update is None:
+            return JSONResponse(content={"status": "error"}, status_code=400)
 
-        # Dummy context with args
-        class DummyContext:
-            def __init__(self, args=None):
-                self.args = args or []
-
-        if update.message:
-            if update.message.text:
-                text = update.message.text
-                if text.startswith('/'):
-                    split_text = text.split()
-                    command = split_text[0]
-                    args = split_text[1:]
-                    context = DummyContext(args)
-                    if command == '/start':
-                        await start_command(update, context)
-                    elif command == '/help':
-                        await help_command(update, context)
-                    elif command == '/summary':
-                        await summary_command(update, context)
-                    elif command == '/transactions':
-                        await transactions_command(update, context)
-                    elif command == '/delete':
-                        await delete_command(update, context)
-                    else:
-                        await update.message.reply_text("Unknown command. Use /help for available commands.")
-                else:
-                    context = DummyContext()
-                    await handle_message(update, context)
-
-        return JSONResponse(content={"status": "ok"})
+        user = update.effective_user
+        rejected = admission.admit(user.id if user else None)
+        if rejected:
+            WEBHOOK_REJECTED.labels(rejected).inc()
+            if rejected == REJECT_GLOBAL:
+                # Telegram backs off and redelivers it later
+                return JSONResponse(content={"status": "busy"}, status_code=503)
+            # A flooding user's updates are dropped without a reply
+            return JSONResponse(content={"status": "throttled"})
+
+        if not await update_dedup.claim(update.update_id):
+            return JSONResponse(content={"status": "duplicate"})
+
+        if not ingestion_queue.running:
+            if not Config.WEBHOOK_REPLY:
+                await process_update(update)
+                return JSONResponse(content={"status": "ok"})
+            with capture_webhook_reply() as reply:
+                await process_update(update)
+            return JSONResponse(content=reply.body() or {"status": "ok"})
+
+        if await ingestion_queue.submit(user.id if user else None, update):
+            return JSONResponse(content={"status": "ok"})
+        if ingestion_queue.policy == POLICY_DROP:
+            return JSONResponse(content={"status": "dropped"})
+        await update_dedup.release(update.update_id)
+        # Non-2xx makes Telegram back off and redeliver later
+        return JSONResponse(content={"status": "busy"}, status_code=503)
     except Exception as e:
         logger.error(f"Error handling webhook: {e}")
         return JSONResponse(content={"status": "error"}, status_code=500)
 
+# Authentication for the HTTP API (disabled until API_TOKEN is set)
+async def verify_api_token(x_api_key: Optional[str] = Header(None)):
+    if not Config.API_TOKEN:
+        raise HTTPException(status_code=503, detail="HTTP API is disabled")
+    if not x_api_key or not secrets.compare_digest(x_api_key, Config.API_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+# Transaction history, newest first, paged with the next_cursor of the previous page
+@app.get(
+    "/users/{user_id}/transactions",
+    response_model=schemas.TransactionPage,
+    dependencies=[Depends(verify_api_token)],
+)
+async def list_transactions(
+    user_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        return await crud.get_transactions_page(db, user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Transactions whose category or description contain every word of q, category matches first
+@app.get(
+    "/users/{user_id}/search",
+    response_model=schemas.SearchPage,
+    dependencies=[Depends(verify_api_token)],
+)
+async def search_user_transactions(
+    user_id: int,
+    q: str = Query(..., min_length=1, max_length=200),
+    days: Optional[int] = Query(None, ge=1, le=3650),
+    page: int = Query(1, ge=1, le=100),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+):
+    terms = crud.search_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="The query has no words to search for")
+    return await crud.search_transactions(db, user_id, terms, days, page, limit)
+
+# Trends and spending statistics over the last `days` days, in one currency
+@app.get(
+    "/users/{user_id}/stats",
+    response_model=schemas.StatsReport,
+    dependencies=[Depends(verify_api_token)],
+)
+async def user_stats(
+    user_id: int,
+    days: int = Query(90, ge=1, le=365),
+    currency: str = Query(DEFAULT_CURRENCY, pattern="^[A-Za-z]{3}$"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    from .analytics import get_stats
+    return await get_stats(db, user_id, days, currency.upper())
+
+# Full transaction history as a CSV or NDJSON stream
+@app.get("/users/{user_id}/export", dependencies=[Depends(verify_api_token)])
+async def export_transactions(user_id: int, format: str = Query("csv", pattern="^(csv|ndjson)$")):
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        export_user_transactions(user_id, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions_{user_id}.{extension}"'},
+    )
+
+# Bulk import: the request body is a CSV file with a header row
+@app.post(
+    "/users/{user_id}/import",
+    response_model=schemas.ImportReport,
+    dependencies=[Depends(verify_api_token)],
+)
+async def import_transactions(user_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    try:
+        return await import_csv(db, user_id, request.stream())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Prometheus scrape endpoint (needs "Authorization: Bearer <METRICS_TOKEN>" when that is set)
+@app.get("/metrics")
+async def metrics_endpoint(authorization: Optional[str] = Header(None)):
+    if Config.METRICS_TOKEN and not (
+        authorization and secrets.compare_digest(authorization, f"Bearer {Config.METRICS_TOKEN}")
+    ):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 # Health check endpoint
 @app.get("/")
 async def root():
@@ -312,7 +1035,17 @@ async def root():
 # Health check for Render
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "money-management-bot"}
+    return {
+        "status": "healthy",
+        "service": "money-management-bot",
+        "queue": ingestion_queue.stats(),
+        "dedup": update_dedup.stats(),
+        "cache": user_cache.stats(),
+        "outbound": outbound.stats(),
+        "recurring": recurring_scheduler.stats(),
+        "archive": archive_job.stats(),
+        "admission": admission.stats(),
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,179 @@
+"""
+Prometheus instrumentation rendered by GET /metrics.
+
+Metrics are prometheus_client objects in a registry of their own. Children
+are created once per label set and reused, so recording a value is a dict
+lookup and an add under the value's lock. Values that already live
+elsewhere in the app (archive row counts, pool occupancy) are read by a
+collector at scrape time rather than copied on every change.
+"""
+
+import time
+from typing import Dict, Tuple
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    ProcessCollector,
+    disable_created_metrics,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette appends the charset
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# The *_created series would double the output without telling a dashboard anything
+disable_created_metrics()
+REGISTRY = CollectorRegistry()
+# process_resident_memory_bytes, process_cpu_seconds_total, process_start_time_seconds, ... (Linux)
+ProcessCollector(registry=REGISTRY)
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text format"""
+    return generate_latest(REGISTRY).decode()
+
+
+# Updates and webhook requests
+UPDATE_DURATION = Histogram(
+    "moneybot_update_duration_seconds", "Time to process an update, by command", ["command"],
+    buckets=DEFAULT_BUCKETS, registry=REGISTRY,
+)
+UPDATE_ERRORS = Counter(
+    "moneybot_update_errors_total", "Updates whose processing raised, by command", ["command"], registry=REGISTRY,
+)
+WEBHOOK_DURATION = Histogram(
+    "moneybot_webhook_duration_seconds", "Webhook request handling time, by HTTP status", ["status"],
+    buckets=DEFAULT_BUCKETS, registry=REGISTRY,
+)
+PARSE_FAILURES = Counter(
+    "moneybot_parse_failures_total", "Transaction lines that could not be parsed or validated", ["source"],
+    registry=REGISTRY,
+)
+WEBHOOK_REJECTED = Counter(
+    "moneybot_webhook_rejected_total",
+    "Webhook requests dropped before processing, by reason (secret_token, user_rate, global_rate)", ["reason"],
+    registry=REGISTRY,
+)
+
+# Database
+QUERY_DURATION = Histogram(
+    "moneybot_db_query_duration_seconds", "SQL statement execution time, by statement type",
+    ["statement"], buckets=QUERY_BUCKETS, registry=REGISTRY,
+)
+POOL_CHECKOUTS = Counter(
+    "moneybot_db_pool_checkouts_total", "Connections checked out of the pool", ["engine"], registry=REGISTRY,
+)
+POOL_CONNECTS = Counter(
+    "moneybot_db_pool_connects_total", "New database connections opened", ["engine"], registry=REGISTRY,
+)
+POOL_CONNECT_DURATION = Histogram(
+    "moneybot_db_connect_seconds", "Time to open a new database connection for the pool",
+    ["engine"], buckets=QUERY_BUCKETS, registry=REGISTRY,
+)
+
+# Outbound Bot API calls
+BOT_API_DURATION = Histogram(
+    "moneybot_bot_api_duration_seconds", "Bot API request time, by method", ["method"],
+    buckets=DEFAULT_BUCKETS, registry=REGISTRY,
+)
+BOT_API_ERRORS = Counter(
+    "moneybot_bot_api_errors_total", "Failed Bot API requests, by method and error", ["method", "error"],
+    registry=REGISTRY,
+)
+
+# Hot/cold tiering (app/archive.py)
+ARCHIVED_TRANSACTIONS = Counter(
+    "moneybot_archived_transactions_total", "Transactions moved to the archive table", registry=REGISTRY,
+)
+ARCHIVE_DURATION = Histogram(
+    "moneybot_archive_run_seconds", "Time to move everything past the horizon to the archive",
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0), registry=REGISTRY,
+)
+# {(table, "before" | "after"): rows} of the last archive run
+ARCHIVE_ROWS: Dict[Tuple[str, str], int] = {}
+
+# Pools of the instrumented engines, by engine label
+_POOLS = {}
+
+
+class _ScrapeTimeCollector:
+    """Gauges read from the app's own state when /metrics is scraped"""
+
+    def collect(self):
+        rows = GaugeMetricFamily(
+            "moneybot_transactions_rows", "Rows in the hot and archive tables before and after the last archive run",
+            labels=["table", "when"],
+        )
+        for (table, when), count in ARCHIVE_ROWS.items():
+            rows.add_metric([table, when], count)
+        yield rows
+
+        checked_out = GaugeMetricFamily(
+            "moneybot_db_pool_checked_out", "Connections currently checked out, by engine", labels=["engine"],
+        )
+        overflow = GaugeMetricFamily(
+            "moneybot_db_pool_overflow",
+            "Connections open beyond the pool size (negative while the pool is not full), by engine",
+            labels=["engine"],
+        )
+        for name, pool in _POOLS.items():
+            if hasattr(pool, "checkedout"):
+                checked_out.add_metric([name], pool.checkedout())
+            if hasattr(pool, "overflow"):
+                overflow.add_metric([name], pool.overflow())
+        yield checked_out
+        yield overflow
+
+
+REGISTRY.register(_ScrapeTimeCollector())
+
+_STATEMENT_TYPES = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+def _statement_type(statement: str) -> str:
+    verb = statement.lstrip()[:6].upper()
+    return verb if verb in _STATEMENT_TYPES else "OTHER"
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Time every statement and count pool activity on a (sync) engine.
+
+    Only public engine, dialect and pool events are used. The pool has no
+    event before a checkout starts, so time spent waiting for a busy pool
+    shows up as moneybot_db_pool_checked_out and moneybot_db_pool_overflow
+    staying at their limits rather than as a duration.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            QUERY_DURATION.labels(_statement_type(statement)).observe(time.perf_counter() - started)
+
+    checkouts = POOL_CHECKOUTS.labels(name)
+    connects = POOL_CONNECTS.labels(name)
+    connect_duration = POOL_CONNECT_DURATION.labels(name)
+    event.listen(engine, "checkout", lambda *args: checkouts.inc())
+
+    @event.listens_for(engine, "do_connect")
+    def before_connect(dialect, connection_record, cargs, cparams):
+        connection_record.info["metrics_connect_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "connect")
+    def after_connect(dbapi_connection, connection_record):
+        connects.inc()
+        started = connection_record.info.pop("metrics_connect_started", None)
+        if started is not None:
+            connect_duration.observe(time.perf_counter() - started)
+
+    _POOLS[name] = engine.pool
@@ -0,0 +1,351 @@
+import logging
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+
+from . import models
+from .rollups import rebuild_daily_totals_in
+from .database import Base
+from .money import DEFAULT_CURRENCY, minor_digits
+
+logger = logging.getLogger(__name__)
+
+# Version of the schema created by the original create_all() deployments
+BASELINE_VERSION = 1
+
+
+def _add_processed_updates(conn: Connection):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS processed_updates ("
+        "update_id BIGINT NOT NULL PRIMARY KEY, "
+        "received_at TIMESTAMP NOT NULL)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_processed_updates_received_at "
+        "ON processed_updates (received_at)"
+    ))
+
+
+def _add_transaction_indexes(conn: Connection):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_user_created "
+        "ON transactions (user_id, created_at)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_user_type_created "
+        "ON transactions (user_id, transaction_type, created_at, category, amount)"
+    ))
+    # Every lookup by user_id is served by the composite indexes above
+    conn.execute(text("DROP INDEX IF EXISTS ix_transactions_user_id"))
+
+
+def _add_daily_totals(conn: Connection):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS daily_user_category_totals ("
+        "user_id INTEGER NOT NULL, "
+        "day DATE NOT NULL, "
+        "transaction_type VARCHAR(10) NOT NULL, "
+        "category VARCHAR(50) NOT NULL, "
+        "total FLOAT NOT NULL, "
+        "count INTEGER NOT NULL, "
+        "PRIMARY KEY (user_id, day, transaction_type, category))"
+    ))
+    # Filled by the integer amounts migration (6), which recreates the table
+
+
+def _add_id_to_user_created_index(conn: Connection):
+    # (created_at, id) keyset pagination seeks on all three columns
+    conn.execute(text("DROP INDEX IF EXISTS ix_transactions_user_created"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_user_created_id "
+        "ON transactions (user_id, created_at, id)"
+    ))
+
+
+def _add_integer_amounts(conn: Connection):
+    # Existing amounts are floats in DEFAULT_CURRENCY; round them to whole minor units
+    conn.execute(text("ALTER TABLE transactions ADD COLUMN amount_minor BIGINT NOT NULL DEFAULT 0"))
+    conn.execute(text(
+        f"ALTER TABLE transactions ADD COLUMN currency VARCHAR(3) NOT NULL DEFAULT '{DEFAULT_CURRENCY}'"
+    ))
+    conn.execute(
+        text("UPDATE transactions SET amount_minor = CAST(ROUND(amount * :scale) AS BIGINT)"),
+        {"scale": 10 ** minor_digits(DEFAULT_CURRENCY)}
+    )
+    if conn.dialect.name == "postgresql":
+        # SQLite cannot drop a column default; new rows always set both columns
+        conn.execute(text("ALTER TABLE transactions ALTER COLUMN amount_minor DROP DEFAULT"))
+        conn.execute(text("ALTER TABLE transactions ALTER COLUMN currency DROP DEFAULT"))
+
+    conn.execute(text("DROP INDEX IF EXISTS ix_transactions_user_type_created"))
+    conn.execute(text("ALTER TABLE transactions DROP COLUMN amount"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_user_type_created "
+        "ON transactions (user_id, transaction_type, created_at, category, currency, amount_minor)"
+    ))
+
+    conn.execute(text("DROP TABLE IF EXISTS daily_user_category_totals"))
+    conn.execute(text(
+        "CREATE TABLE daily_user_category_totals ("
+        "user_id INTEGER NOT NULL, "
+        "day DATE NOT NULL, "
+        "transaction_type VARCHAR(10) NOT NULL, "
+        "category VARCHAR(50) NOT NULL, "
+        "currency VARCHAR(3) NOT NULL, "
+        "total BIGINT NOT NULL, "
+        "count INTEGER NOT NULL, "
+        "PRIMARY KEY (user_id, day, transaction_type, category, currency))"
+    ))
+    rebuild_daily_totals_in(conn, archived=False)
+
+
+def _add_budgets(conn: Connection):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS budgets ("
+        "user_id INTEGER NOT NULL, "
+        "category VARCHAR(50) NOT NULL, "
+        "period VARCHAR(5) NOT NULL, "
+        "currency VARCHAR(3) NOT NULL, "
+        "limit_minor BIGINT NOT NULL, "
+        "period_start DATE NOT NULL, "
+        "spent_minor BIGINT NOT NULL, "
+        "alerted INTEGER NOT NULL, "
+        "PRIMARY KEY (user_id, category))"
+    ))
+
+
+def _add_recurring_rules(conn: Connection):
+    postgres = conn.dialect.name == "postgresql"
+    id_column = "id SERIAL PRIMARY KEY" if postgres else "id INTEGER NOT NULL PRIMARY KEY"
+    timestamp = "TIMESTAMP WITH TIME ZONE" if postgres else "DATETIME"
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS recurring_rules ("
+        f"{id_column}, "
+        "user_id INTEGER NOT NULL, "
+        "schedule VARCHAR(64) NOT NULL, "
+        "amount_minor BIGINT NOT NULL, "
+        "currency VARCHAR(3) NOT NULL, "
+        "transaction_type VARCHAR(10) NOT NULL, "
+        "category VARCHAR(50), "
+        "description TEXT, "
+        "next_run TIMESTAMP NOT NULL, "
+        f"created_at {timestamp} DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_recurring_rules_user_id ON recurring_rules (user_id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_recurring_rules_next_run ON recurring_rules (next_run)"
+    ))
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS scheduler_leases ("
+        "name VARCHAR(50) NOT NULL PRIMARY KEY, "
+        "holder VARCHAR(100) NOT NULL, "
+        "expires_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def _add_polling_offsets(conn: Connection):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS polling_offsets ("
+        "bot_id BIGINT NOT NULL PRIMARY KEY, "
+        "next_offset BIGINT NOT NULL)"
+    ))
+
+
+def _add_transactions_archive(conn: Connection):
+    timestamp = "TIMESTAMP WITH TIME ZONE" if conn.dialect.name == "postgresql" else "DATETIME"
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS transactions_archive ("
+        "id INTEGER NOT NULL PRIMARY KEY, "
+        "user_id INTEGER NOT NULL, "
+        "amount_minor BIGINT NOT NULL, "
+        "currency VARCHAR(3) NOT NULL, "
+        "transaction_type VARCHAR(10) NOT NULL, "
+        "category VARCHAR(50), "
+        "description TEXT, "
+        f"created_at {timestamp} NOT NULL, "
+        f"updated_at {timestamp})"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_archive_user_created_id "
+        "ON transactions_archive (user_id, created_at, id)"
+    ))
+
+
+def _add_transaction_id_autoincrement(conn: Connection):
+    # SQLite hands out max(id) + 1, which can be the id of an archived row;
+    # AUTOINCREMENT never reuses one. PostgreSQL sequences never do anyway.
+    if conn.dialect.name != "sqlite":
+        return
+    for index in ("ix_transactions_id", "ix_transactions_user_created_id", "ix_transactions_user_type_created"):
+        conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+    conn.execute(text("ALTER TABLE transactions RENAME TO transactions_old"))
+    conn.execute(text(
+        "CREATE TABLE transactions ("
+        "id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, "
+        "user_id INTEGER NOT NULL, "
+        "amount_minor BIGINT NOT NULL, "
+        "currency VARCHAR(3) NOT NULL, "
+        "transaction_type VARCHAR(10) NOT NULL, "
+        "category VARCHAR(50), "
+        "description TEXT, "
+        "created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), "
+        "updated_at DATETIME)"
+    ))
+    conn.execute(text(
+        "INSERT INTO transactions (id, user_id, amount_minor, currency, transaction_type, category, "
+        "description, created_at, updated_at) "
+        "SELECT id, user_id, amount_minor, currency, transaction_type, category, description, created_at, updated_at "
+        "FROM transactions_old"
+    ))
+    conn.execute(text("DROP TABLE transactions_old"))
+    conn.execute(text("CREATE INDEX ix_transactions_id ON transactions (id)"))
+    conn.execute(text("CREATE INDEX ix_transactions_user_created_id ON transactions (user_id, created_at, id)"))
+    conn.execute(text(
+        "CREATE INDEX ix_transactions_user_type_created "
+        "ON transactions (user_id, transaction_type, created_at, category, currency, amount_minor)"
+    ))
+    # New ids start above every id in use, archived ones included
+    conn.execute(text(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'transactions', 0 "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'transactions')"
+    ))
+    conn.execute(text(
+        "UPDATE sqlite_sequence SET seq = MAX(seq, (SELECT COALESCE(MAX(id), 0) FROM transactions_archive)) "
+        "WHERE name = 'transactions'"
+    ))
+
+
+def _add_search_index(conn: Connection):
+    """Full-text index over category and description, for /search.
+
+    Neither form can be described by the models, so fresh databases get it
+    from run_migrations too. PostgreSQL keeps GIN expression indexes up to
+    date itself. On SQLite an FTS5 table holds one entry per transaction,
+    hot or archived, kept in step by triggers; each entry carries its owner
+    as a "u<user_id>" token so a user's matches are found without scanning
+    everyone's. Transactions without category or description are left out.
+    Both stem English words, so "payments" finds "payment".
+    """
+    if conn.dialect.name == "postgresql":
+        for table in ("transactions", "transactions_archive"):
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING GIN ("
+                "to_tsvector('english', coalesce(category, '') || ' ' || coalesce(description, '')))"
+            ))
+        return
+
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5("
+        "owner, category, description, tokenize='porter unicode61 remove_diacritics 2')"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions "
+        "WHEN new.category IS NOT NULL OR new.description IS NOT NULL BEGIN "
+        "INSERT INTO transactions_fts (rowid, owner, category, description) "
+        "VALUES (new.id, 'u' || new.user_id, new.category, new.description); "
+        "END"
+    ))
+    # Rows moved to the archive keep their entry
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions "
+        "WHEN NOT EXISTS (SELECT 1 FROM transactions_archive WHERE id = old.id) BEGIN "
+        "DELETE FROM transactions_fts WHERE rowid = old.id; "
+        "END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS transactions_archive_fts_delete AFTER DELETE ON transactions_archive BEGIN "
+        "DELETE FROM transactions_fts WHERE rowid = old.id; "
+        "END"
+    ))
+    conn.execute(text("DELETE FROM transactions_fts"))
+    for table in ("transactions", "transactions_archive"):
+        conn.execute(text(
+            "INSERT INTO transactions_fts (rowid, owner, category, description) "
+            f"SELECT id, 'u' || user_id, category, description FROM {table} "
+            "WHERE category IS NOT NULL OR description IS NOT NULL"
+        ))
+
+
+# Ordered (version, description, upgrade) steps applied on top of the baseline.
+# Fresh databases are created from the models and stamped with the latest
+# version, so every step must leave the schema matching models.py (the
+# search index, which the models cannot describe, is added to them explicitly).
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (2, "processed_updates table", _add_processed_updates),
+    (3, "composite indexes on transactions", _add_transaction_indexes),
+    (4, "daily_user_category_totals rollup", _add_daily_totals),
+    (5, "id in the per-user created_at index", _add_id_to_user_created_index),
+    (6, "integer minor-unit amounts with a currency", _add_integer_amounts),
+    (7, "budgets table", _add_budgets),
+    (8, "recurring_rules and scheduler_leases tables", _add_recurring_rules),
+    (9, "polling_offsets table", _add_polling_offsets),
+    (10, "transactions_archive table", _add_transactions_archive),
+    (11, "transaction ids never reused on SQLite", _add_transaction_id_autoincrement),
+    (12, "full-text search index", _add_search_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0] if MIGRATIONS else BASELINE_VERSION
+
+
+def get_schema_version(conn: Connection) -> int:
+    """Stored schema version, 0 for an empty database"""
+    tables = inspect(conn).get_table_names()
+    version = None
+    if models.SchemaVersion.__tablename__ in tables:
+        version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    if version is None:
+        # Databases created before versioning have the baseline schema
+        return BASELINE_VERSION if models.Transaction.__tablename__ in tables else 0
+    return version
+
+
+def _set_schema_version(conn: Connection, version: int):
+    conn.execute(text("DELETE FROM schema_version"))
+    conn.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": version})
+
+
+def stored_schema_version(engine: Engine) -> Optional[int]:
+    """Version in schema_version with a single query; None when the table is missing or empty"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    except DBAPIError:
+        return None
+
+
+def run_migrations(engine: Engine) -> int:
+    """Bring the database up to LATEST_VERSION and return the resulting version.
+
+    An up-to-date database, the usual case on startup, costs one query:
+    no reflection, no DDL and no write.
+    """
+    version = stored_schema_version(engine)
+    if version is not None and version >= LATEST_VERSION:
+        if version > LATEST_VERSION:
+            logger.warning(f"Database schema version {version} is newer than this code ({LATEST_VERSION})")
+        return version
+
+    with engine.begin() as conn:
+        version = get_schema_version(conn)
+        if version == 0:
+            Base.metadata.create_all(bind=conn)
+            _add_search_index(conn)
+            _set_schema_version(conn, LATEST_VERSION)
+            logger.info(f"Created database schema at version {LATEST_VERSION}")
+            return LATEST_VERSION
+        models.SchemaVersion.__table__.create(bind=conn, checkfirst=True)
+        _set_schema_version(conn, version)
+
+    for target, description, upgrade in MIGRATIONS:
+        if target <= version:
+            continue
+        with engine.begin() as conn:
+            logger.info(f"Migrating database to version {target}: {description}")
+            upgrade(conn)
+            _set_schema_version(conn, target)
+        version = target
+    return version
@@ -1,15 +1,138 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, Text, Index
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.sql import func
 from .database import Base
+from .money import from_minor
+
+# SQLite stores datetimes as text and CURRENT_TIMESTAMP has no fractional
+# seconds; store bound values the same way so comparisons are exact.
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(
+        storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+    ),
+    "sqlite",
+)
 
 class Transaction(Base):
     __tablename__ = "transactions"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True, nullable=False)
-    amount = Column(Float, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    amount_minor = Column(BigInteger, nullable=False)  # integer cents (the currency's minor unit)
+    currency = Column(String(3), nullable=False)  # ISO 4217 code
     transaction_type = Column(String(10), nullable=False)  # "income" or "expense"
     category = Column(String(50), nullable=True)
     description = Column(Text, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now()) 
\ No newline at end of file
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, onupdate=func.now())
+
+    __table_args__ = (
+        # Per-user time range scans and (created_at, id) keyset pages
+        Index("ix_transactions_user_created_id", "user_id", "created_at", "id"),
+        # Covers the per-type summaries without touching the table
+        Index(
+            "ix_transactions_user_type_created",
+            "user_id", "transaction_type", "created_at", "category", "currency", "amount_minor",
+        ),
+        # SQLite would otherwise reuse the ids of the newest rows once they are archived or deleted
+        {"sqlite_autoincrement": True},
+    )
+
+    @property
+    def amount(self) -> Decimal:
+        return from_minor(self.amount_minor, self.currency)
+
+class ArchivedTransaction(Base):
+    """A transaction moved out of the hot table by app.archive, keeping its id"""
+    __tablename__ = "transactions_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=False)
+    amount_minor = Column(BigInteger, nullable=False)
+    currency = Column(String(3), nullable=False)
+    transaction_type = Column(String(10), nullable=False)
+    category = Column(String(50), nullable=True)
+    description = Column(Text, nullable=True)
+    created_at = Column(Timestamp, nullable=False)
+    updated_at = Column(Timestamp, nullable=True)
+
+    __table_args__ = (
+        # History pages and exports that reach past the archive horizon
+        Index("ix_transactions_archive_user_created_id", "user_id", "created_at", "id"),
+    )
+
+    @property
+    def amount(self) -> Decimal:
+        return from_minor(self.amount_minor, self.currency)
+
+class DailyTotal(Base):
+    """Per user, day, type, category and currency totals kept in step with transactions"""
+    __tablename__ = "daily_user_category_totals"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    day = Column(Date, primary_key=True)
+    transaction_type = Column(String(10), primary_key=True)
+    category = Column(String(50), primary_key=True, default="")  # "" stands for no category
+    currency = Column(String(3), primary_key=True)
+    total = Column(BigInteger, nullable=False, default=0)  # minor units
+    count = Column(Integer, nullable=False, default=0)
+
+class Budget(Base):
+    """Spending limit per user and category, with the running total of its current period"""
+    __tablename__ = "budgets"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    category = Column(String(50), primary_key=True)
+    period = Column(String(5), nullable=False)  # "week" or "month"
+    currency = Column(String(3), nullable=False)
+    limit_minor = Column(BigInteger, nullable=False)
+    period_start = Column(Date, nullable=False)  # first day of the period spent_minor belongs to
+    spent_minor = Column(BigInteger, nullable=False, default=0)
+    alerted = Column(Integer, nullable=False, default=0)  # highest alert threshold (percent) already sent
+
+class RecurringRule(Base):
+    """A transaction entered automatically each time its schedule comes round"""
+    __tablename__ = "recurring_rules"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    schedule = Column(String(64), nullable=False)  # canonical text, e.g. "monthly 1" (see schedules.py)
+    amount_minor = Column(BigInteger, nullable=False)
+    currency = Column(String(3), nullable=False)
+    transaction_type = Column(String(10), nullable=False)
+    category = Column(String(50), nullable=True)
+    description = Column(Text, nullable=True)
+    next_run = Column(DateTime, nullable=False, index=True)  # next occurrence to enter, naive UTC
+    created_at = Column(Timestamp, server_default=func.now())
+
+    @property
+    def amount(self) -> Decimal:
+        return from_minor(self.amount_minor, self.currency)
+
+class SchedulerLease(Base):
+    """Which process runs a background job that must run once, until expires_at"""
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String(50), primary_key=True)
+    holder = Column(String(100), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+class PollingOffset(Base):
+    """Next getUpdates offset of a bot run by the long-polling entry point"""
+    __tablename__ = "polling_offsets"
+
+    bot_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    next_offset = Column(BigInteger, nullable=False)  # one past the last update processed
+
+class ProcessedUpdate(Base):
+    __tablename__ = "processed_updates"
+
+    update_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
@@ -0,0 +1,68 @@
+"""
+Money amounts as integers of a currency's minor unit.
+
+Amounts are stored as whole cents (or yen, or fils), so sums in SQL and in
+Python are exact integer arithmetic. Decimal is used wherever an amount
+enters or leaves the app; binary floats never carry money.
+"""
+
+from decimal import Decimal, InvalidOperation
+from typing import Union
+
+from config import Config
+
+# ISO 4217 currencies whose minor unit is not 1/100 of the major unit
+MINOR_UNIT_DIGITS = {
+    "BIF": 0, "CLP": 0, "DJF": 0, "GNF": 0, "ISK": 0, "JPY": 0, "KMF": 0, "KRW": 0,
+    "PYG": 0, "RWF": 0, "UGX": 0, "UYI": 0, "VND": 0, "VUV": 0, "XAF": 0, "XOF": 0, "XPF": 0,
+    "BHD": 3, "IQD": 3, "JOD": 3, "KWD": 3, "LYD": 3, "OMR": 3, "TND": 3,
+    "CLF": 4, "UYW": 4,
+}
+
+DEFAULT_CURRENCY = Config.DEFAULT_CURRENCY.upper()
+
+# Largest amount in minor units that fits the BIGINT amount columns
+MAX_MINOR = 2 ** 63 - 1
+
+
+def minor_digits(currency: str) -> int:
+    """Decimal places of a currency's minor unit"""
+    return MINOR_UNIT_DIGITS.get(currency, 2)
+
+
+def to_decimal(value: Union[str, int, float, Decimal]) -> Decimal:
+    """Exact Decimal for an amount; floats go through their shortest repr (0.1 stays 0.1)"""
+    if isinstance(value, Decimal):
+        return value
+    try:
+        return Decimal(repr(value) if isinstance(value, float) else value)
+    except InvalidOperation:
+        raise ValueError(f"invalid amount: {str(value)[:40]}")
+
+
+def to_json(amount: Decimal) -> str:
+    """Exact string for an amount in JSON, in plain notation ("100", not "1E+2")"""
+    return format(amount, "f")
+
+
+def to_minor(amount: Union[str, int, float, Decimal], currency: str = DEFAULT_CURRENCY) -> int:
+    """Integer minor units for an amount.
+
+    Raises ValueError if it has more decimals than the currency or does not
+    fit the amount columns.
+    """
+    amount = to_decimal(amount)
+    if not amount.is_finite():
+        raise ValueError("amount must be a finite number")
+    digits = minor_digits(currency)
+    scaled = amount.scaleb(digits)
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f"{currency} amounts have at most {digits} decimal places")
+    if abs(scaled) > MAX_MINOR:
+        raise ValueError(f"amount must be at most {from_minor(MAX_MINOR, currency)}")
+    return int(scaled)
+
+
+def from_minor(minor: int, currency: str = DEFAULT_CURRENCY) -> Decimal:
+    """Decimal amount for integer minor units, with the currency's decimal places"""
+    return Decimal(minor).scaleb(-minor_digits(currency))
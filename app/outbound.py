@@ -0,0 +1,355 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+from telegram.request import HTTPXRequest, RequestData
+
+from .metrics import BOT_API_DURATION, BOT_API_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Bot API methods that post a message and count towards Telegram's flood limits
+MESSAGE_METHODS = frozenset({
+    "sendMessage", "sendDocument", "sendPhoto", "sendAudio", "sendVideo", "sendVoice",
+    "sendAnimation", "sendSticker", "sendLocation", "sendContact", "sendPoll",
+    "sendDice", "sendMediaGroup", "copyMessage", "forwardMessage",
+})
+
+# Methods whose result the handlers never read, so they can ride on the webhook response
+WEBHOOK_REPLY_METHODS = frozenset({"sendMessage"})
+
+
+class TokenBucket:
+    """Allows `rate` events per second on average with bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token, going into debt if needed, and return the seconds to wait"""
+        self._refill(time.monotonic())
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def try_take(self) -> bool:
+        """Take a token only if one is available right now"""
+        self._refill(time.monotonic())
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def give_back(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def idle(self) -> bool:
+        """True once the bucket has refilled, i.e. forgetting it changes nothing"""
+        self._refill(time.monotonic())
+        return self.tokens >= self.burst
+
+
+class RateLimiter:
+    """Global and per-chat token buckets matching Telegram's broadcast limits.
+
+    Negative chat ids are groups and channels, which Telegram limits far
+    more strictly than private chats. Once more than max_chats are tracked,
+    idle per-chat buckets are forgotten, least recently used first.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        group_rate: float = 20 / 60,
+        chat_burst: float = 3,
+        max_chats: int = 10000,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_chats = max_chats
+        self._chats: "OrderedDict[Any, TokenBucket]" = OrderedDict()
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        chats = self._chats
+        bucket = chats.get(chat_id)
+        if bucket is not None:
+            chats.move_to_end(chat_id)
+            return bucket
+        # A chat still refilling is never forgotten, or it could exceed its limit
+        while len(chats) >= self.max_chats and next(iter(chats.values())).idle():
+            chats.popitem(last=False)
+        is_group = str(chat_id).startswith(("-", "@"))
+        bucket = chats[chat_id] = TokenBucket(self.group_rate if is_group else self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def acquire(self, chat_id: Any = None):
+        """Wait until a message to chat_id is allowed"""
+        wait = self.global_bucket.reserve()
+        if chat_id is not None:
+            wait = max(wait, self._chat_bucket(chat_id).reserve())
+        if wait > 0:
+            self.throttled += 1
+            self.throttled_seconds += wait
+            await asyncio.sleep(wait)
+
+    def try_acquire(self, chat_id: Any = None) -> bool:
+        """Take tokens without waiting; False (and nothing taken) if either bucket is empty"""
+        if not self.global_bucket.try_take():
+            return False
+        if chat_id is not None and not self._chat_bucket(chat_id).try_take():
+            self.global_bucket.give_back()
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "chats": len(self._chats),
+            "throttled": self.throttled,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+        }
+
+
+class WebhookReply:
+    """Holds the one Bot API call that may be returned as the webhook response"""
+
+    def __init__(self):
+        self.open = True
+        self.endpoint: Optional[str] = None
+        self.data: Optional[dict] = None
+        self.send: Optional[Callable[[str, dict], Awaitable[Any]]] = None
+
+    def body(self) -> Optional[dict]:
+        """JSON body for the webhook response, None if nothing was captured"""
+        if self.endpoint is None:
+            return None
+        return {"method": self.endpoint, **self.data}
+
+
+_webhook_reply: contextvars.ContextVar[Optional[WebhookReply]] = contextvars.ContextVar(
+    "webhook_reply", default=None
+)
+
+
+@contextmanager
+def capture_webhook_reply() -> Iterator[WebhookReply]:
+    """Let the first message sent inside the block be answered in the webhook response.
+
+    Telegram executes a method returned as the webhook response body, which
+    saves a Bot API round trip, but the result is never seen. So only an
+    update that sends exactly one plain message uses it: a second message
+    sends the held one first, then itself, the normal way.
+    """
+    reply = WebhookReply()
+    token = _webhook_reply.set(reply)
+    try:
+        yield reply
+    finally:
+        reply.open = False
+        _webhook_reply.reset(token)
+
+
+_deferred: contextvars.ContextVar[bool] = contextvars.ContextVar("defer_messages", default=False)
+
+
+@contextmanager
+def defer_messages() -> Iterator[None]:
+    """Queue the messages sent inside the block instead of waiting out the rate limits.
+
+    An ingestion worker serves many users, so sleeping on one chat's rate
+    limit would hold up everyone else's updates behind it. Deferred messages
+    are sent by a task per chat, in order; sendMessage returns a stand-in at
+    once, other methods still wait for their result.
+    """
+    token = _deferred.set(True)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+
+
+def _stand_in_message(chat_id: Any, data: dict) -> dict:
+    """Stand-in for the Message Telegram would have returned"""
+    return {
+        "message_id": 0,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "text": data.get("text"),
+    }
+
+
+class OutboundDispatcher:
+    """Rate limiting, retries and the webhook reply fast path for Bot API calls"""
+
+    def __init__(self, limiter: RateLimiter, max_retries: int = 3, backoff: float = 0.5):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._outbox: Dict[Any, Deque[Tuple[str, dict, Callable, Optional[asyncio.Future]]]] = {}
+        self._senders: Dict[Any, asyncio.Task] = {}
+        self.sent = 0
+        self.webhook_replies = 0
+        self.retries = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def queued(self) -> int:
+        """Number of deferred messages not sent yet"""
+        return sum(len(outbox) for outbox in self._outbox.values())
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "webhook_replies": self.webhook_replies,
+            "retries": self.retries,
+            "failed": self.failed,
+            "queued": self.queued(),
+            "dropped": self.dropped,
+            **self.limiter.stats(),
+        }
+
+    async def post(self, endpoint: str, data: dict, send: Callable[[str, dict], Awaitable[Any]]) -> Any:
+        """Send one Bot API call through send(endpoint, data)"""
+        if endpoint not in MESSAGE_METHODS:
+            return await self._timed_send(endpoint, data, send)
+
+        chat_id = data.get("chat_id")
+        reply = _webhook_reply.get()
+        if reply is not None and reply.open:
+            if (
+                reply.endpoint is None
+                and endpoint in WEBHOOK_REPLY_METHODS
+                and self.limiter.try_acquire(chat_id)
+            ):
+                reply.endpoint, reply.data, reply.send = endpoint, data, send
+                self.webhook_replies += 1
+                return _stand_in_message(chat_id, data)
+            reply.open = False
+            if reply.endpoint is not None:
+                held_endpoint, held_data, held_send = reply.endpoint, reply.data, reply.send
+                reply.endpoint = reply.data = reply.send = None
+                self.webhook_replies -= 1
+                await self._send_with_retries(held_endpoint, held_data, held_send, limited=False)
+
+        if _deferred.get():
+            return await self._defer(endpoint, data, send)
+        return await self._send_with_retries(endpoint, data, send)
+
+    async def _defer(self, endpoint: str, data: dict, send: Callable[[str, dict], Awaitable[Any]]) -> Any:
+        chat_id = data.get("chat_id")
+        # Only a plain message's result goes unread; other methods wait their turn in the chat's queue
+        result = None if endpoint in WEBHOOK_REPLY_METHODS else asyncio.get_running_loop().create_future()
+        self._outbox.setdefault(chat_id, deque()).append((endpoint, data, send, result))
+        if chat_id not in self._senders:
+            self._senders[chat_id] = asyncio.create_task(self._send_queued(chat_id), name=f"outbound-{chat_id}")
+        if result is None:
+            return _stand_in_message(chat_id, data)
+        return await result
+
+    async def _send_queued(self, chat_id: Any):
+        """Send a chat's deferred messages in order, then forget the chat"""
+        outbox = self._outbox[chat_id]
+        try:
+            while outbox:
+                endpoint, data, send, result = outbox.popleft()
+                try:
+                    sent = await self._send_with_retries(endpoint, data, send)
+                except Exception as e:
+                    if result is None:
+                        logger.error(f"Queued Bot API {endpoint} to chat {chat_id} failed: {e}")
+                    elif not result.done():
+                        result.set_exception(e)
+                else:
+                    if result is not None and not result.done():
+                        result.set_result(sent)
+        finally:
+            del self._outbox[chat_id]
+            del self._senders[chat_id]
+
+    async def drain(self, timeout: float = 10.0):
+        """Send the deferred messages, dropping those still queued after timeout"""
+        if not self._senders:
+            return
+        logger.info(f"Sending {self.queued()} queued messages")
+        _, pending = await asyncio.wait(list(self._senders.values()), timeout=timeout)
+        if pending:
+            dropped = self.queued()
+            self.dropped += dropped
+            logger.error(f"Outbound drain timed out; {dropped} queued messages to {len(pending)} chats not sent")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _timed_send(self, endpoint: str, data: dict, send: Callable[[str, dict], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        try:
+            return await send(endpoint, data)
+        except Exception as e:
+            BOT_API_ERRORS.labels(endpoint, type(e).__name__).inc()
+            raise
+        finally:
+            BOT_API_DURATION.labels(endpoint).observe(time.perf_counter() - started)
+
+    async def _send_with_retries(
+        self, endpoint: str, data: dict, send: Callable[[str, dict], Awaitable[Any]], limited: bool = True
+    ) -> Any:
+        chat_id = data.get("chat_id")
+        attempt = 0
+        while True:
+            if limited:
+                await self.limiter.acquire(chat_id)
+            limited = True
+            try:
+                result = await self._timed_send(endpoint, data, send)
+                self.sent += 1
+                return result
+            except RetryAfter as e:
+                error, delay = e, e.retry_after
+            except (BadRequest, TimedOut):
+                # Rejected outright, or possibly delivered: retrying would not help or could duplicate
+                self.failed += 1
+                raise
+            except NetworkError as e:
+                error, delay = e, self.backoff * 2 ** attempt
+            if attempt >= self.max_retries:
+                self.failed += 1
+                raise error
+            attempt += 1
+            self.retries += 1
+            logger.warning(f"Bot API {endpoint} to chat {chat_id} retried in {delay}s (attempt {attempt})")
+            await asyncio.sleep(delay)
+
+
+class DispatchingRequest(HTTPXRequest):
+    """Bot API transport whose calls all go through an OutboundDispatcher.
+
+    Hooks BaseRequest.post, the public extension point of the Bot's request
+    object, so the dispatcher sees each call as its method name and the
+    JSON-ready RequestData.parameters that a webhook response body needs.
+    """
+
+    def __init__(self, dispatcher: OutboundDispatcher, **kwargs):
+        super().__init__(**kwargs)
+        self.dispatcher = dispatcher
+
+    async def post(self, url: str, request_data: Optional[RequestData] = None, **kwargs) -> Any:
+        async def send(endpoint: str, data: dict):
+            return await super(DispatchingRequest, self).post(url, request_data, **kwargs)
+
+        data = request_data.parameters if request_data is not None else {}
+        return await self.dispatcher.post(url.rsplit("/", 1)[-1], data, send)
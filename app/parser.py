@@ -0,0 +1,68 @@
+import re
+from decimal import Decimal
+from typing import List, NamedTuple, Optional, Tuple
+
+# Currency symbols ($, €, £, ¥, ₹, ₽, ฿, ...); they are accepted and ignored
+CURRENCY_SYMBOLS = "$¢£¤¥֏؋৲৳৻૱௹฿៛\u20a0-\u20c0﷼﹩＄￠￡￥￦"
+
+# Format: +100 salary or -50 food or +2000 bonus work bonus, with optional
+# thousands separators (+1,500) and a currency symbol on either side (-$5, -5€)
+TRANSACTION_PATTERN = re.compile(
+    rf'^([+-])[{CURRENCY_SYMBOLS}]?'
+    r'(\d{1,3}(?:,\d{3})+|\d+)(\.\d{1,2})?'
+    rf'(?:\s*[{CURRENCY_SYMBOLS}])?'
+    r'\s+(\w+)(?:\s+(.+))?$'
+)
+
+
+class ParsedTransaction(NamedTuple):
+    amount: Decimal
+    transaction_type: str  # "income" or "expense"
+    category: str
+    description: Optional[str]
+
+
+class ParsedLine(NamedTuple):
+    line_number: int
+    line: str
+    transaction: ParsedTransaction
+
+
+class LineError(NamedTuple):
+    line_number: int
+    line: str
+    reason: str
+
+
+def parse_transaction(text: str) -> Optional[ParsedTransaction]:
+    """Parse a single '+/-amount category [description]' entry"""
+    match = TRANSACTION_PATTERN.match(text.strip())
+    if not match:
+        return None
+    sign, whole, fraction, category, description = match.groups()
+    return ParsedTransaction(
+        amount=Decimal(whole.replace(",", "") + (fraction or "")),
+        transaction_type="income" if sign == "+" else "expense",
+        category=category,
+        description=description
+    )
+
+
+def parse_transactions(text: str) -> Tuple[List[ParsedLine], List[LineError]]:
+    """Parse one entry per non-empty line, collecting an error for each line in the wrong format.
+
+    Only the format is checked here; amounts and categories are validated
+    by schemas.TransactionCreate.
+    """
+    parsed = []
+    errors = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        transaction = parse_transaction(line)
+        if transaction is None:
+            errors.append(LineError(line_number, line, "invalid format"))
+        else:
+            parsed.append(ParsedLine(line_number, line, transaction))
+    return parsed, errors
@@ -0,0 +1,171 @@
+"""
+Long-polling entry point, for hosts Telegram cannot reach with a webhook.
+
+    python -m app.polling
+
+Updates are fetched with getUpdates, holding each request open for up to
+POLLING_TIMEOUT seconds while there are none, and every batch of up to
+POLLING_LIMIT updates is processed concurrently through the same handlers
+as the webhook. Updates from one user run one after another in the order
+Telegram sent them. The offset after each batch is stored in the database,
+so a restart continues where the last run stopped instead of processing
+updates again. Point BOT_API_URL at benchmarks/stub_bot_api.py to try it
+without Telegram.
+"""
+
+import asyncio
+import logging
+import signal
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+from telegram import Bot, Update
+from telegram.error import NetworkError, TelegramError
+
+from . import crud
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class UpdatePoller:
+    """Fetches updates with long polling and processes each batch concurrently.
+
+    Updates are grouped by user; groups run concurrently, each in order.
+    An update that fails is logged and skipped, as in the ingestion queue,
+    so one bad update never stalls the bot.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        handler: Callable[[Update], Awaitable[None]],
+        session_factory,
+        dedup=None,
+        timeout: int = 50,
+        limit: int = 100,
+        allowed_updates: Sequence[str] = ("message",),
+        backoff: float = 1.0,
+    ):
+        self.bot = bot
+        self.handler = handler
+        self.session_factory = session_factory
+        self.dedup = dedup
+        self.timeout = timeout
+        self.limit = limit
+        self.allowed_updates = list(allowed_updates)
+        self.backoff = backoff
+        self.bot_id = int(bot.token.split(":", 1)[0])
+        self.offset: Optional[int] = None
+        self._stopping = asyncio.Event()
+        self.batches = 0
+        self.processed = 0
+        self.failed = 0
+        self.duplicates = 0
+
+    def stats(self) -> dict:
+        return {
+            "offset": self.offset,
+            "batches": self.batches,
+            "processed": self.processed,
+            "failed": self.failed,
+            "duplicates": self.duplicates,
+        }
+
+    def stop(self):
+        """Finish the current batch and return from run()"""
+        self._stopping.set()
+
+    async def _process_in_order(self, updates: List[Update]):
+        for update in updates:
+            if self.dedup is not None and not await self.dedup.claim(update.update_id):
+                self.duplicates += 1
+                continue
+            try:
+                await self.handler(update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error processing polled update {update.update_id}: {e}")
+
+    async def process_batch(self, updates: Sequence[Update]):
+        """Run a batch through the handler: users concurrently, each user's updates in order"""
+        by_user = defaultdict(list)
+        for update in updates:
+            user = update.effective_user
+            by_user[user.id if user else None].append(update)
+        await asyncio.gather(*(self._process_in_order(user_updates) for user_updates in by_user.values()))
+        self.batches += 1
+
+    async def _get_updates(self) -> Any:
+        """The next batch, or an empty one once stop() is called during the long poll"""
+        fetch = asyncio.ensure_future(self.bot.get_updates(
+            offset=self.offset, timeout=self.timeout, limit=self.limit, allowed_updates=self.allowed_updates
+        ))
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        done, _ = await asyncio.wait({fetch, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        if fetch not in done:
+            fetch.cancel()
+            await asyncio.gather(fetch, return_exceptions=True)
+            return ()
+        stopping.cancel()
+        return fetch.result()
+
+    async def run(self):
+        """Poll until stop() is called"""
+        async with self.session_factory() as db:
+            self.offset = await crud.get_polling_offset(db, self.bot_id)
+        # getUpdates is refused while a webhook is set; pending updates are kept
+        await self.bot.delete_webhook(drop_pending_updates=False)
+        logger.info(f"Polling for updates from offset {self.offset}")
+
+        failures = 0
+        while not self._stopping.is_set():
+            try:
+                updates = await self._get_updates()
+                failures = 0
+            except (NetworkError, TelegramError) as e:
+                delay = min(self.backoff * 2 ** failures, 60)
+                failures += 1
+                logger.warning(f"getUpdates failed ({e}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+                continue
+            if not updates:
+                continue
+
+            await self.process_batch(updates)
+            self.offset = updates[-1].update_id + 1
+            async with self.session_factory() as db:
+                await crud.save_polling_offset(db, self.bot_id, self.offset)
+
+
+async def run_polling():
+    """Run the bot with long polling, with the web app's startup and shutdown steps"""
+    from . import main
+
+    poller = UpdatePoller(
+        main.bot,
+        main.process_update,
+        main.AsyncSessionLocal,
+        dedup=main.update_dedup,
+        timeout=Config.POLLING_TIMEOUT,
+        limit=Config.POLLING_LIMIT,
+    )
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, poller.stop)
+
+    await main.startup_event()
+    try:
+        await poller.run()
+    finally:
+        await main.shutdown_event()
+        logger.info(f"Polling stopped: {poller.stats()}")
+
+
+def main_cli():
+    asyncio.run(run_polling())
+
+
+if __name__ == "__main__":
+    main_cli()
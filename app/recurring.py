@@ -0,0 +1,158 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from . import crud
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "recurring"
+
+
+class RecurringScheduler:
+    """Enters recurring transactions when they fall due.
+
+    Due times are kept in a min-heap of (next_run, rule id), so the loop
+    sleeps until the earliest one instead of polling every rule; due rules
+    are entered together in batches. Occurrences missed while the bot was
+    down are caught up on start, each with its own date.
+
+    With several workers only the holder of the "recurring" lease in the
+    database schedules; the others keep trying to take it over, which they
+    can once it is not renewed for lease_ttl seconds.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        lease_ttl: float = 30,
+        refresh_interval: float = 300,
+        batch_size: int = 500,
+        max_catchup: int = 100,
+    ):
+        self.session_factory = session_factory
+        self.lease_ttl = lease_ttl
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.max_catchup = max_catchup
+        self.holder = crud.lease_holder()
+        self._heap: List[Tuple[datetime, int]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.leader = False
+        self.entered = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def stats(self) -> dict:
+        return {
+            "leader": self.leader,
+            "scheduled": len(self._heap),
+            "next_run": self._heap[0][0].isoformat() if self._heap else None,
+            "entered": self.entered,
+            "batches": self.batches,
+        }
+
+    def start(self):
+        """Spawn the scheduler task on the running event loop"""
+        if self._task:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="recurring-scheduler")
+        logger.info(f"Recurring transaction scheduler started as {self.holder}")
+
+    async def stop(self):
+        """Stop scheduling and hand the lease over"""
+        if not self._task:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self.leader:
+            self.leader = False
+            try:
+                async with self.session_factory() as db:
+                    await crud.release_lease(db, LEASE_NAME, self.holder)
+            except Exception as e:
+                logger.error(f"Failed to release the scheduler lease: {e}")
+
+    def schedule(self, rule_id: int, next_run: datetime):
+        """Add a new or changed rule without waiting for the next refresh"""
+        if not self.leader:
+            return  # the leader picks it up on its next refresh
+        heapq.heappush(self._heap, (next_run, rule_id))
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _refresh(self):
+        """Rebuild the heap from the database, dropping removed rules"""
+        async with self.session_factory() as db:
+            self._heap = await crud.get_recurring_due_times(db)
+        heapq.heapify(self._heap)
+
+    async def run_due(self, now: Optional[datetime] = None) -> int:
+        """Enter everything due by now, batch_size rules at a time; returns the transactions entered"""
+        now = now or datetime.utcnow()
+        entered = 0
+        while self._heap and self._heap[0][0] <= now:
+            batch = set()
+            while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+                batch.add(heapq.heappop(self._heap)[1])
+            async with self.session_factory() as db:
+                count, due_times = await crud.enter_due_transactions(db, batch, now, self.max_catchup)
+            if due_times is None:
+                # Another process entered some of them; start again from the database
+                await self._refresh()
+                continue
+            for entry in due_times:
+                heapq.heappush(self._heap, entry)
+            entered += count
+            self.batches += 1
+        self.entered += entered
+        return entered
+
+    async def _run(self):
+        renew_at = 0.0
+        refresh_at = 0.0
+        while True:
+            timeout = self.lease_ttl / 3
+            try:
+                if time.monotonic() >= renew_at:
+                    async with self.session_factory() as db:
+                        leader = await crud.acquire_lease(db, LEASE_NAME, self.holder, self.lease_ttl)
+                    renew_at = time.monotonic() + self.lease_ttl / 3
+                    if leader and not self.leader:
+                        logger.info("Took the recurring transaction scheduler lease")
+                        refresh_at = 0.0
+                    elif self.leader and not leader:
+                        logger.warning("Lost the recurring transaction scheduler lease")
+                        self._heap = []
+                    self.leader = leader
+
+                if self.leader:
+                    if time.monotonic() >= refresh_at:
+                        await self._refresh()
+                        refresh_at = time.monotonic() + self.refresh_interval
+                    entered = await self.run_due()
+                    if entered:
+                        logger.info(f"Entered {entered} recurring transactions")
+                    timeout = min(renew_at, refresh_at) - time.monotonic()
+                    if self._heap:
+                        until_due = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+                        timeout = min(timeout, until_due)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Recurring transaction scheduler failed: {e}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0.01))
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,136 @@
+"""
+Maintenance commands for the daily_user_category_totals rollup.
+
+crud keeps the rollup in step with every insert and delete; these commands
+backfill it for existing databases and verify it against the raw rows, both
+the hot transactions table and the archive (see app/archive.py).
+
+Usage:
+    python -m app.rollups rebuild [user_id]
+    python -m app.rollups check
+"""
+
+import sys
+from typing import List, Optional
+
+from sqlalchemy import delete, func, insert, select, union_all
+from sqlalchemy.engine import Connection, Engine
+
+from . import models
+
+
+def daily_totals_from_transactions(user_id: Optional[int] = None, archived: bool = True):
+    """SELECT computing rollup rows from the raw transactions, hot and (unless archived=False) archived"""
+    columns = ("user_id", "created_at", "transaction_type", "category", "currency", "amount_minor")
+    tables = [models.Transaction.__table__]
+    if archived:
+        tables.append(models.ArchivedTransaction.__table__)
+    rows = []
+    for table in tables:
+        query = select(*(table.c[name] for name in columns))
+        if user_id is not None:
+            query = query.where(table.c.user_id == user_id)
+        rows.append(query)
+    transaction = union_all(*rows).subquery()
+    category = func.coalesce(transaction.c.category, "")
+    day = func.date(transaction.c.created_at)
+    return select(
+        transaction.c.user_id,
+        day,
+        transaction.c.transaction_type,
+        category,
+        transaction.c.currency,
+        func.sum(transaction.c.amount_minor),
+        func.count(),
+    ).group_by(transaction.c.user_id, day, transaction.c.transaction_type, category, transaction.c.currency)
+
+
+def rebuild_daily_totals_in(conn: Connection, user_id: Optional[int] = None, archived: bool = True) -> int:
+    """Recompute rollup rows inside an open transaction.
+
+    Migrations that run before the archive table exists pass archived=False.
+    """
+    rollup = models.DailyTotal
+    clear = delete(rollup)
+    if user_id is not None:
+        clear = clear.where(rollup.user_id == user_id)
+    conn.execute(clear)
+    result = conn.execute(
+        insert(rollup).from_select(
+            ["user_id", "day", "transaction_type", "category", "currency", "total", "count"],
+            daily_totals_from_transactions(user_id, archived),
+        )
+    )
+    return result.rowcount
+
+
+def rebuild_daily_totals(engine: Engine, user_id: Optional[int] = None) -> int:
+    """Backfill the rollup from raw transactions for one user or everyone"""
+    with engine.begin() as conn:
+        return rebuild_daily_totals_in(conn, user_id)
+
+
+def check_daily_totals(engine: Engine) -> List[dict]:
+    """Compare the rollup with the raw rows and return every mismatch (totals are integers, so exactly)"""
+    rollup = models.DailyTotal
+    with engine.connect() as conn:
+        expected = {
+            (user_id, str(day), transaction_type, category, currency): (total, count)
+            for user_id, day, transaction_type, category, currency, total, count
+            in conn.execute(daily_totals_from_transactions())
+        }
+        actual = {
+            (user_id, str(day), transaction_type, category, currency): (total, count)
+            for user_id, day, transaction_type, category, currency, total, count
+            in conn.execute(select(
+                rollup.user_id, rollup.day, rollup.transaction_type,
+                rollup.category, rollup.currency, rollup.total, rollup.count,
+            ).where(rollup.count != 0))
+        }
+
+    mismatches = []
+    for key in expected.keys() | actual.keys():
+        want = expected.get(key, (0, 0))
+        have = actual.get(key, (0, 0))
+        if want != have:
+            user_id, day, transaction_type, category, currency = key
+            mismatches.append({
+                "user_id": user_id,
+                "day": day,
+                "transaction_type": transaction_type,
+                "category": category or None,
+                "currency": currency,
+                "expected": want,
+                "actual": have,
+            })
+    return mismatches
+
+
+def main():
+    """Main function"""
+    from .database import engine
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("rebuild", "check"):
+        print("Usage:")
+        print("  python -m app.rollups rebuild [user_id]")
+        print("  python -m app.rollups check")
+        sys.exit(1)
+
+    if sys.argv[1] == "rebuild":
+        user_id = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        rows = rebuild_daily_totals(engine, user_id)
+        print(f"✅ Rebuilt {rows} daily total rows")
+        return
+
+    mismatches = check_daily_totals(engine)
+    if not mismatches:
+        print("✅ Daily totals match the transactions table")
+        return
+    for mismatch in mismatches[:50]:
+        print(f"❌ {mismatch}")
+    print(f"❌ {len(mismatches)} daily total rows disagree with the transactions table")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
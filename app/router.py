@@ -0,0 +1,117 @@
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from telegram import Update
+
+Handler = Callable[[Update, Any], Awaitable[None]]
+ArgParser = Callable[[List[str]], Any]
+
+UNKNOWN_COMMAND_MESSAGE = "Unknown command. Use /help for available commands."
+
+
+class ArgumentError(ValueError):
+    """Invalid command arguments; the message is sent back to the user as is"""
+
+
+def int_argument(
+    default: Optional[int] = None,
+    minimum: Optional[int] = None,
+    maximum: Optional[int] = None,
+    missing: str = "Please provide a number.",
+    invalid: str = "Please provide a valid number.",
+    out_of_range: str = "Number out of range.",
+) -> ArgParser:
+    """Parser for a command taking one integer; without a default it is required"""
+    def parse(args: List[str]) -> int:
+        if not args:
+            if default is None:
+                raise ArgumentError(missing)
+            return default
+        try:
+            value = int(args[0])
+        except ValueError:
+            raise ArgumentError(invalid)
+        if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+            raise ArgumentError(out_of_range)
+        return value
+    return parse
+
+
+def choice_argument(choices: Dict[str, str], default: str, invalid: str) -> ArgParser:
+    """Parser for an optional keyword argument, mapping accepted spellings to values"""
+    def parse(args: List[str]) -> str:
+        if not args:
+            return default
+        value = choices.get(args[0].lower())
+        if value is None:
+            raise ArgumentError(invalid)
+        return value
+    return parse
+
+
+class Command(NamedTuple):
+    name: str
+    handler: Handler
+    parse_args: Optional[ArgParser]
+
+
+class CommandRouter:
+    """Maps command names and aliases to handlers with declared argument parsing.
+
+    Accepts the `/command@BotName` form Telegram uses in groups; commands
+    addressed to another bot are ignored. Without a bot username any
+    @suffix is accepted.
+    """
+
+    def __init__(self, bot_username: str = ""):
+        self.bot_username = bot_username.lstrip("@").lower()
+        self._commands: Dict[str, Command] = {}
+
+    def command(self, name: str, *aliases: str, args: Optional[ArgParser] = None) -> Callable[[Handler], Handler]:
+        """Decorator registering a handler under a name and any aliases"""
+        def register(handler: Handler) -> Handler:
+            command = Command(name, handler, args)
+            for key in (name, *aliases):
+                if key in self._commands:
+                    raise ValueError(f"Command /{key} is already registered")
+                self._commands[key] = command
+            return handler
+        return register
+
+    def split(self, text: str) -> Optional[Tuple[str, List[str]]]:
+        """(command name, args) for command text, None if it is addressed to another bot"""
+        head, *args = text.split()
+        name, _, username = head[1:].partition("@")
+        if username and self.bot_username and username.lower() != self.bot_username:
+            return None
+        return name.lower(), args
+
+    def command_name(self, text: str) -> str:
+        """Canonical name of the command in text, for metrics labels"""
+        split = self.split(text)
+        if split is None:
+            return "other_bot"
+        command = self._commands.get(split[0])
+        return command.name if command is not None else "unknown"
+
+    async def dispatch(self, update: Update, context: Any, text: str):
+        """Parse the command's arguments and run its handler.
+
+        context gets the raw words as `args` and the parsed value as
+        `params`. Unknown commands and bad arguments are answered here.
+        """
+        split = self.split(text)
+        if split is None:
+            return
+        name, args = split
+        command = self._commands.get(name)
+        if command is None:
+            await update.message.reply_text(UNKNOWN_COMMAND_MESSAGE)
+            return
+        context.args = args
+        if command.parse_args is not None:
+            try:
+                context.params = command.parse_args(args)
+            except ArgumentError as e:
+                await update.message.reply_text(str(e))
+                return
+        await command.handler(update, context)
@@ -0,0 +1,180 @@
+"""
+Schedules of recurring transactions.
+
+A schedule is stored as its canonical text and parsed back when it is
+needed; every form is evaluated as a cron expression in UTC:
+
+    daily                     every day at 00:00
+    weekly [mon..sun]         every week on that day (default: today's)
+    monthly [1-31]            every month on that day (default: today's); days
+                              past the end of a short month fall on its last day
+    cron <min> <hour> <day> <month> <weekday>
+                              standard five-field cron: *, a-b, */n, a-b/n and
+                              lists; weekday 0-7 or mon..sun, 0 and 7 are Sunday
+"""
+
+import calendar
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import FrozenSet, List, Tuple
+
+WEEKDAY_NAMES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+# Occurrences of the rarest expressions (29 February on a given weekday) are
+# up to 28 years apart; no valid schedule looks further ahead than this
+_SEARCH_DAYS = 366 * 28
+
+SCHEDULE_USAGE = (
+    "daily, weekly [mon..sun], monthly [1-31] "
+    "or cron <minute> <hour> <day> <month> <weekday>"
+)
+
+
+def _parse_weekday(value: str) -> int:
+    """Cron weekday number (0 and 7 = Sunday) of a name or number; raises ValueError"""
+    name = value.lower()[:3]
+    if name in WEEKDAY_NAMES:
+        return (WEEKDAY_NAMES.index(name) + 1) % 7
+    number = int(value)
+    if not 0 <= number <= 7:
+        raise ValueError(f"invalid weekday: {value}")
+    return number
+
+
+def _parse_field(field: str, low: int, high: int, weekday: bool = False) -> FrozenSet[int]:
+    """Values of one cron field, e.g. "*/15", "1-5" or "0,30"; raises ValueError"""
+    values = set()
+    for part in field.split(","):
+        span, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if span == "*":
+            start, end = low, high
+        elif "-" in span:
+            start, end = span.split("-", 1)
+            start, end = (_parse_weekday(start), _parse_weekday(end) or 7) if weekday else (int(start), int(end))
+        else:
+            start = end = _parse_weekday(span) if weekday else int(span)
+            if step > 1:
+                end = high
+        if step < 1 or start > end or start < low or end > high:
+            raise ValueError(f"invalid cron field: {field}")
+        values.update(value % 7 if weekday else value for value in range(start, end + 1, step))
+    return frozenset(values)
+
+
+class Schedule:
+    """A parsed schedule; next_after gives its occurrences one by one"""
+
+    def __init__(self, text: str, minutes, hours, days, months, weekdays, clamp_days: bool = False):
+        self.text = text
+        self.minutes = sorted(minutes)
+        self.hours = sorted(hours)
+        self.days = days
+        self.months = months
+        self.weekdays = weekdays
+        # Cron matches either restricted day field when both are restricted
+        self.any_day = len(days) < 31 and len(weekdays) < 7
+        self.clamp_days = clamp_days
+
+    def __repr__(self) -> str:
+        return f"Schedule({self.text!r})"
+
+    def _matches_day(self, day: date) -> bool:
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        if not in_days and self.clamp_days:
+            last_day = calendar.monthrange(day.year, day.month)[1]
+            in_days = day.day == last_day and max(self.days) > last_day
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays
+        return in_days or in_weekdays if self.any_day else in_days and in_weekdays
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First occurrence strictly after moment"""
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(_SEARCH_DAYS):
+            if self._matches_day(day):
+                earliest = (start.hour, start.minute) if day == start.date() else (0, 0)
+                for hour in self.hours:
+                    if hour < earliest[0]:
+                        continue
+                    for minute in self.minutes:
+                        if (hour, minute) >= earliest:
+                            return datetime(day.year, day.month, day.day, hour, minute)
+            day += timedelta(days=1)
+        raise ValueError(f"schedule never occurs: {self.text}")
+
+    def occurrences(self, after: datetime, until: datetime, limit: int) -> List[datetime]:
+        """Up to limit occurrences in (after, until]"""
+        found = []
+        moment = self.next_after(after)
+        while moment <= until and len(found) < limit:
+            found.append(moment)
+            moment = self.next_after(moment)
+        return found
+
+
+def parse_schedule(args: List[str], today: date) -> Tuple[Schedule, List[str]]:
+    """A schedule from the leading arguments and the arguments left after it.
+
+    Raises ValueError for an unknown or malformed schedule.
+    """
+    if not args:
+        raise ValueError(f"Missing schedule: {SCHEDULE_USAGE}")
+    kind = args[0].lower()
+    rest = args[1:]
+    if kind == "daily":
+        return _schedule("daily"), rest
+    if kind == "weekly":
+        day = WEEKDAY_NAMES[today.weekday()]
+        if rest and rest[0].lower()[:3] in WEEKDAY_NAMES:
+            day = rest.pop(0).lower()[:3]
+        return _schedule(f"weekly {day}"), rest
+    if kind == "monthly":
+        day = today.day
+        if rest and rest[0].isdigit():
+            day = int(rest.pop(0))
+            if not 1 <= day <= 31:
+                raise ValueError("The day of the month must be between 1 and 31.")
+        return _schedule(f"monthly {day}"), rest
+    if kind == "cron":
+        if len(rest) < 5:
+            raise ValueError("A cron schedule has five fields: <minute> <hour> <day> <month> <weekday>")
+        fields, rest = rest[:5], rest[5:]
+        schedule = _schedule("cron " + " ".join(field.lower() for field in fields))
+        schedule.next_after(datetime(today.year, today.month, today.day))
+        return schedule, rest
+    raise ValueError(f"Unknown schedule {args[0]!r}: {SCHEDULE_USAGE}")
+
+
+@lru_cache(maxsize=1024)
+def _schedule(text: str) -> Schedule:
+    kind, _, spec = text.partition(" ")
+    if kind == "daily":
+        return Schedule(text, {0}, {0}, range(1, 32), range(1, 13), range(7))
+    if kind == "weekly":
+        return Schedule(text, {0}, {0}, range(1, 32), range(1, 13), {_parse_weekday(spec)})
+    if kind == "monthly":
+        return Schedule(text, {0}, {0}, {int(spec)}, range(1, 13), range(7), clamp_days=True)
+    if kind == "cron":
+        fields = spec.split()
+        if len(fields) != 5:
+            raise ValueError(f"invalid cron expression: {spec}")
+        try:
+            return Schedule(
+                text,
+                _parse_field(fields[0], 0, 59),
+                _parse_field(fields[1], 0, 23),
+                _parse_field(fields[2], 1, 31),
+                _parse_field(fields[3], 1, 12),
+                _parse_field(fields[4], 0, 7, weekday=True),
+            )
+        except ValueError:
+            raise ValueError(f"invalid cron expression: {spec}")
+    raise ValueError(f"unknown schedule: {text}")
+
+
+def load_schedule(text: str) -> Schedule:
+    """Schedule for text stored by parse_schedule; parsed once per distinct text"""
+    return _schedule(text)
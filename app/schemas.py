@@ -1,15 +1,63 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, BeforeValidator, PlainSerializer, ValidationError, field_validator, model_validator
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Annotated, Dict, List, Optional
+from .money import DEFAULT_CURRENCY, to_decimal, to_json, to_minor
+
+TRANSACTION_TYPES = ("income", "expense")
+MAX_CATEGORY_LENGTH = 50
+
+# Exact in Python (floats are converted through their repr) and a decimal string in JSON,
+# which a float could not hold exactly; numbers and strings are both accepted on input
+Amount = Annotated[Decimal, BeforeValidator(to_decimal), PlainSerializer(to_json, return_type=str, when_used="json")]
 
 class TransactionBase(BaseModel):
-    amount: float
+    amount: Amount
     transaction_type: str  # "income" or "expense"
     category: Optional[str] = None
     description: Optional[str] = None
+    currency: str = DEFAULT_CURRENCY  # ISO 4217 code
 
 class TransactionCreate(TransactionBase):
     user_id: int
+    created_at: Optional[datetime] = None  # set for backdated entries, otherwise the insert time
+
+    @field_validator("amount")
+    @classmethod
+    def amount_must_be_positive(cls, amount: Decimal) -> Decimal:
+        if not amount.is_finite() or amount <= 0:
+            raise ValueError("amount must be greater than 0")
+        return amount
+
+    @field_validator("currency")
+    @classmethod
+    def currency_must_be_a_code(cls, currency: str) -> str:
+        if len(currency) != 3 or not currency.isascii() or not currency.isalpha():
+            raise ValueError("currency must be a 3-letter ISO 4217 code")
+        return currency.upper()
+
+    @field_validator("transaction_type")
+    @classmethod
+    def transaction_type_must_be_known(cls, transaction_type: str) -> str:
+        if transaction_type not in TRANSACTION_TYPES:
+            raise ValueError("transaction type must be income or expense")
+        return transaction_type
+
+    @field_validator("category")
+    @classmethod
+    def category_must_fit(cls, category: Optional[str]) -> Optional[str]:
+        if category is not None and len(category) > MAX_CATEGORY_LENGTH:
+            raise ValueError(f"category longer than {MAX_CATEGORY_LENGTH} characters")
+        return category
+
+    @model_validator(mode="after")
+    def amount_must_fit_currency(self) -> "TransactionCreate":
+        to_minor(self.amount, self.currency)
+        return self
+
+    @property
+    def amount_minor(self) -> int:
+        return to_minor(self.amount, self.currency)
 
 class Transaction(TransactionBase):
     id: int
@@ -21,11 +69,84 @@ class Transaction(TransactionBase):
         from_attributes = True
 
 class TransactionSummary(BaseModel):
-    total_income: float
-    total_expenses: float
-    balance: float
+    total_income: Amount
+    total_expenses: Amount
+    balance: Amount
     transaction_count: int
 
 class UserSummary(BaseModel):
     user_id: int
-    summary: TransactionSummary 
\ No newline at end of file
+    summary: TransactionSummary
+
+class SummaryReport(BaseModel):
+    summary: TransactionSummary
+    expenses_by_category: Dict[str, Amount]
+    currency: str = DEFAULT_CURRENCY
+
+class MonthlyTotal(BaseModel):
+    month: str  # YYYY-MM
+    income: Amount
+    expenses: Amount
+
+class StatsReport(BaseModel):
+    days: int
+    currency: str
+    transaction_count: int
+    total_income: Amount
+    total_expenses: Amount
+    average_daily_expenses: Amount
+    expense_percentiles: Dict[str, Amount]  # "p50", "p75", "p90" of single expenses
+    largest_expense: Optional[Amount] = None
+    top_category: Optional[str] = None
+    top_category_share: Optional[float] = None  # fraction of total expenses
+    month_over_month: Optional[float] = None  # relative change in expenses, this month vs last
+    monthly: List[MonthlyTotal]
+
+class BudgetStatus(BaseModel):
+    category: str
+    period: str  # "week" or "month"
+    currency: str
+    limit: Amount
+    spent: Amount  # in the current period
+    period_start: date
+
+    @property
+    def used(self) -> float:
+        """Spent as a fraction of the limit"""
+        return float(self.spent / self.limit) if self.limit else 0.0
+
+class RecurringRule(TransactionBase):
+    id: int
+    user_id: int
+    schedule: str  # e.g. "monthly 1" or "cron 0 9 * * 1-5"
+    next_run: datetime  # UTC
+
+    class Config:
+        from_attributes = True
+
+class TransactionPage(BaseModel):
+    items: List[Transaction]
+    next_cursor: Optional[str] = None
+
+class SearchPage(BaseModel):
+    items: List[Transaction]  # category matches first, then the most recently added
+    next_page: Optional[int] = None
+
+class RowError(BaseModel):
+    line: int
+    reason: str
+
+class ImportReport(BaseModel):
+    imported: int
+    rejected: int
+    errors: List[RowError]  # the first IMPORT_MAX_ERRORS rejected rows
+    seconds: float
+    rows_per_second: float
+
+def first_error_message(error: ValidationError) -> str:
+    """Readable reason for the first failed field of a validation error"""
+    details = error.errors()[0]
+    message = details["msg"].removeprefix("Value error, ")
+    if details["type"] == "value_error" or not details["loc"]:
+        return message
+    return f"{details['loc'][0]}: {message}"
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark webhook admission control under one flooding user.
+
+For `seconds` seconds one user posts `rate` updates per second, whether or
+not earlier ones have been answered, while other users each send a
+transaction every second, with admission control off and then on (the
+default per-user limits). Updates are processed inline with a stub bot.
+Reports the other users' latency, the transactions and replies the flood
+caused, and how long a rejected update and a POST without the secret token
+take. Exits non-zero if one of the other users' transactions is lost.
+
+Usage:
+    python benchmarks/bench_admission.py [seconds] [rate] [users]
+"""
+
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+
+SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+FLOOD_RATE = float(sys.argv[2]) if len(sys.argv) > 2 else 200
+USERS = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+FLOODER = 1
+
+from common import make_update, stub_bot
+
+os.environ["INGEST_WORKERS"] = "0"
+os.environ["WEBHOOK_REPLY"] = "false"
+
+import httpx
+from sqlalchemy import func, select
+
+from app import main, models
+from app.admission import AdmissionController
+from app.database import AsyncSessionLocal, async_engine, create_tables
+from config import Config
+
+
+def percentile(samples: list, fraction: float) -> float:
+    samples = sorted(samples)
+    return samples[max(int(len(samples) * fraction) - 1, 0)]
+
+
+async def transactions_by(*user_ids: int) -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(func.count()).select_from(models.Transaction).where(models.Transaction.user_id.in_(user_ids))
+        )).scalar()
+
+
+async def flood_round(client: httpx.AsyncClient, first_update_id: int) -> dict:
+    """Flood from one user while the others send at a human pace"""
+    update_ids = itertools.count(first_update_id)
+    latencies = []
+    flood_updates = 0
+    deadline = time.perf_counter() + SECONDS
+
+    async def flooder():
+        nonlocal flood_updates
+        requests = []
+        while time.perf_counter() < deadline:
+            requests.append(asyncio.create_task(
+                client.post("/telegram", json=make_update(next(update_ids), FLOODER, "-1 spam"))
+            ))
+            flood_updates += 1
+            await asyncio.sleep(1 / FLOOD_RATE)
+        await asyncio.gather(*requests)
+
+    async def user(user_id: int):
+        # Spread over the interval, so the users do not all write at the same instant
+        await asyncio.sleep(random.uniform(0, 1))
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.post("/telegram", json=make_update(next(update_ids), user_id, "-5 coffee"))
+            latencies.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+            await asyncio.sleep(1)
+
+    user_ids = range(FLOODER + 1, FLOODER + 1 + USERS)
+    transactions_before = await transactions_by(FLOODER), await transactions_by(*user_ids)
+    sent_before = type(main.bot).sent
+    await asyncio.gather(flooder(), *(user(user_id) for user_id in user_ids))
+    if await transactions_by(*user_ids) - transactions_before[1] != len(latencies):
+        print(f"❌ Only {await transactions_by(*user_ids) - transactions_before[1]} of the other users' "
+              f"{len(latencies)} transactions were entered")
+        sys.exit(1)
+    return {
+        "flood updates": flood_updates,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 0.95),
+        "flood transactions": await transactions_by(FLOODER) - transactions_before[0],
+        "replies": type(main.bot).sent - sent_before,
+        "next update id": next(update_ids),
+    }
+
+
+async def rejected_cost(client: httpx.AsyncClient, update_id: int, requests: int = 2000) -> tuple:
+    """Median microseconds of a throttled update and of a POST without the secret token"""
+    main.admission = AdmissionController(user_rate=0.001, user_burst=1)
+    await client.post("/telegram", json=make_update(update_id, FLOODER, "-1 spam"))
+    throttled = []
+    for i in range(requests):
+        started = time.perf_counter()
+        response = await client.post("/telegram", json=make_update(update_id + 1 + i, FLOODER, "-1 spam"))
+        throttled.append((time.perf_counter() - started) * 1e6)
+        assert response.json()["status"] == "throttled", response.text
+
+    Config.WEBHOOK_SECRET = "bench-secret"
+    unauthorized = []
+    for i in range(requests):
+        started = time.perf_counter()
+        response = await client.post("/telegram", json=make_update(update_id, FLOODER, "-1 spam"),
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+        unauthorized.append((time.perf_counter() - started) * 1e6)
+        assert response.status_code == 401, response.text
+    Config.WEBHOOK_SECRET = ""
+    return statistics.median(throttled), statistics.median(unauthorized)
+
+
+async def run():
+    main.bot = stub_bot()
+    update_id = 1
+    print(f"{'admission':<10}{'flood':>9}{'p50 ms':>9}{'p95 ms':>9}{'flood rows':>12}{'replies':>9}")
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+        for label, controller in (
+            ("off", AdmissionController(user_rate=0)),
+            ("on", AdmissionController(Config.ADMISSION_USER_RATE or 1, Config.ADMISSION_USER_BURST or 10)),
+        ):
+            main.admission = controller
+            result = await flood_round(client, update_id)
+            update_id = result["next update id"]
+            print(f"{label:<10}{result['flood updates']:>9}{result['p50']:>9.1f}{result['p95']:>9.1f}"
+                  f"{result['flood transactions']:>12}{result['replies']:>9}")
+        print(f"rejected  {main.admission.stats()['rejected']}")
+        print("Every transaction from the other users was entered")
+
+        throttled_us, unauthorized_us = await rejected_cost(client, update_id)
+        print(f"throttled update {throttled_us:.0f} us, POST without the secret token {unauthorized_us:.0f} us")
+    await async_engine.dispose()
+
+
+def main_cli():
+    print(f"{SECONDS:.0f} s of updates from one user at {FLOOD_RATE:.0f}/s, {USERS} other users every second")
+    create_tables()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark /stats: NumPy over columnar arrays vs an equivalent pure-Python loop.
+
+Seeds one user's history, fetches their window once and times computing
+the statistics both ways from the same rows, checking that the two reports
+agree. The query and the conversion of rows to arrays are timed
+separately: both paths pay for the query, and building the arrays is one
+Python pass over the rows, comparable to the whole pure-Python loop, so the
+end-to-end gain is smaller than the NumPy speedup alone.
+
+Usage:
+    python benchmarks/bench_analytics.py [rows] [days] [repeat]
+"""
+
+import asyncio
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from common import seed_transactions
+
+from sqlalchemy import func, select
+
+from app import crud, models, schemas
+from app.analytics import PERCENTILES, compute_stats, window_from_rows
+from app.database import AsyncSessionLocal, async_engine, create_tables, engine
+from app.money import DEFAULT_CURRENCY, from_minor
+
+
+def percentile(sorted_values, q):
+    """Linear interpolation between closest ranks, as numpy.percentile does"""
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def python_stats(rows, days: int, currency: str, now: datetime) -> schemas.StatsReport:
+    """The same figures as analytics.compute_stats with plain loops"""
+    start = now - timedelta(days=days)
+    first_month = start.year * 12 + start.month - 1
+    month_count = now.year * 12 + now.month - first_month
+    monthly = [[0, 0] for _ in range(month_count)]
+    by_category = defaultdict(int)
+    expenses = []
+    total_income = 0
+    for created_at, transaction_type, category, amount in rows:
+        month = created_at.year * 12 + created_at.month - 1 - first_month
+        if transaction_type == "expense":
+            expenses.append(amount)
+            if category:
+                by_category[category] += amount
+            if month < month_count:
+                monthly[month][1] += amount
+        else:
+            total_income += amount
+            if month < month_count:
+                monthly[month][0] += amount
+
+    total_expenses = sum(expenses)
+    top_category = max(by_category, key=by_category.get) if by_category else None
+    expenses.sort()
+    percentiles = {
+        f"p{q}": from_minor(round(percentile(expenses, q)), currency) for q in PERCENTILES
+    } if expenses else {}
+    month_over_month = None
+    if month_count >= 2 and monthly[-2][1]:
+        month_over_month = (monthly[-1][1] - monthly[-2][1]) / monthly[-2][1]
+    return schemas.StatsReport(
+        days=days,
+        currency=currency,
+        transaction_count=len(rows),
+        total_income=from_minor(total_income, currency),
+        total_expenses=from_minor(total_expenses, currency),
+        average_daily_expenses=from_minor(round(total_expenses / days), currency),
+        expense_percentiles=percentiles,
+        largest_expense=from_minor(expenses[-1], currency) if expenses else None,
+        top_category=top_category,
+        top_category_share=by_category[top_category] / total_expenses if top_category else None,
+        month_over_month=month_over_month,
+        monthly=[
+            schemas.MonthlyTotal(
+                month=f"{(first_month + i) // 12:04d}-{(first_month + i) % 12 + 1:02d}",
+                income=from_minor(income, currency),
+                expenses=from_minor(spent, currency),
+            )
+            for i, (income, spent) in enumerate(monthly)
+        ],
+    )
+
+
+def best_of(repeat: int, fn):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+async def fetch_rows(user_id: int, days: int):
+    transaction = models.Transaction
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(
+                transaction.created_at,
+                transaction.transaction_type,
+                func.coalesce(transaction.category, ""),
+                transaction.amount_minor,
+            ).where(*crud.period_filter(user_id, days), transaction.currency == DEFAULT_CURRENCY)
+        )
+        return result.all()
+
+
+def main_cli():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    print(f"Seeding {rows} transactions for one user...")
+    create_tables()
+    seed_transactions(engine, rows, 1, days=days)
+
+    started = time.perf_counter()
+    window_rows = asyncio.run(fetch_rows(0, days))
+    query_seconds = time.perf_counter() - started
+    asyncio.run(async_engine.dispose())
+    now = datetime.now()
+
+    arrays_seconds, window = best_of(repeat, lambda: window_from_rows(window_rows))
+    numpy_seconds, numpy_report = best_of(repeat, lambda: compute_stats(window, days, DEFAULT_CURRENCY, now))
+    python_seconds, python_report = best_of(repeat, lambda: python_stats(window_rows, days, DEFAULT_CURRENCY, now))
+
+    print(f"{len(window_rows)} rows in the {days}-day window")
+    print(f"query                 {query_seconds * 1000:8.1f} ms")
+    print(f"rows -> arrays        {arrays_seconds * 1000:8.1f} ms")
+    print(f"numpy stats           {numpy_seconds * 1000:8.1f} ms")
+    print(f"pure Python stats     {python_seconds * 1000:8.1f} ms   ({python_seconds / numpy_seconds:.0f}x numpy)")
+    print(f"end to end: numpy {(query_seconds + arrays_seconds + numpy_seconds) * 1000:.1f} ms, "
+          f"pure Python {(query_seconds + python_seconds) * 1000:.1f} ms")
+
+    numpy_dump = numpy_report.model_dump()
+    python_dump = python_report.model_dump()
+    share_delta = abs((numpy_dump.pop("top_category_share") or 0) - (python_dump.pop("top_category_share") or 0))
+    if numpy_dump != python_dump or share_delta > 1e-9:
+        print("❌ The NumPy and pure-Python reports disagree")
+        sys.exit(1)
+    print("✅ Reports match")
+
+
+if __name__ == "__main__":
+    main_cli()
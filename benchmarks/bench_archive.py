@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark hot/cold tiering of the transactions table.
+
+Seeds years of history, then measures the same operations before and after
+moving everything older than ARCHIVE_AFTER_DAYS to the archive table:
+- size of the hot table and its indexes (pages from SQLite's dbstat)
+- inserting entries one commit at a time, as the bot does
+- the first history page and /summary, which stay in the hot table
+- a history page past the horizon and a full export, which read both tables
+The results of every read must be identical on both sides.
+
+Usage:
+    python benchmarks/bench_archive.py [rows] [years] [users]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import seed_transactions
+
+from sqlalchemy import text
+
+from app import crud, schemas
+from app.archive import archive_old_transactions
+from app.database import AsyncSessionLocal, async_engine, create_tables, engine
+from config import Config
+
+INSERTS = 300
+READS = 200
+
+
+def table_bytes(*names: str) -> int:
+    """Bytes used by the tables and their indexes; 0 if SQLite was built without dbstat"""
+    with engine.connect() as conn:
+        try:
+            rows = conn.execute(text(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name IN ("
+                "SELECT name FROM sqlite_schema WHERE tbl_name IN ({}))".format(", ".join(f"'{n}'" for n in names))
+            )).scalar()
+        except Exception:
+            return 0
+    return rows or 0
+
+
+async def timed(operation, repeat: int) -> float:
+    """Median milliseconds of an operation"""
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        await operation(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def measure(users: int, deep_cursor: str) -> dict:
+    async def insert(i):
+        async with AsyncSessionLocal() as db:
+            await crud.create_transaction(db, schemas.TransactionCreate(
+                user_id=i % users, amount=5, transaction_type="expense", category="bench"
+            ))
+
+    async def first_page(i):
+        async with AsyncSessionLocal() as db:
+            await crud._newest_first(db, i % users, 11)
+
+    async def summary(i):
+        async with AsyncSessionLocal() as db:
+            await crud._build_summary_report(db, i % users, 365)
+
+    async def deep_page(i):
+        async with AsyncSessionLocal() as db:
+            await crud.get_transactions_page(db, i % users, 10, deep_cursor)
+
+    async def export(i):
+        async with AsyncSessionLocal() as db:
+            async for _ in crud.stream_transactions(db, i % users):
+                pass
+
+    return {
+        "insert": await timed(insert, INSERTS),
+        "first history page": await timed(first_page, READS),
+        "summary, 365 days": await timed(summary, READS),
+        "page past the horizon": await timed(deep_page, READS),
+        "export": await timed(export, 20),
+    }
+
+
+async def snapshot(users: int, deep_cursor: str) -> list:
+    """Everything the readers return for a few users, to compare before and after"""
+    results = []
+    async with AsyncSessionLocal() as db:
+        for user_id in range(min(users, 5)):
+            results.append(await crud.get_transactions_by_user(db, user_id, 50))
+            results.append(await crud.get_transactions_page(db, user_id, 10, deep_cursor))
+            results.append(await crud._build_summary_report(db, user_id, 365))
+            results.append([tuple(row) async for row in crud.stream_transactions(db, user_id)])
+    return results
+
+
+async def run(users: int):
+    deep_cursor = crud.encode_cursor(schemas.Transaction(
+        id=2 ** 31, user_id=0, amount=1, transaction_type="expense",
+        created_at=datetime.now() - timedelta(days=Config.ARCHIVE_AFTER_DAYS + 30),
+    ))
+    hot_bytes = table_bytes("transactions")
+    before = await measure(users, deep_cursor)
+    expected = await snapshot(users, deep_cursor)
+
+    started = time.perf_counter()
+    result = await archive_old_transactions(AsyncSessionLocal, Config.ARCHIVE_AFTER_DAYS, Config.ARCHIVE_BATCH_SIZE)
+    seconds = time.perf_counter() - started
+    with engine.begin() as conn:
+        conn.execute(text("VACUUM"))
+    after_bytes = table_bytes("transactions")
+
+    actual = await snapshot(users, deep_cursor)
+    after = await measure(users, deep_cursor)
+
+    print(f"archived {result['moved']} rows older than {Config.ARCHIVE_AFTER_DAYS} days in {seconds:.1f} s")
+    print(f"hot table rows     {result['hot_before']:>12,} -> {result['hot_after']:,}")
+    if hot_bytes:
+        print(f"hot table + index  {hot_bytes / 2 ** 20:>11.1f} MiB -> {after_bytes / 2 ** 20:.1f} MiB")
+    print(f"{'median ms':<24}{'before':>10}{'after':>10}")
+    for name in before:
+        print(f"{name:<24}{before[name]:>10.3f}{after[name]:>10.3f}")
+
+    await async_engine.dispose()
+    if actual != expected:
+        print("❌ Reads differ after archiving")
+        sys.exit(1)
+    print("Reads are identical before and after archiving")
+
+
+def main_cli():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    users = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    create_tables()
+    seed_transactions(engine, rows, users, days=years * 365)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    asyncio.run(run(users))
+
+
+if __name__ == "__main__":
+    main_cli()
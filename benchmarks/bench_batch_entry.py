@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark multi-line transaction entry against one message per transaction.
+
+Posts N single-line updates to the webhook, then one update carrying the
+same N lines, and reports wall time, DB commits and Bot API replies for
+each. Updates are processed inline with a stub bot.
+
+Usage:
+    python benchmarks/bench_batch_entry.py [lines] [rounds]
+"""
+
+import asyncio
+import sys
+import time
+
+from common import make_update, stub_bot
+
+import httpx
+from sqlalchemy import event
+
+from app import main
+from app.database import async_engine, create_tables
+
+
+async def run(lines: int, rounds: int):
+    bot = main.bot = stub_bot()
+    entries = [f"-{i % 90 + 1}.50 cat{i % 7} receipt {i}" for i in range(lines)]
+    commits = {"count": 0}
+
+    @event.listens_for(async_engine.sync_engine, "commit")
+    def count_commit(conn):
+        commits["count"] += 1
+
+    update_id = 0
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+        for label, messages in (("single", entries), ("batch", ["\n".join(entries)])):
+            elapsed = 0.0
+            commits["count"] = 0
+            type(bot).sent = 0
+            for _ in range(rounds):
+                started = time.perf_counter()
+                for text in messages:
+                    update_id += 1
+                    response = await client.post("/telegram", json=make_update(update_id, 1, text))
+                    response.raise_for_status()
+                elapsed += time.perf_counter() - started
+            print(f"{label:<7} {elapsed / rounds * 1000:9.1f} ms per {lines} transactions   "
+                  f"{lines * rounds / elapsed:8.0f} tx/s   commits {commits['count'] // rounds}   "
+                  f"replies {type(bot).sent // rounds}")
+    await async_engine.dispose()
+
+
+def main_cli():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    create_tables()
+    asyncio.run(run(lines, rounds))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark budget alert checks: running totals vs re-summing the period.
+
+For growing histories in the budgeted category, times adding an expense
+and checking its budget the way handle_message does (create_transaction
+keeps the running total, check_budget_alert reads it), against the same
+insert followed by a SUM over the category's spending this period. The
+running-total check should stay flat as the history grows.
+
+Usage:
+    python benchmarks/bench_budget.py [sizes] [inserts]
+"""
+
+import asyncio
+import sys
+import time
+from datetime import date, datetime, time as day_start
+
+from common import seed_transactions
+
+from sqlalchemy import func, select
+
+from app import crud, models, schemas
+from app.database import AsyncSessionLocal, async_engine, create_tables, engine
+from app.money import DEFAULT_CURRENCY
+
+
+async def resum_period(db, user_id: int, category: str) -> int:
+    """What every alert check would cost without running totals"""
+    transaction = models.Transaction
+    start = crud.budget_period_start("month", date.today())
+    return (await db.execute(
+        select(func.coalesce(func.sum(transaction.amount_minor), 0)).where(
+            transaction.user_id == user_id,
+            transaction.category == category,
+            transaction.currency == DEFAULT_CURRENCY,
+            transaction.transaction_type == "expense",
+            transaction.created_at >= datetime.combine(start, day_start.min),
+        )
+    )).scalar_one()
+
+
+async def run(user_id: int, inserts: int):
+    results = {}
+    async with AsyncSessionLocal() as db:
+        # Limit far above the seeded spending, so no alert short-circuits the check
+        await crud.set_budget(db, user_id, "cat0", 10_000_000, "month")
+        for label, check in (
+            ("running total", lambda: crud.check_budget_alert(db, user_id, "cat0")),
+            ("re-sum period", lambda: resum_period(db, user_id, "cat0")),
+        ):
+            insert_seconds = 0.0
+            check_seconds = 0.0
+            for _ in range(inserts):
+                started = time.perf_counter()
+                await crud.create_transaction(db, schemas.TransactionCreate(
+                    user_id=user_id, amount=3, transaction_type="expense", category="cat0"
+                ))
+                checked = time.perf_counter()
+                await check()
+                insert_seconds += checked - started
+                check_seconds += time.perf_counter() - checked
+            results[label] = (insert_seconds / inserts, check_seconds / inserts)
+    return results
+
+
+def main_cli():
+    sizes = [int(size) for size in sys.argv[1].split(",")] if len(sys.argv) > 1 else [1_000, 10_000, 100_000]
+    inserts = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    create_tables()
+    # The seeded history falls in the current month, so re-summing it grows with the history
+    days = max(date.today().day - 1, 1)
+    print(f"{inserts} expenses per run, category history spread over the last {days} days")
+    for user_id, size in enumerate(sizes, start=1):
+        # 12 categories are seeded, so 1/12 of the rows land in the budgeted one
+        seed_transactions(engine, size * 12, 1, days=days, first_user=user_id)
+        for label, (insert_seconds, check_seconds) in asyncio.run(run(user_id, inserts)).items():
+            print(f"history {size:>8}   {label:<14} insert {insert_seconds * 1000:6.2f} ms   "
+                  f"alert check {check_seconds * 1000:7.3f} ms")
+        asyncio.run(async_engine.dispose())
+
+
+if __name__ == "__main__":
+    main_cli()
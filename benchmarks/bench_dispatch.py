@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark the per-update cost of command dispatch and transaction parsing.
+
+Times, per update of a realistic mix: decoding the payload, routing it
+through the command router (handlers replaced by no-ops, so no database
+work is included) and parsing transaction text. The old if/elif chain
+and uncompiled re.match are timed alongside as a baseline. Exits non-zero
+if route + parse exceeds budget_us, so it can gate regressions.
+
+Usage:
+    python benchmarks/bench_dispatch.py [iterations] [budget_us]
+"""
+
+import asyncio
+import re
+import sys
+import time
+
+from common import make_update, stub_bot
+
+from telegram import Update
+
+from app import main
+from app.parser import parse_transaction
+from app.router import CommandRouter
+
+TEXTS = [
+    "+100 salary",
+    "-25 coffee",
+    "-1,250.50 rent march",
+    "-$12 lunch with team",
+    "+5,000€ bonus year end",
+    "/summary",
+    "/summary 7",
+    "/summary@MoneyBot 90",
+    "/transactions 5",
+    "/history 20",
+    "/delete 123",
+    "/export json",
+    "/start",
+    "/help",
+    "/unknown",
+    "hello there",
+]
+
+LEGACY_PATTERN = r'^([+-])(\d+(?:\.\d{1,2})?)\s+(\w+)(?:\s+(.+))?$'
+
+
+async def noop(update, context):
+    pass
+
+
+def bench_router() -> CommandRouter:
+    """main's command table with every handler replaced by a no-op"""
+    router = CommandRouter(main.router.bot_username)
+    router._commands = {name: command._replace(handler=noop) for name, command in main.router._commands.items()}
+    return router
+
+
+async def legacy_route(update, text):
+    """The if/elif chain and per-message re.match used before the router"""
+    if text.startswith('/'):
+        split_text = text.split()
+        command = split_text[0]
+        args = split_text[1:]
+        if command == '/start':
+            await noop(update, args)
+        elif command == '/help':
+            await noop(update, args)
+        elif command == '/summary':
+            days = int(args[0]) if args else 30
+            await noop(update, days)
+        elif command == '/transactions':
+            limit = int(args[0]) if args else 10
+            await noop(update, limit)
+        elif command == '/delete':
+            await noop(update, int(args[0]))
+        elif command == '/export':
+            await noop(update, args)
+        else:
+            await update.message.reply_text("Unknown command. Use /help for available commands.")
+    else:
+        re.match(LEGACY_PATTERN, text.strip())
+
+
+async def new_route(router, update, text):
+    if text.startswith('/'):
+        await router.dispatch(update, main.DummyContext(None), text)
+    else:
+        parse_transaction(text)
+
+
+async def run(iterations: int, budget_us: float) -> bool:
+    bot = stub_bot()
+    payloads = [make_update(i, 1, text) for i, text in enumerate(TEXTS)]
+    updates = [Update.de_json(payload, bot) for payload in payloads]
+    router = bench_router()
+    count = iterations * len(TEXTS)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for payload in payloads:
+            Update.de_json(payload, bot)
+    decode_us = (time.perf_counter() - started) / count * 1e6
+
+    results = {}
+    for label, route in (("legacy", legacy_route), ("router", lambda u, t: new_route(router, u, t))):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for update in updates:
+                await route(update, update.message.text)
+        results[label] = (time.perf_counter() - started) / count * 1e6
+
+    parse_texts = [text for text in TEXTS if not text.startswith("/")] * iterations
+    started = time.perf_counter()
+    for text in parse_texts:
+        parse_transaction(text)
+    parse_us = (time.perf_counter() - started) / len(parse_texts) * 1e6
+
+    print(f"decode (Update.de_json)   {decode_us:7.2f} us/update")
+    print(f"parse_transaction         {parse_us:7.2f} us/message")
+    print(f"route + parse, legacy     {results['legacy']:7.2f} us/update")
+    print(f"route + parse, router     {results['router']:7.2f} us/update   (budget {budget_us:.0f} us)")
+    return results["router"] <= budget_us
+
+
+def main_cli():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    budget_us = float(sys.argv[2]) if len(sys.argv) > 2 else 25
+    if not asyncio.run(run(iterations, budget_us)):
+        print("❌ Dispatch cost is over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Check that exports stream in bounded memory.
+
+Seeds one user per history size, streams each user's full history through
+the CSV and NDJSON exporters, discarding the output, and reports rows/sec
+and peak Python allocations (tracemalloc). The peak should stay flat as the
+history grows; exits non-zero if the largest export needs more than twice
+the memory of the smallest.
+
+Usage:
+    python benchmarks/bench_export.py [size,size,...]
+"""
+
+import asyncio
+import sys
+import time
+import tracemalloc
+
+from common import seed_transactions
+
+from app.database import async_engine, create_tables, engine
+from app.export import export_user_transactions
+
+
+async def measure(user_id: int, rows: int, export_format: str) -> int:
+    tracemalloc.start()
+    started = time.perf_counter()
+    written = 0
+    async for chunk in export_user_transactions(user_id, export_format):
+        written += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{export_format:<7} {rows:>9} rows   {rows / elapsed:9.0f} rows/s   "
+          f"{written / 1024 / 1024:8.1f} MiB out   peak {peak / 1024 / 1024:6.2f} MiB")
+    return peak
+
+
+async def run(sizes):
+    peaks = {}
+    for export_format in ("csv", "ndjson"):
+        for user_id, rows in enumerate(sizes):
+            peaks[(export_format, rows)] = await measure(user_id, rows, export_format)
+    await async_engine.dispose()
+    return peaks
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1].split(",")] if len(sys.argv) > 1 else [10_000, 100_000, 1_000_000]
+
+    create_tables()
+    for user_id, rows in enumerate(sizes):
+        print(f"Seeding {rows} transactions for user {user_id}...")
+        seed_transactions(engine, rows, users=1, first_user=user_id)
+
+    peaks = asyncio.run(run(sizes))
+    for export_format in ("csv", "ndjson"):
+        smallest, largest = peaks[(export_format, sizes[0])], peaks[(export_format, sizes[-1])]
+        if largest > 2 * smallest:
+            print(f"❌ {export_format} export memory grows with history size")
+            sys.exit(1)
+    print("✅ Export memory is independent of history size")
+
+
+if __name__ == "__main__":
+    main()
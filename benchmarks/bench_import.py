@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark CSV import against adding the same rows one at a time.
+
+Generates a CSV of N backdated rows and imports it through the streaming
+importer, then adds a sample of the rows with crud.create_transaction
+(one INSERT, refresh and commit each) and reports rows/s and commits for
+both. The rollup is checked against the raw rows afterwards.
+
+Usage:
+    python benchmarks/bench_import.py [rows] [batch_size] [single_rows]
+"""
+
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import TMPDIR
+
+from sqlalchemy import event
+
+from app import crud, schemas
+from app.database import AsyncSessionLocal, async_engine, create_tables, engine
+from app.importer import import_csv
+from app.rollups import check_daily_totals
+
+
+def make_csv(rows: int) -> bytes:
+    start = datetime(2020, 1, 1)
+    lines = ["date,amount,category,description"]
+    for i in range(rows):
+        amount = f"{i % 500 + 1}.25" if i % 4 == 0 else f"-{i % 90 + 1}.50"
+        created_at = (start + timedelta(minutes=i * 17)).isoformat()
+        lines.append(f"{created_at},{amount},cat{i % 12},row {i}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def chunked(data: bytes, size: int = 64 * 1024):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def run(rows: int, batch_size: int, single_rows: int):
+    data = make_csv(rows)
+    commits = {"count": 0}
+
+    @event.listens_for(async_engine.sync_engine, "commit")
+    def count_commit(conn):
+        commits["count"] += 1
+
+    async with AsyncSessionLocal() as db:
+        report = await import_csv(db, 1, chunked(data), batch_size=batch_size)
+    print(f"import  {report.imported:>8} rows {report.seconds:8.2f} s "
+          f"{report.rows_per_second:10.0f} rows/s   commits {commits['count']}   rejected {report.rejected}")
+
+    commits["count"] = 0
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        for i in range(single_rows):
+            await crud.create_transaction(db, schemas.TransactionCreate(
+                user_id=2,
+                amount=float(i % 90 + 1),
+                transaction_type="expense",
+                category=f"cat{i % 12}",
+                description=f"row {i}",
+                created_at=datetime(2020, 1, 1) + timedelta(minutes=i * 17),
+            ))
+    elapsed = time.perf_counter() - started
+    print(f"single  {single_rows:>8} rows {elapsed:8.2f} s "
+          f"{single_rows / elapsed:10.0f} rows/s   commits {commits['count']}")
+    await async_engine.dispose()
+
+    mismatches = check_daily_totals(engine)
+    print("rollup  consistent" if not mismatches else f"rollup  {len(mismatches)} mismatches")
+    if mismatches:
+        sys.exit(1)
+
+
+def main_cli():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    single_rows = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    print(f"{rows} rows in batches of {batch_size}, database in {TMPDIR}")
+    create_tables()
+    asyncio.run(run(rows, batch_size, single_rows))
+
+
+if __name__ == "__main__":
+    main_cli()
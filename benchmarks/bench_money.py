@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark aggregation over float amounts vs integer minor units.
+
+Fills a SQLite table with the same random cent amounts twice, as a REAL
+column (the old Transaction.amount) and as a BIGINT column (amount_minor),
+then times SUM ... GROUP BY over each and summing the fetched values in
+Python as floats, integers and Decimals. Also reports how far the float
+totals drift from the exact ones.
+
+Usage:
+    python benchmarks/bench_money.py [rows] [users] [repeat]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import time
+from decimal import Decimal
+
+from common import TMPDIR
+
+
+def fill(conn: sqlite3.Connection, rows: int, users: int):
+    rng = random.Random(1)
+    conn.execute("CREATE TABLE amounts (user_id INTEGER, amount REAL, amount_minor BIGINT)")
+    values = []
+    for i in range(rows):
+        cents = rng.randint(1, 50_000)
+        values.append((i % users, cents / 100, cents))
+    conn.executemany("INSERT INTO amounts VALUES (?, ?, ?)", values)
+    conn.execute("CREATE INDEX ix_amounts_user ON amounts (user_id, amount, amount_minor)")
+    conn.commit()
+
+
+def best_of(repeat: int, fn):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main_cli():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    conn = sqlite3.connect(os.path.join(TMPDIR, "money.db"))
+    print(f"Filling {rows} rows for {users} users...")
+    fill(conn, rows, users)
+
+    def sql_sum(column):
+        return lambda: dict(conn.execute(f"SELECT user_id, SUM({column}) FROM amounts GROUP BY user_id").fetchall())
+
+    float_seconds, float_totals = best_of(repeat, sql_sum("amount"))
+    int_seconds, int_totals = best_of(repeat, sql_sum("amount_minor"))
+    print(f"SQL SUM, REAL          {float_seconds * 1000:8.1f} ms   {rows / float_seconds / 1e6:6.1f} M rows/s")
+    print(f"SQL SUM, BIGINT        {int_seconds * 1000:8.1f} ms   {rows / int_seconds / 1e6:6.1f} M rows/s")
+
+    floats = [row[0] for row in conn.execute("SELECT amount FROM amounts")]
+    ints = [row[0] for row in conn.execute("SELECT amount_minor FROM amounts")]
+    decimals = [Decimal(cents).scaleb(-2) for cents in ints]
+    for label, values in (("float", floats), ("int (minor units)", ints), ("Decimal", decimals)):
+        seconds, _ = best_of(repeat, lambda: sum(values))
+        print(f"Python sum, {label:<18} {seconds * 1000:8.1f} ms   {rows / seconds / 1e6:6.1f} M rows/s")
+
+    drifted = 0
+    worst = Decimal(0)
+    for user_id, exact in int_totals.items():
+        error = abs(Decimal(repr(float_totals[user_id])) - Decimal(exact).scaleb(-2))
+        worst = max(worst, error)
+        drifted += error != 0
+    print(f"Float totals off by a fraction of a cent: {drifted}/{len(int_totals)} users (worst {worst:.2E})")
+    print(f"Float total of all rows: {sum(floats)!r}   exact: {Decimal(sum(ints)).scaleb(-2)}")
+
+
+if __name__ == "__main__":
+    main_cli()
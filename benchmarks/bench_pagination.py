@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark transaction history paging at increasing depths.
+
+Walks one heavy user's history with crud.get_transactions_page cursors and
+compares the time to fetch a page at a given depth with the equivalent
+LIMIT/OFFSET query, which has to skip every earlier row.
+
+Usage:
+    python benchmarks/bench_pagination.py [rows] [page_size]
+"""
+
+import asyncio
+import sys
+import time
+
+from common import seed_transactions
+
+from sqlalchemy import select
+
+from app import crud, models
+from app.database import AsyncSessionLocal, async_engine, create_tables, engine
+
+DEPTHS = (1, 10, 100, 1000, 10000)
+
+
+async def timed(coro_factory, repeat: int = 20) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await coro_factory()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+async def fetch_all(db, query):
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def run(rows: int, page_size: int):
+    async with AsyncSessionLocal() as db:
+        # Collect the cursor at the start of each measured depth
+        cursors = {1: None}
+        page = await crud.get_transactions_page(db, 0, page_size)
+        for depth in range(2, max(DEPTHS) + 1):
+            if page.next_cursor is None:
+                break
+            if depth in DEPTHS:
+                cursors[depth] = page.next_cursor
+            page = await crud.get_transactions_page(db, 0, page_size, page.next_cursor)
+
+        print(f"{'page':>6} {'keyset ms':>10} {'offset ms':>10}")
+        for depth, cursor in cursors.items():
+            keyset = await timed(lambda: crud.get_transactions_page(db, 0, page_size, cursor))
+            offset_query = select(models.Transaction).filter(
+                models.Transaction.user_id == 0
+            ).order_by(
+                models.Transaction.created_at.desc(), models.Transaction.id.desc()
+            ).offset((depth - 1) * page_size).limit(page_size)
+            offset = await timed(lambda: fetch_all(db, offset_query))
+            print(f"{depth:>6} {keyset:>10.2f} {offset:>10.2f}")
+    await async_engine.dispose()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    print(f"Seeding {rows} transactions for one user...")
+    create_tables()
+    seed_transactions(engine, rows, users=1)
+    asyncio.run(run(rows, page_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark draining a backlog of updates with long polling.
+
+Queues the same backlog of entries from many users on the stub Bot API
+three times and measures how long it takes until every update is processed:
+- webhook: one update per POST, each answered before the next, as Telegram
+  delivers them over a single connection
+- polling, limit 1: one getUpdates round trip per update
+- polling, limit N: batches of N updates, users processed concurrently
+
+Every update's reply goes through the stub with its round trip latency.
+Exits non-zero if an update is lost or processed twice.
+
+Usage:
+    python benchmarks/bench_polling.py [updates] [users] [limit]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+UPDATES = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+USERS = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+LIMIT = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+LATENCY_MS = 20
+PORT = 8082
+
+from common import make_update
+
+os.environ["BOT_API_URL"] = f"http://127.0.0.1:{PORT}/bot"
+os.environ["TELEGRAM_BOT_TOKEN"] = "1:bench"
+os.environ["INGEST_WORKERS"] = "0"
+os.environ["WEBHOOK_REPLY"] = "false"
+# Only the Bot API round trips are measured, not Telegram's flood limits
+os.environ.setdefault("BOT_RATE_GLOBAL", "100000")
+os.environ.setdefault("BOT_RATE_CHAT", "100000")
+
+import httpx
+from sqlalchemy import func, select
+
+from app import main, models
+from app.database import AsyncSessionLocal, async_engine, create_tables
+from app.polling import UpdatePoller
+from stub_bot_api import StubServer
+
+
+def backlog(first_update_id: int) -> list:
+    return [
+        make_update(first_update_id + i, 1 + i % USERS, f"-{i % 50 + 1} coffee")
+        for i in range(UPDATES)
+    ]
+
+
+async def transaction_count() -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(func.count()).select_from(models.Transaction))).scalar()
+
+
+async def drain_webhook(updates: list) -> float:
+    started = time.perf_counter()
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+        for update in updates:
+            response = await client.post("/telegram", json=update)
+            response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def drain_polling(stub: StubServer, updates: list, limit: int):
+    """Seconds until a fresh poller has processed the updates, and the poller"""
+    poller = UpdatePoller(main.bot, main.process_update, AsyncSessionLocal, dedup=main.update_dedup,
+                          timeout=1, limit=limit)
+    last_update_id = updates[-1]["update_id"]
+    stub.push_updates(updates)
+    started = time.perf_counter()
+    task = asyncio.create_task(poller.run())
+    while poller.offset is None or poller.offset <= last_update_id:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.001)
+    seconds = time.perf_counter() - started
+    poller.stop()
+    await task
+    return seconds, poller
+
+
+async def run(stub: StubServer):
+    update_id = 1
+    expected = 0
+    for label, limit in (("webhook", None), ("polling, limit 1", 1), (f"polling, limit {LIMIT}", LIMIT)):
+        updates = backlog(update_id)
+        update_id += UPDATES
+        if limit is None:
+            seconds = await drain_webhook(updates)
+        else:
+            seconds, _ = await drain_polling(stub, updates, limit)
+        expected += UPDATES
+        print(f"{label:<20} {seconds:8.2f} s   {UPDATES / seconds:8.0f} updates/s")
+
+    # A restarted poller resumes from the stored offset: already processed updates are not fetched again
+    stub.push_updates(backlog(update_id - UPDATES)[-LIMIT:])
+    _, poller = await drain_polling(stub, [make_update(update_id, 1, "-1 coffee")], LIMIT)
+    expected += 1
+    if poller.processed != 1 or poller.duplicates:
+        print(f"❌ Restarted poller: {poller.stats()}")
+        sys.exit(1)
+
+    entered = await transaction_count()
+    await async_engine.dispose()
+    if entered != expected:
+        print(f"❌ Expected {expected} transactions, found {entered}")
+        sys.exit(1)
+    print(f"{entered} transactions from {expected} updates, none processed twice")
+
+
+def main_cli():
+    print(f"{UPDATES} queued updates from {USERS} users, {LATENCY_MS:.0f} ms Bot API latency")
+    create_tables()
+    with StubServer(PORT, LATENCY_MS) as stub:
+        asyncio.run(run(stub))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark the recurring transaction scheduler.
+
+Seeds recurring rules with next runs spread over the coming month and a
+share of them overdue, as after downtime. Times one wake-up of the heap
+scheduler (a look at the earliest due time) against polling, which reads
+every rule and checks its due time on each tick, then times catching up
+the overdue rules one rule per commit against batches of rules.
+
+Usage:
+    python benchmarks/bench_recurring.py [rules] [due] [batch_size]
+"""
+
+import asyncio
+import heapq
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import TMPDIR
+
+from sqlalchemy import delete, func, select, update
+
+from app import models
+from app.database import AsyncSessionLocal, async_engine, create_tables, engine
+from app.money import DEFAULT_CURRENCY
+from app.recurring import RecurringScheduler
+from app.schedules import load_schedule
+
+SCHEDULES = ("daily", "weekly mon", "weekly fri", "monthly 1", "monthly 15", "cron 0 9 * * 1-5")
+
+
+def seed_rules(rules: int, due: int, now: datetime):
+    rng = random.Random(1)
+    with engine.begin() as conn:
+        conn.execute(models.RecurringRule.__table__.insert(), [
+            {
+                "user_id": i % 1000,
+                "schedule": SCHEDULES[i % len(SCHEDULES)],
+                "amount_minor": rng.randint(100, 100_000),
+                "currency": DEFAULT_CURRENCY,
+                "transaction_type": "expense",
+                "category": f"cat{i % 12}",
+                # The overdue ones missed a single occurrence an hour ago
+                "next_run": now - timedelta(hours=1) if i < due else now + timedelta(minutes=rng.randint(1, 43_200)),
+            }
+            for i in range(rules)
+        ])
+
+
+async def poll_once(now: datetime) -> int:
+    """What a polling scheduler does on every tick"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select(models.RecurringRule.schedule, models.RecurringRule.next_run))).all()
+    return sum(1 for schedule, next_run in rows if load_schedule(schedule) and next_run <= now)
+
+
+async def catch_up(batch_size: int, now: datetime):
+    scheduler = RecurringScheduler(AsyncSessionLocal, batch_size=batch_size)
+    await scheduler._refresh()
+    started = time.perf_counter()
+    entered = await scheduler.run_due(now)
+    return time.perf_counter() - started, entered, scheduler.batches
+
+
+async def reset(due: int, now: datetime):
+    """Make the first `due` rules overdue again and drop what they entered"""
+    async with AsyncSessionLocal() as db:
+        rule = models.RecurringRule
+        await db.execute(update(rule).where(rule.id <= due).values(next_run=now - timedelta(hours=1)))
+        await db.execute(delete(models.Transaction))
+        await db.execute(delete(models.DailyTotal))
+        await db.commit()
+
+
+async def run(rules: int, due: int, batch_size: int):
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    started = time.perf_counter()
+    due_found = await poll_once(now)
+    poll_seconds = time.perf_counter() - started
+
+    async with AsyncSessionLocal() as db:
+        rule = models.RecurringRule
+        heap = [tuple(row) for row in (await db.execute(select(rule.next_run, rule.id))).all()]
+    heapq.heapify(heap)
+    ticks = 100_000
+    started = time.perf_counter()
+    for _ in range(ticks):
+        _ = heap[0][0] <= now
+    heap_seconds = (time.perf_counter() - started) / ticks
+
+    print(f"{rules} rules, {due_found} due, database in {TMPDIR}")
+    print(f"wake-up, polling every rule  {poll_seconds * 1000:10.3f} ms")
+    print(f"wake-up, heap                {heap_seconds * 1000:10.5f} ms")
+
+    for size in (1, batch_size):
+        await reset(due, now)
+        seconds, entered, batches = await catch_up(size, now)
+        print(f"catch-up, batch size {size:<5}  {seconds * 1000:10.1f} ms   {entered} transactions in {batches} commits "
+              f"({entered / seconds:,.0f}/s)")
+
+    async with AsyncSessionLocal() as db:
+        entered = (await db.execute(select(func.count()).select_from(models.Transaction))).scalar()
+    if entered != due:
+        print(f"❌ Expected {due} transactions, found {entered}")
+        sys.exit(1)
+    await async_engine.dispose()
+
+
+def main_cli():
+    rules = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    due = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+
+    create_tables()
+    seed_rules(rules, due, datetime.utcnow())
+    asyncio.run(run(rules, due, batch_size))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark /search: the full-text index vs a LIKE scan.
+
+Grows the transactions table to each size in turn (descriptions drawn from
+a small vocabulary) and times, for one user at a time:
+- crud.search_transactions, served by the FTS5 index
+- the same filter as LIKE '%word%' on category and description, newest
+  first, which reads the user's rows until a page is full (all of them
+  for a word they never used)
+- adding a transaction, which also updates the index through its trigger
+Both searches must find the same number of matches.
+
+Usage:
+    python benchmarks/bench_search.py [sizes] [users] [repeat]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import TMPDIR
+
+from sqlalchemy import and_, or_, select, text
+
+from app import crud, models, schemas
+from app.database import AsyncSessionLocal, async_engine, create_tables, engine
+from app.money import DEFAULT_CURRENCY
+
+# No word is part of another, so LIKE '%word%' and the index agree: each of 12 words is in
+# 1/12 of all descriptions and each of 300 shops in 1/300 (cat3 also matches the category)
+WORDS = ["coffee", "groceries", "dentist", "taxi", "lunch", "gym", "books", "cinema", "pharmacy",
+         "electricity", "insurance", "bakery"]
+QUERIES = [["lunch"], ["cat3"], ["coffee", "shop042"], ["plumber"]]
+
+
+def seed(start: int, rows: int, users: int, chunk: int = 50_000):
+    """Insert rows start..start+rows-1 of the synthetic history, with descriptions"""
+    now = datetime.now()
+    insert = models.Transaction.__table__.insert()
+    with engine.begin() as conn:
+        for first in range(start, start + rows, chunk):
+            conn.execute(insert, [
+                {
+                    "user_id": i % users,
+                    "amount_minor": (i % 500) * 100 + i % 100,
+                    "currency": DEFAULT_CURRENCY,
+                    "transaction_type": "income" if i % 4 == 0 else "expense",
+                    "category": f"cat{i % 12}",
+                    "description": f"{WORDS[i * 7 % len(WORDS)]} shop{i * 13 % 300:03d}",
+                    "created_at": now - timedelta(minutes=(i * 7) % (365 * 24 * 60)),
+                }
+                for i in range(first, min(first + chunk, start + rows))
+            ])
+        conn.execute(text("ANALYZE"))
+
+
+def like_query(user_id: int, terms: list, limit: int):
+    transaction = models.Transaction
+    return select(transaction).where(
+        transaction.user_id == user_id,
+        and_(*(
+            or_(transaction.category.like(f"%{term}%"), transaction.description.like(f"%{term}%"))
+            for term in terms
+        )),
+    ).order_by(transaction.created_at.desc(), transaction.id.desc()).limit(limit)
+
+
+async def timed(operation, repeat: int) -> float:
+    """Median milliseconds of an operation"""
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        await operation(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def measure(users: int, repeat: int) -> dict:
+    results = {}
+    async with AsyncSessionLocal() as db:
+        for terms in QUERIES:
+            async def indexed(i):
+                await crud.search_transactions(db, i % users, terms)
+
+            async def like(i):
+                (await db.execute(like_query(i % users, terms, 10))).scalars().all()
+
+            results[" ".join(terms)] = (await timed(indexed, repeat), await timed(like, repeat))
+
+            everything = await crud.search_transactions(db, 0, terms, page_size=10 ** 6)
+            scanned = (await db.execute(like_query(0, terms, 10 ** 6))).scalars().all()
+            if len(everything.items) != len(scanned):
+                print(f"❌ '{' '.join(terms)}': the index found {len(everything.items)} matches, "
+                      f"LIKE found {len(scanned)}")
+                sys.exit(1)
+
+        async def insert(i):
+            await crud.create_transaction(db, schemas.TransactionCreate(
+                user_id=i % users, amount=4, transaction_type="expense", category="coffee",
+                description="flat white airport",
+            ))
+
+        results["insert"] = await timed(insert, repeat)
+    await async_engine.dispose()
+    return results
+
+
+def main_cli():
+    sizes = [int(size) for size in sys.argv[1].split(",")] if len(sys.argv) > 1 else [1_000_000, 3_000_000]
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    create_tables()
+    seeded = 0
+    print(f"{users} users, median of {repeat} searches, database in {TMPDIR}")
+    print(f"{'rows':>10}  {'query':<16}{'index ms':>10}{'LIKE ms':>10}{'speedup':>9}")
+    for size in sizes:
+        seed(seeded, size - seeded, users)
+        seeded = size
+        results = asyncio.run(measure(users, repeat))
+        insert_ms = results.pop("insert")
+        for query, (indexed_ms, like_ms) in results.items():
+            print(f"{size:>10,}  {query:<16}{indexed_ms:>10.3f}{like_ms:>10.3f}{like_ms / indexed_ms:>8.1f}x")
+        print(f"{size:>10,}  insert with index maintenance {insert_ms:.3f} ms")
+    print("Both searches found the same matches")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent reads and writes against SQLite, default vs tuned.
+
+Writers add transactions one commit at a time while readers page through
+history and build summaries, all on the async engine, for a fixed
+duration. Each configuration gets its own freshly seeded database file:
+
+    default   rollback journal, synchronous=FULL, a new connection per
+              session (NullPool), which is how the app ran before
+    tuned     app.database's engine: WAL, synchronous=NORMAL, busy_timeout,
+              mmap and page cache pragmas, pooled connections
+
+Reports operations per second for each side and "database is locked"
+failures. All sessions share one event loop, as in the app, so on a fast
+disk the loop's CPU is the ceiling; the gap widens where fsync is slow,
+since the default side syncs on every commit.
+
+Usage:
+    python benchmarks/bench_sqlite_concurrency.py [rows] [seconds] [writers] [readers]
+"""
+
+import asyncio
+import collections
+import os
+import sys
+import time
+
+from common import TMPDIR, seed_transactions
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import crud, schemas
+from app.database import get_async_database_url, make_async_engine, make_engine
+from app.migrations import run_migrations
+
+USERS = 50
+
+
+def prepare(label: str, rows: int, tuned: bool):
+    """Seed a database file for one configuration and return its async engine"""
+    url = f"sqlite:///{os.path.join(TMPDIR, label + '.db')}"
+    # The journal mode is stored in the file, so the default side must never be opened with the tuned engine
+    sync_engine = make_engine(url) if tuned else create_engine(url)
+    run_migrations(sync_engine)
+    seed_transactions(sync_engine, rows, USERS)
+    sync_engine.dispose()
+    if tuned:
+        return make_async_engine(url)
+    return create_async_engine(get_async_database_url(url), poolclass=NullPool)
+
+
+async def run(label: str, async_engine, seconds: float, writers: int, readers: int):
+    sessions = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    counts = collections.Counter()
+    deadline = time.perf_counter() + seconds
+
+    async def writer(n: int):
+        while time.perf_counter() < deadline:
+            transaction = schemas.TransactionCreate(
+                user_id=n % USERS, amount=12.5, transaction_type="expense", category="bench"
+            )
+            try:
+                async with sessions() as db:
+                    await crud.create_transaction(db, transaction)
+                counts["writes"] += 1
+            except OperationalError:
+                counts["locked"] += 1
+
+    async def reader(n: int):
+        i = 0
+        while time.perf_counter() < deadline:
+            i += 1
+            user_id = (n + i) % USERS
+            try:
+                async with sessions() as db:
+                    if i % 2:
+                        await crud.get_transactions_page(db, user_id, 20)
+                    else:
+                        await crud._build_summary_report(db, user_id, 30)
+                counts["reads"] += 1
+            except OperationalError:
+                counts["locked"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(n) for n in range(writers)), *(reader(n) for n in range(readers)))
+    elapsed = time.perf_counter() - started
+    await async_engine.dispose()
+    print(f"{label:<8} writes {counts['writes'] / elapsed:8.1f}/s   reads {counts['reads'] / elapsed:8.1f}/s   "
+          f"locked {counts['locked']}")
+    return counts, elapsed
+
+
+def main_cli():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    readers = int(sys.argv[4]) if len(sys.argv) > 4 else 8
+
+    print(f"Seeding {rows} transactions for {USERS} users per database...")
+    engines = [(label, prepare(label, rows, tuned)) for label, tuned in (("default", False), ("tuned", True))]
+    print(f"{writers} writers, {readers} readers, {seconds:.0f} s each")
+    results = {label: asyncio.run(run(label, async_engine, seconds, writers, readers)) for label, async_engine in engines}
+
+    (before, before_elapsed), (after, after_elapsed) = results["default"], results["tuned"]
+    total_before = (before["writes"] + before["reads"]) / before_elapsed
+    total_after = (after["writes"] + after["reads"]) / after_elapsed
+    print(f"throughput {total_before:.1f} -> {total_after:.1f} ops/s ({total_after / max(total_before, 1e-9):.1f}x)")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark cold start: import time and time to the first 200.
+
+Measures, in fresh interpreters:
+- importing app.main, with the slowest top-level packages from -X importtime
+- starting uvicorn on an existing, up-to-date database until GET /health
+  and then a webhook update first answer 200
+
+The server's Bot API points at a local stub answering after a delay, so the
+startup notification to the admin chat costs a realistic round trip; it is
+sent in the background and should not delay the first 200.
+
+Usage:
+    python benchmarks/bench_startup.py [runs] [bot_api_latency_ms]
+"""
+
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from common import make_update
+
+import httpx
+
+from stub_bot_api import StubServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+ADMIN_CHAT_ID = "-100"
+
+IMPORT_SCRIPT = "import time; started = time.perf_counter(); import app.main; print(time.perf_counter() - started)"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_env(bot_api_url: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": os.environ["DATABASE_URL"],
+        "BOT_API_URL": bot_api_url,
+        "TELEGRAM_BOT_TOKEN": "1:bench",
+        "TELEGRAM_CHAT_ID": ADMIN_CHAT_ID,
+        "WEBHOOK_REPLY": "false",
+    })
+    return env
+
+
+def import_seconds(env: dict) -> float:
+    result = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env: dict, count: int = 8):
+    """(cumulative seconds, package) of the slowest top-level imports under app.main"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    packages = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Two spaces of indent: imported directly by app.main
+        if name.startswith("   ") and not name.startswith("    ") and cumulative.strip().isdigit():
+            packages.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(packages, reverse=True)[:count]
+
+
+def time_to_first_200(env: dict, update_id: int):
+    """Seconds from spawning uvicorn until /health and then /telegram answer 200"""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while True:
+                try:
+                    if client.get("/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                time.sleep(0.005)
+            health = time.perf_counter() - started
+            response = client.post("/telegram", json=make_update(update_id, 1, "/start"))
+            response.raise_for_status()
+            webhook = time.perf_counter() - started
+        return health, webhook
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main_cli():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    # Create the database first, as on a restart after sleeping
+    subprocess.run([sys.executable, "-c", "from app.database import create_tables; create_tables()"],
+                   cwd=ROOT, env=dict(os.environ), check=True, capture_output=True)
+
+    notifications = []
+
+    def on_stub_call(method: str, data: dict):
+        if method == "sendMessage" and str(data.get("chat_id")) == ADMIN_CHAT_ID:
+            notifications.append(time.perf_counter())
+
+    with StubServer(port=free_port(), latency_ms=latency_ms, listener=on_stub_call) as stub:
+        env = server_env(stub.url)
+        imports = [import_seconds(env) for _ in range(runs)]
+        print(f"import app.main           median {statistics.median(imports) * 1000:7.0f} ms   "
+              f"min {min(imports) * 1000:7.0f} ms")
+        for seconds, package in slowest_imports(env):
+            print(f"    {package:<28} {seconds * 1000:7.0f} ms")
+
+        health = []
+        webhook = []
+        for run in range(runs):
+            first_health, first_webhook = time_to_first_200(env, run + 1)
+            health.append(first_health)
+            webhook.append(first_webhook)
+        print(f"first GET /health 200     median {statistics.median(health) * 1000:7.0f} ms   "
+              f"min {min(health) * 1000:7.0f} ms")
+        print(f"first webhook 200         median {statistics.median(webhook) * 1000:7.0f} ms   "
+              f"min {min(webhook) * 1000:7.0f} ms")
+        print(f"startup notifications received by the stub: {len(notifications)} of {runs} "
+              f"({latency_ms:.0f} ms Bot API latency, not waited for)")
+    print(json.dumps({
+        "import_ms": round(statistics.median(imports) * 1000),
+        "first_health_ms": round(statistics.median(health) * 1000),
+        "first_webhook_ms": round(statistics.median(webhook) * 1000),
+    }))
+
+
+if __name__ == "__main__":
+    main_cli()
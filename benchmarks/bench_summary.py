@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark /summary aggregation over a large transactions table.
+
+Compares the old implementation (load every ORM row in the window, sum in
+Python, then a second query for categories) with crud.get_summary_report,
+which aggregates the daily rollup in the database in one round trip. Reports time per call
+and peak Python memory (tracemalloc) for a heavy user's 365-day window.
+
+Usage:
+    python benchmarks/bench_summary.py [rows] [users] [repeat]
+"""
+
+import asyncio
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from common import seed_transactions
+
+from sqlalchemy import select
+
+from app import crud, models, schemas
+from app.database import AsyncSessionLocal, async_engine, create_tables, engine
+
+
+async def legacy_summary_report(db, user_id: int, days: int) -> schemas.SummaryReport:
+    """Previous /summary: ORM rows summed in Python plus a category query"""
+    start_date = datetime.now() - timedelta(days=days)
+    result = await db.execute(
+        select(models.Transaction).filter(
+            models.Transaction.user_id == user_id,
+            models.Transaction.created_at >= start_date
+        )
+    )
+    transactions = result.scalars().all()
+    total_income = sum(t.amount for t in transactions if t.transaction_type == "income")
+    total_expenses = sum(t.amount for t in transactions if t.transaction_type == "expense")
+    summary = schemas.TransactionSummary(
+        total_income=total_income,
+        total_expenses=total_expenses,
+        balance=total_income - total_expenses,
+        transaction_count=len(transactions)
+    )
+    return schemas.SummaryReport(
+        summary=summary,
+        expenses_by_category=await crud.get_category_summary(db, user_id, days)
+    )
+
+
+async def measure(label: str, report, repeat: int):
+    """Time `repeat` calls and record peak allocations of a single call"""
+    async with AsyncSessionLocal() as db:
+        await report(db, 0, 365)  # warm the page cache
+
+        tracemalloc.start()
+        result = await report(db, 0, 365)
+        db.expunge_all()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            await report(db, 0, 365)
+            db.expunge_all()
+        elapsed = (time.perf_counter() - started) / repeat
+
+    print(f"{label:<8} {elapsed * 1000:9.1f} ms/call   peak {peak / 1024 / 1024:8.2f} MiB   "
+          f"count {result.summary.transaction_count}   balance {result.summary.balance:.2f}")
+
+
+async def run(repeat: int):
+    await measure("legacy", legacy_summary_report, repeat)
+    await measure("sql", crud.get_summary_report, repeat)
+    await async_engine.dispose()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    print(f"Seeding {rows} transactions for {users} users ({rows // users} per user)...")
+    create_tables()
+    seed_transactions(engine, rows, users)
+    asyncio.run(run(repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark webhook throughput under concurrent load.
+
+Compares the legacy blocking path (sync SQLAlchemy session used inside the
+coroutine) with the async database layer. Runs entirely in-process against a
+temporary SQLite database and a stub bot, so no Telegram access is needed.
+
+A local SQLite file has no network latency, so every query is delayed by a
+simulated round trip (rtt_ms) to model a hosted Postgres. The delay runs on
+the thread executing the statement: the event loop for the blocking path,
+the aiosqlite worker thread for the async path. The database runs in WAL
+mode (the app default), so the per-update dedup writes do not stall behind
+the delayed reads.
+
+Usage:
+    python benchmarks/bench_webhook_concurrency.py [rows] [requests] [concurrency] [rtt_ms]
+"""
+
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import make_update, seed_transactions, stub_bot
+
+import httpx
+from sqlalchemy import event, func
+
+from app import crud, models, schemas
+from app import main
+from app.database import SessionLocal, async_engine, create_tables, engine
+from app.money import from_minor
+
+USERS = 50
+
+
+def simulate_round_trip(rtt_ms: float):
+    """Delay every SELECT on both engines by rtt_ms"""
+    def delay(statement):
+        # Writes are left alone: SQLite serialises them under a file lock
+        if statement.lstrip().upper().startswith("SELECT"):
+            time.sleep(rtt_ms / 1000)
+
+    @event.listens_for(engine, "connect")
+    def sync_connect(dbapi_connection, connection_record):
+        dbapi_connection.set_trace_callback(delay)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def async_connect(dbapi_connection, connection_record):
+        dbapi_connection.run_async(lambda conn: conn.set_trace_callback(delay))
+
+
+async def legacy_get_user_summary(db, user_id: int, days: int = 30) -> schemas.TransactionSummary:
+    """Pre-async implementation: blocking query on a sync session"""
+    session = SessionLocal()
+    try:
+        start_date = datetime.now() - timedelta(days=days)
+        transactions = session.query(models.Transaction).filter(
+            models.Transaction.user_id == user_id,
+            models.Transaction.created_at >= start_date
+        ).all()
+        total_income = sum(t.amount for t in transactions if t.transaction_type == "income")
+        total_expenses = sum(t.amount for t in transactions if t.transaction_type == "expense")
+        return schemas.TransactionSummary(
+            total_income=total_income,
+            total_expenses=total_expenses,
+            balance=total_income - total_expenses,
+            transaction_count=len(transactions)
+        )
+    finally:
+        session.close()
+
+
+async def legacy_get_category_summary(db, user_id: int, days: int = 30) -> dict:
+    """Pre-async implementation: blocking query on a sync session"""
+    session = SessionLocal()
+    try:
+        start_date = datetime.now() - timedelta(days=days)
+        rows = session.query(
+            models.Transaction.category,
+            func.sum(models.Transaction.amount_minor)
+        ).filter(
+            models.Transaction.user_id == user_id,
+            models.Transaction.transaction_type == "expense",
+            models.Transaction.created_at >= start_date,
+            models.Transaction.category.isnot(None)
+        ).group_by(models.Transaction.category).all()
+        return {category: from_minor(total) for category, total in rows}
+    finally:
+        session.close()
+
+
+async def legacy_get_summary_report(db, user_id: int, days: int = 30) -> schemas.SummaryReport:
+    """Pre-async /summary: two blocking queries on sync sessions"""
+    return schemas.SummaryReport(
+        summary=await legacy_get_user_summary(db, user_id, days),
+        expenses_by_category=await legacy_get_category_summary(db, user_id, days)
+    )
+
+
+async def run(label: str, requests: int, concurrency: int, first_update_id: int = 0):
+    """Fire /summary webhooks with bounded concurrency and report throughput"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/telegram", json=make_update(first_update_id + i, i % USERS, "/summary 365"))
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{label:<10} {requests / elapsed:8.1f} req/s   p50 {p50:7.1f} ms   p95 {p95:7.1f} ms   errors {errors}")
+
+
+def main_cli():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    rtt_ms = float(sys.argv[4]) if len(sys.argv) > 4 else 5.0
+
+    print(f"Seeding {rows} transactions for {USERS} users...")
+    create_tables()
+    seed_transactions(engine, rows, USERS)
+    engine.dispose()
+    simulate_round_trip(rtt_ms)
+    print(f"{requests} requests, concurrency {concurrency}, simulated round trip {rtt_ms} ms")
+    main.bot = stub_bot()
+
+    async_report = crud.get_summary_report
+
+    crud.get_summary_report = legacy_get_summary_report
+    asyncio.run(run("blocking", requests, concurrency))
+
+    crud.get_summary_report = async_report
+    asyncio.run(run("async", requests, concurrency, first_update_id=requests))
+
+if __name__ == "__main__":
+    main_cli()
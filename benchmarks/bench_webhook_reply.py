@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark webhook latency with and without the reply-in-response fast path.
+
+Starts the stub Bot API on a local port with a simulated round trip and
+points the bot at it, then posts single-transaction updates to the webhook
+(processed inline) and reports per-webhook latency and the number of Bot
+API calls the stub received. With the fast path the reply travels in the
+webhook response, so the round trip disappears from the request.
+
+Usage:
+    python benchmarks/bench_webhook_reply.py [requests] [latency_ms] [port]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+LATENCY_MS = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+PORT = int(sys.argv[3]) if len(sys.argv) > 3 else 8081
+
+from common import make_update
+
+os.environ["BOT_API_URL"] = f"http://127.0.0.1:{PORT}/bot"
+os.environ["INGEST_WORKERS"] = "0"
+# Requests arrive faster than Telegram's 30 msg/s; lift the global limit so only latency is measured
+os.environ.setdefault("BOT_RATE_GLOBAL", "1000")
+
+import httpx
+
+from app import main
+from app.database import async_engine, create_tables
+from config import Config
+from stub_bot_api import StubServer
+
+
+async def run(stub: StubServer):
+    update_id = 0
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+        for label, fast_path in (("direct", False), ("response", True)):
+            Config.WEBHOOK_REPLY = fast_path
+            calls_before = sum(stub.calls.values())
+            latencies = []
+            for i in range(REQUESTS):
+                update_id += 1
+                # A different chat per request keeps the per-chat limiter out of the measurement
+                started = time.perf_counter()
+                response = await client.post("/telegram", json=make_update(update_id, 1000 + update_id, "-5 coffee"))
+                latencies.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+            latencies.sort()
+            print(f"{label:<9} p50 {statistics.median(latencies):7.1f} ms   "
+                  f"p95 {latencies[int(len(latencies) * 0.95) - 1]:7.1f} ms   "
+                  f"Bot API calls {sum(stub.calls.values()) - calls_before}")
+    print(f"outbound  {main.outbound.stats()}")
+    await async_engine.dispose()
+
+
+def main_cli():
+    create_tables()
+    with StubServer(PORT, LATENCY_MS) as stub:
+        asyncio.run(run(stub))
+
+
+if __name__ == "__main__":
+    main_cli()
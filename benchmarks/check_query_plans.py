@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Check that the hot crud queries are served by the transactions indexes.
+
+Runs every read query in app.crud against a seeded temporary SQLite
+database, captures the SQL it emits and asserts that EXPLAIN QUERY PLAN
+searches one of the composite indexes (or the rollup primary key) instead
+of scanning a table or sorting in a temporary B-tree. Exits non-zero on failure.
+
+Usage:
+    python benchmarks/check_query_plans.py
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta
+
+from common import seed_transactions
+
+from sqlalchemy import event, text
+
+from app import crud, schemas
+from app.database import AsyncSessionLocal, async_engine, create_tables, engine
+
+EXPECTED_INDEXES = (
+    "ix_transactions_user_created_id",
+    "ix_transactions_user_type_created",
+    "sqlite_autoindex_daily_user_category_totals_1",  # rollup primary key
+    "ix_transactions_archive_user_created_id",
+)
+
+
+def cursor_at(created_at: datetime) -> str:
+    return crud.encode_cursor(schemas.Transaction(
+        id=10_000, user_id=7, amount=1, transaction_type="expense", created_at=created_at
+    ))
+
+
+async def export_all(db):
+    async for _ in crud.stream_transactions(db, 7):
+        pass
+
+
+def seed(rows: int = 20_000, users: int = 100):
+    """Insert enough rows for the planner statistics to be meaningful"""
+    create_tables()
+    seed_transactions(engine, rows, users)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+async def capture_queries():
+    """Run the crud readers and return the (name, sql, params) they emitted"""
+    captured = []
+    current = {"name": None}
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((current["name"], statement, parameters))
+
+    readers = {
+        "get_transactions_by_user": lambda db: crud.get_transactions_by_user(db, 7, 10),
+        "get_transactions_page": lambda db: crud.get_transactions_page(db, 7, 10, cursor_at(datetime.now())),
+        # Reaches past the archive horizon, so the archive table is read too
+        "get_transactions_page (archived)": lambda db: crud.get_transactions_page(
+            db, 7, 10, cursor_at(datetime.now() - timedelta(days=500))
+        ),
+        "stream_transactions": export_all,
+        "get_transactions_by_user_and_period": lambda db: crud.get_transactions_by_user_and_period(db, 7, 30),
+        "get_user_summary": lambda db: crud.get_user_summary(db, 7, 365),
+        "get_category_summary": lambda db: crud.get_category_summary(db, 7, 365),
+        "get_summary_report": lambda db: crud.get_summary_report(db, 7, 365),
+    }
+    async with AsyncSessionLocal() as db:
+        for name, reader in readers.items():
+            current["name"] = name
+            await reader(db)
+    await async_engine.dispose()
+    return captured
+
+
+def main():
+    seed()
+    failures = 0
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for name, statement, parameters in asyncio.run(capture_queries()):
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plan = [row[-1] for row in cursor.fetchall()]
+            uses_index = any(index in step for step in plan for index in EXPECTED_INDEXES)
+            full_scan = any(step.startswith(("SCAN transactions", "SCAN daily_user_category_totals")) for step in plan)
+            sorts = any("TEMP B-TREE FOR ORDER BY" in step for step in plan)
+            ok = uses_index and not full_scan and not sorts
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} {name}")
+            for step in plan:
+                print(f"     {step}")
+    finally:
+        raw.close()
+
+    if failures:
+        print(f"\n{failures} queries are not served by the expected indexes")
+        sys.exit(1)
+    print("\nAll hot queries use the composite indexes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Import this module before anything from `app`: it points DATABASE_URL at a
+fresh temporary SQLite database and puts the repository root on sys.path.
+The query cache is disabled unless CACHE_BACKEND is set explicitly, so the
+numbers measure the database path, and so is webhook admission control
+unless ADMISSION_USER_RATE / ADMISSION_GLOBAL_RATE are, since benchmarks post
+far more updates per user than a person would send.
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+TMPDIR = tempfile.mkdtemp(prefix="money_bot_bench_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMPDIR, 'bench.db')}"
+os.environ.setdefault("CACHE_BACKEND", "none")
+os.environ.setdefault("ADMISSION_USER_RATE", "0")
+os.environ.setdefault("ADMISSION_GLOBAL_RATE", "0")
+
+# Configured before app.main so its INFO-level basicConfig is a no-op
+logging.basicConfig(format="%(levelname)s %(name)s: %(message)s", level=logging.WARNING)
+
+
+def seed_transactions(engine, rows: int, users: int, days: int = 365, chunk: int = 50_000, first_user: int = 0):
+    """Insert synthetic transactions for users first_user.. spread over the last `days` days"""
+    from app import models
+    from app.money import DEFAULT_CURRENCY
+    from app.rollups import rebuild_daily_totals
+
+    now = datetime.now()
+    minutes = days * 24 * 60
+    insert = models.Transaction.__table__.insert()
+    with engine.begin() as conn:
+        for start in range(0, rows, chunk):
+            conn.execute(insert, [
+                {
+                    "user_id": first_user + i % users,
+                    "amount_minor": (i % 500) * 100 + i % 100,
+                    "currency": DEFAULT_CURRENCY,
+                    "transaction_type": "income" if i % 4 == 0 else "expense",
+                    "category": f"cat{i % 12}",
+                    "created_at": now - timedelta(minutes=(i * 7) % minutes),
+                }
+                for i in range(start, min(start + chunk, rows))
+            ])
+    rebuild_daily_totals(engine)
+
+
+def make_update(update_id: int, user_id: int, text: str) -> dict:
+    """Minimal Telegram update payload carrying a text message"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "bench"},
+            "text": text,
+        },
+    }
+
+
+def stub_bot():
+    """Bot whose outgoing messages are counted instead of sent to Telegram"""
+    from telegram import Bot
+
+    class StubBot(Bot):
+        sent = 0
+
+        async def send_message(self, chat_id, text, **kwargs):
+            StubBot.sent += 1
+            return None
+
+    return StubBot(token="0:bench")
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Load test the webhook with synthetic Telegram traffic.
+
+Generates updates from many synthetic users: +/- entries, /summary,
+/transactions and /delete in realistic proportions. They are fired at the
+webhook either open loop at a fixed rate (--rate) or closed loop with a
+fixed number of in-flight requests (--concurrency).
+
+A local stub stands in for api.telegram.org, so replies are counted and
+timed without touching Telegram. By default the app runs in-process
+against a temporary SQLite database, with its Bot API pointed at the stub.
+With --url the traffic goes to a running server instead; start that
+server with BOT_API_URL=http://127.0.0.1:<stub-port>/bot.
+
+Reports webhook latency and reply latency (webhook POST until the stub
+receives the answer) as p50/p95/p99, plus throughput and error rates.
+Exits non-zero when --max-p99-ms or --max-error-rate is exceeded, so it
+can gate a deployment.
+
+Usage:
+    python benchmarks/loadtest.py [--rate N | --concurrency N] [--duration S]
+        [--users N] [--seed-rows N] [--url URL] [--stub-port P] [--stub-latency-ms MS]
+        [--bot-rate-global N] [--settle S]
+        [--max-p99-ms MS] [--max-error-rate FRACTION]
+"""
+
+import argparse
+import asyncio
+import collections
+import os
+import random
+import sys
+import threading
+import time
+from typing import Deque, Dict, List, Optional
+
+from common import make_update, seed_transactions
+
+import httpx
+
+from stub_bot_api import StubServer
+
+CATEGORIES = ["food", "coffee", "rent", "transport", "groceries", "fun", "salary", "bonus"]
+
+
+def synthetic_text(rng: random.Random) -> str:
+    """One message drawn from the traffic mix"""
+    roll = rng.random()
+    if roll < 0.45:
+        return f"-{rng.randint(1, 200)}.{rng.randint(0, 99):02d} {rng.choice(CATEGORIES[:6])}"
+    if roll < 0.55:
+        return f"+{rng.randint(100, 5000)} {rng.choice(CATEGORIES[6:])} synthetic"
+    if roll < 0.75:
+        return rng.choice(["/summary", "/summary 7", "/summary 90"])
+    if roll < 0.95:
+        return rng.choice(["/transactions", "/transactions 5", "/transactions 20"])
+    return f"/delete {rng.randint(1, 100_000)}"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class ReplyTracker:
+    """Matches Bot API calls seen by the stub to the webhook POSTs that caused them.
+
+    Each synthetic update gets exactly one reply, so replies to a chat are
+    matched to that chat's pending updates in order.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Deque[float]] = collections.defaultdict(collections.deque)
+        self.latencies: List[float] = []
+        self.unmatched = 0
+
+    def sent(self, chat_id: int, started: float):
+        with self._lock:
+            self._pending[chat_id].append(started)
+
+    def answered(self, chat_id: int, answered_at: Optional[float] = None):
+        answered_at = answered_at or time.perf_counter()
+        with self._lock:
+            pending = self._pending.get(chat_id)
+            if not pending:
+                self.unmatched += 1
+                return
+            self.latencies.append((answered_at - pending.popleft()) * 1000)
+
+    def cancel(self, chat_id: int, started: float):
+        """Forget an update that will not be answered (rejected, dropped or failed)"""
+        with self._lock:
+            pending = self._pending.get(chat_id)
+            if pending and started in pending:
+                pending.remove(started)
+
+    def on_stub_call(self, method: str, data: dict):
+        if method.startswith("send") and str(data.get("chat_id", "")).lstrip("-").isdigit():
+            self.answered(int(data["chat_id"]))
+
+    def outstanding(self) -> int:
+        with self._lock:
+            return sum(len(pending) for pending in self._pending.values())
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, path: str, args, tracker: ReplyTracker):
+        self.client = client
+        self.path = path
+        self.args = args
+        self.tracker = tracker
+        self.rng = random.Random(args.random_seed)
+        # Start above ids used by earlier runs so deduplication does not swallow them
+        self.update_id = int(time.time() * 1000)
+        self.latencies: List[float] = []
+        self.statuses: collections.Counter = collections.Counter()
+        self.errors: collections.Counter = collections.Counter()
+
+    async def send_one(self):
+        self.update_id += 1
+        user_id = 1_000_000 + self.rng.randrange(self.args.users)
+        payload = make_update(self.update_id, user_id, synthetic_text(self.rng))
+        started = time.perf_counter()
+        self.tracker.sent(user_id, started)
+        try:
+            response = await self.client.post(self.path, json=payload)
+        except httpx.HTTPError as e:
+            self.errors[type(e).__name__] += 1
+            self.tracker.cancel(user_id, started)
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        self.latencies.append(elapsed)
+        if response.status_code >= 400:
+            self.errors[f"http {response.status_code}"] += 1
+            self.tracker.cancel(user_id, started)
+            return
+        body = response.json()
+        if "method" in body:
+            # Reply returned in the webhook response: it arrives with the response
+            self.statuses["webhook_reply"] += 1
+            self.tracker.answered(user_id)
+        else:
+            status = body.get("status", "unknown")
+            self.statuses[status] += 1
+            if status != "ok":
+                self.tracker.cancel(user_id, started)
+
+    async def run_rate(self):
+        interval = 1 / self.args.rate
+        deadline = time.perf_counter() + self.args.duration
+        next_at = time.perf_counter()
+        tasks = set()
+        while next_at < deadline:
+            task = asyncio.create_task(self.send_one())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        await asyncio.gather(*tasks)
+
+    async def run_concurrency(self):
+        deadline = time.perf_counter() + self.args.duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                await self.send_one()
+
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+
+
+def report(test: LoadTest, tracker: ReplyTracker, elapsed: float, calls) -> bool:
+    args = test.args
+    latencies = sorted(test.latencies)
+    replies = sorted(tracker.latencies)
+    total = len(test.latencies) + sum(count for name, count in test.errors.items() if not name.startswith("http"))
+    failed = sum(test.errors.values())
+    error_rate = failed / total if total else 0.0
+    p99 = percentile(latencies, 0.99)
+
+    mode = f"rate {args.rate}/s" if args.rate else f"concurrency {args.concurrency}"
+    print(f"{mode}, {args.users} users, {elapsed:.1f} s")
+    print(f"requests   {total}   throughput {total / elapsed:.1f} req/s")
+    print(f"webhook    p50 {percentile(latencies, 0.5):8.1f} ms   p95 {percentile(latencies, 0.95):8.1f} ms   "
+          f"p99 {p99:8.1f} ms   max {latencies[-1] if latencies else 0:8.1f} ms")
+    print(f"reply      p50 {percentile(replies, 0.5):8.1f} ms   p95 {percentile(replies, 0.95):8.1f} ms   "
+          f"p99 {percentile(replies, 0.99):8.1f} ms   answered {len(replies)}   "
+          f"unanswered {tracker.outstanding()}")
+    print(f"statuses   {dict(test.statuses)}")
+    print(f"errors     {dict(test.errors) or 0}   error rate {error_rate:.2%}")
+    print(f"Bot API    {dict(calls)}")
+
+    ok = True
+    if args.max_p99_ms is not None and p99 > args.max_p99_ms:
+        print(f"❌ p99 {p99:.1f} ms is over {args.max_p99_ms} ms")
+        ok = False
+    if args.max_error_rate is not None and error_rate > args.max_error_rate:
+        print(f"❌ error rate {error_rate:.2%} is over {args.max_error_rate:.2%}")
+        ok = False
+    return ok
+
+
+async def run(args, stub: StubServer, tracker: ReplyTracker) -> bool:
+    if args.url:
+        client = httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=1000))
+        path = args.url
+        app = None
+    else:
+        from app import main
+
+        app = main
+        await main.startup_event()
+        client = httpx.AsyncClient(app=main.app, base_url="http://loadtest", timeout=30)
+        path = "/telegram"
+
+    calls_before = collections.Counter(stub.calls)
+    test = LoadTest(client, path, args, tracker)
+    started = time.perf_counter()
+    async with client:
+        if args.rate:
+            await test.run_rate()
+        else:
+            await test.run_concurrency()
+        elapsed = time.perf_counter() - started
+        # Give queued updates a moment to be answered
+        settle_until = time.perf_counter() + args.settle
+        while tracker.outstanding() and time.perf_counter() < settle_until:
+            await asyncio.sleep(0.05)
+
+    if app is not None:
+        await app.shutdown_event()
+        print(f"app        queue {app.ingestion_queue.stats()}")
+        print(f"           outbound {app.outbound.stats()}")
+    return report(test, tracker, elapsed, stub.calls - calls_before)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the Telegram webhook")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--rate", type=float, help="open loop: updates per second")
+    mode.add_argument("--concurrency", type=int, default=20, help="closed loop: requests in flight")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of traffic")
+    parser.add_argument("--users", type=int, default=1000, help="synthetic users")
+    parser.add_argument("--seed-rows", type=int, default=100_000, help="transactions to seed (in-process only)")
+    parser.add_argument("--url", help="webhook URL of a running server instead of the in-process app")
+    parser.add_argument("--stub-port", type=int, default=8081)
+    parser.add_argument("--stub-latency-ms", type=float, default=50, help="simulated Bot API round trip")
+    parser.add_argument("--bot-rate-global", type=float,
+                        help="override BOT_RATE_GLOBAL in-process (Telegram allows ~30 msg/s)")
+    parser.add_argument("--settle", type=float, default=10, help="seconds to wait for queued replies")
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--max-p99-ms", type=float, help="fail if webhook p99 latency is higher")
+    parser.add_argument("--max-error-rate", type=float, help="fail if the error fraction is higher")
+    return parser.parse_args()
+
+
+def main_cli():
+    args = parse_args()
+    if args.rate:
+        args.concurrency = None
+    tracker = ReplyTracker()
+
+    if not args.url:
+        os.environ["BOT_API_URL"] = f"http://127.0.0.1:{args.stub_port}/bot"
+        if args.bot_rate_global:
+            os.environ["BOT_RATE_GLOBAL"] = str(args.bot_rate_global)
+        from app.database import create_tables, engine
+
+        create_tables()
+        if args.seed_rows:
+            seed_transactions(engine, args.seed_rows, args.users, first_user=1_000_000)
+
+    with StubServer(args.stub_port, args.stub_latency_ms, listener=tracker.on_stub_call) as stub:
+        ok = asyncio.run(run(args, stub, tracker))
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Telegram Bot API.
+
+Answers every POST /bot<token>/<method> after a fixed delay with a
+plausible result, so the bot can be pointed at it (BOT_API_URL) to measure
+outbound latency without touching Telegram. Optionally enforces a per-chat
+flood limit by answering 429 with retry_after, like the real API.
+
+getUpdates serves the updates queued with StubServer.push_updates, long
+polling for up to its timeout and confirming those below its offset, so the
+polling entry point (python -m app.polling) can be run against it.
+
+Usage:
+    python benchmarks/stub_bot_api.py [port] [latency_ms] [chat_rate]
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qsl
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency_ms: float = 50, chat_rate: float = 0, listener=None) -> FastAPI:
+    """Stub API app; chat_rate > 0 rejects more than chat_rate messages per second per chat.
+
+    listener(method, data), if given, is called for every accepted call.
+    """
+    app = FastAPI()
+    app.state.calls = Counter()
+    app.state.flood_errors = 0
+    app.state.updates = []
+    last_sent = {}
+
+    async def get_updates(data: dict) -> list:
+        # Form values arrive as strings
+        offset = int(data.get("offset") or 0)
+        limit = int(data.get("limit") or 100)
+        deadline = time.monotonic() + float(data.get("timeout") or 0)
+        updates = app.state.updates
+        while True:
+            # Queued in update_id order; trimmed in place as push_updates may append meanwhile
+            confirmed = 0
+            while confirmed < len(updates) and updates[confirmed]["update_id"] < offset:
+                confirmed += 1
+            del updates[:confirmed]
+            if updates or time.monotonic() >= deadline:
+                return updates[:limit]
+            await asyncio.sleep(0.01)
+
+    @app.post("/bot{token}/{method}")
+    async def call(token: str, method: str, request: Request):
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("application/json"):
+            data = await request.json()
+        elif content_type.startswith("application/x-www-form-urlencoded"):
+            data = dict(parse_qsl((await request.body()).decode()))
+        else:
+            # Multipart uploads: only the method is counted
+            data = {}
+        await asyncio.sleep(latency_ms / 1000)
+        app.state.calls[method] += 1
+
+        chat_id = str(data.get("chat_id", ""))
+        if method.startswith("send") and chat_rate > 0:
+            now = time.monotonic()
+            if now - last_sent.get(chat_id, 0.0) < 1 / chat_rate:
+                app.state.flood_errors += 1
+                return JSONResponse(status_code=429, content={
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1},
+                })
+            last_sent[chat_id] = now
+
+        if listener is not None:
+            listener(method, data)
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "stub", "username": "stub_bot"}
+        elif method == "getUpdates":
+            result = await get_updates(data)
+        elif method.startswith("send"):
+            result = {
+                "message_id": sum(app.state.calls.values()),
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id or 0), "type": "private"},
+                "text": data.get("text"),
+            }
+        else:
+            result = True
+        return {"ok": True, "result": result}
+
+    return app
+
+
+class StubServer:
+    """Runs the stub API on a background thread for in-process benchmarks"""
+
+    def __init__(self, port: int = 8081, latency_ms: float = 50, chat_rate: float = 0, listener=None):
+        self.app = create_app(latency_ms, chat_rate, listener)
+        self.url = f"http://127.0.0.1:{port}/bot"
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def calls(self) -> Counter:
+        return self.app.state.calls
+
+    def push_updates(self, updates):
+        """Queue update dicts for getUpdates"""
+        self.app.state.updates.extend(updates)
+
+    def __enter__(self) -> "StubServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def main_cli():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+    chat_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+    print(f"Stub Bot API on http://127.0.0.1:{port}/bot (set BOT_API_URL to this)")
+    uvicorn.run(create_app(latency_ms, chat_rate), host="127.0.0.1", port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main_cli()
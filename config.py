@@ -8,13 +8,98 @@ class Config:
     # Telegram Bot Configuration
     TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "8114777947:AAF49VRSOGr6xT_EhQ3LrmAf1m8utdak2Qs")
     TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "-4642426494")
+    # Bot username, so group commands addressed to other bots (/summary@OtherBot) are ignored
+    BOT_USERNAME = os.getenv("BOT_USERNAME", "")
     
     # Database Configuration
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./money_bot.db")
+    # Connection pool (per engine); recycle (seconds), timeout and pre-ping apply to server databases
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # SQLite pragmas set on every connection (empty journal mode or synchronous keeps SQLite's default)
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # milliseconds
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative: KiB, so 64 MiB
     
     # Server Configuration
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", "8000"))
     
     # Webhook Configuration (for production)
-    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "https://your-app-name.onrender.com/telegram") 
\ No newline at end of file
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "https://your-app-name.onrender.com/telegram")
+    # Answer with the reply as the webhook response when an update sends one message
+    WEBHOOK_REPLY = os.getenv("WEBHOOK_REPLY", "true").lower() == "true"
+    # Secret given to setWebhook as secret_token; requests without it are dropped (unchecked while empty)
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    
+    # Webhook admission control: updates per second and burst per user and for all users together
+    # (a rate of 0 disables that limit), and user buckets kept in memory before idle ones are dropped
+    ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "1"))
+    ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "10"))
+    ADMISSION_GLOBAL_RATE = float(os.getenv("ADMISSION_GLOBAL_RATE", "500"))
+    ADMISSION_GLOBAL_BURST = float(os.getenv("ADMISSION_GLOBAL_BURST", "1000"))
+    ADMISSION_MAX_USERS = int(os.getenv("ADMISSION_MAX_USERS", "100000"))
+    
+    # Outbound Bot API calls: endpoint, connection pool, flood limits (messages per second) and retries
+    BOT_API_URL = os.getenv("BOT_API_URL", "https://api.telegram.org/bot")
+    BOT_POOL_SIZE = int(os.getenv("BOT_POOL_SIZE", "16"))
+    BOT_RATE_GLOBAL = float(os.getenv("BOT_RATE_GLOBAL", "30"))
+    BOT_RATE_CHAT = float(os.getenv("BOT_RATE_CHAT", "1"))
+    BOT_RATE_GROUP = float(os.getenv("BOT_RATE_GROUP", str(20 / 60)))
+    BOT_CHAT_BURST = float(os.getenv("BOT_CHAT_BURST", "3"))
+    BOT_MAX_RETRIES = int(os.getenv("BOT_MAX_RETRIES", "3"))
+    
+    # Update ingestion queue (INGEST_WORKERS=0 processes updates inside the webhook request)
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "1000"))
+    INGEST_FULL_POLICY = os.getenv("INGEST_FULL_POLICY", "reject")  # reject, drop or wait
+    INGEST_DRAIN_TIMEOUT = float(os.getenv("INGEST_DRAIN_TIMEOUT", "10"))
+    
+    # Update deduplication (Telegram redelivers unacknowledged updates for up to 24h)
+    DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", "10000"))
+    DEDUP_TTL = float(os.getenv("DEDUP_TTL", "86400"))
+    
+    # Per-user query cache: memory (per process), redis (shared, needs CACHE_URL) or none
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+    
+    # HTTP API key (sent as X-API-Key); the API is disabled while this is empty
+    API_TOKEN = os.getenv("API_TOKEN", "")
+    
+    # Bearer token required by GET /metrics; open when empty
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+    
+    # ISO 4217 currency of amounts entered without one, and of summaries by default
+    DEFAULT_CURRENCY = os.getenv("DEFAULT_CURRENCY", "USD")
+    
+    # Recurring transactions: scheduler lease (seconds) shared by all workers, heap refresh
+    # from the database (seconds), rules entered per batch and missed occurrences per rule per batch
+    RECURRING_ENABLED = os.getenv("RECURRING_ENABLED", "true").lower() == "true"
+    RECURRING_LEASE_TTL = float(os.getenv("RECURRING_LEASE_TTL", "30"))
+    RECURRING_REFRESH_INTERVAL = float(os.getenv("RECURRING_REFRESH_INTERVAL", "300"))
+    RECURRING_BATCH_SIZE = int(os.getenv("RECURRING_BATCH_SIZE", "500"))
+    RECURRING_MAX_CATCHUP = int(os.getenv("RECURRING_MAX_CATCHUP", "100"))
+    
+    # Hot/cold tiering: transactions older than this many days (over 366) move to the archive table,
+    # checked every interval seconds (0 disables the job in the app), rows moved per database transaction
+    ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "400"))
+    ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "86400"))
+    ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+    
+    # Long polling (python -m app.polling): seconds getUpdates waits for updates, updates per batch
+    POLLING_TIMEOUT = int(os.getenv("POLLING_TIMEOUT", "50"))
+    POLLING_LIMIT = int(os.getenv("POLLING_LIMIT", "100"))
+    
+    # Maximum lines accepted in one multi-line transaction message
+    MAX_BATCH_LINES = int(os.getenv("MAX_BATCH_LINES", "200"))
+    
+    # CSV import: rows written per transaction, rejected rows listed in the report
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+    IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "20"))
\ No newline at end of file
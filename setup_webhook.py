@@ -11,10 +11,12 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-def set_webhook(bot_token, webhook_url):
-    """Set the webhook URL for the Telegram bot"""
+def set_webhook(bot_token, webhook_url, secret_token=""):
+    """Set the webhook URL for the Telegram bot, with the secret Telegram sends back on every update"""
     url = f"https://api.telegram.org/bot{bot_token}/setWebhook"
     data = {"url": webhook_url}
+    if secret_token:
+        data["secret_token"] = secret_token
     
     try:
         response = requests.post(url, json=data)
@@ -24,6 +26,8 @@ def set_webhook(bot_token, webhook_url):
         if result.get("ok"):
             print(f"✅ Webhook set successfully!")
             print(f"📡 Webhook URL: {webhook_url}")
+            if not secret_token:
+                print("⚠️ No WEBHOOK_SECRET set: anyone who finds the URL can post updates")
             return True
         else:
             print(f"❌ Failed to set webhook: {result.get('description')}")
@@ -109,7 +113,7 @@ def main():
         
         webhook_url = sys.argv[2]
         print(f"🔧 Setting webhook to: {webhook_url}")
-        set_webhook(bot_token, webhook_url)
+        set_webhook(bot_token, webhook_url, os.getenv("WEBHOOK_SECRET", ""))
         
     elif command == "info":
         print("🔍 Getting webhook information...")